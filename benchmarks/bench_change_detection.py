@@ -0,0 +1,32 @@
+import argparse
+import pathlib
+import tempfile
+
+from benchmarks.utils import make_tree, measure
+from src.file import DirFile
+from src.synchronizer import Synchronizer
+
+parser = argparse.ArgumentParser(description='Bytes read per sync on unchanged tree.')
+
+
+def main():
+    parser.add_argument('--files', type=int, default=100_000, help='Number of files in source tree.')
+    parser.add_argument('--file-size', type=int, default=64, help='Size of each file in bytes.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = pathlib.Path(tmp) / 'source'
+        make_tree(source, args.files, file_size=args.file_size)
+
+        for checksum in (False, True):
+            sync = Synchronizer(DirFile(source), DirFile(pathlib.Path(tmp) / f'replica_{checksum}'), checksum=checksum)
+            measure(sync.initialize)
+            result = measure(sync.sync)
+            print(
+                f'checksum={checksum!s:<5} files={args.files} '
+                f'sync={result.elapsed:.2f}s bytes_read={result.bytes_read} tree_bytes={args.files * args.file_size}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+import argparse
+import pathlib
+import tempfile
+
+from benchmarks.utils import make_large_files, make_tree, measure, peak_rss
+from src.file import DirFile
+from src.synchronizer import Synchronizer
+
+parser = argparse.ArgumentParser(description='Copy throughput and peak RSS of initial synchronization.')
+
+
+def main():
+    parser.add_argument('--files', type=int, default=10_000, help='Number of small files.')
+    parser.add_argument('--large-files', type=int, default=4, help='Number of large files.')
+    parser.add_argument('--large-file-size', type=int, default=256 * 1024 * 1024, help='Size of large file in bytes.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = pathlib.Path(tmp) / 'source'
+        make_tree(source / 'small', args.files)
+        make_large_files(source / 'large', args.large_files, args.large_file_size)
+        rss_before = peak_rss()
+
+        sync = Synchronizer(DirFile(source), DirFile(pathlib.Path(tmp) / 'replica'))
+        elapsed = measure(sync.initialize).elapsed
+
+        total = args.files * 64 + args.large_files * args.large_file_size
+        print(
+            f'files={args.files + args.large_files} bytes={total} initialize={elapsed:.2f}s '
+            f'throughput={total / elapsed / 1024 ** 2:.1f}MiB/s '
+            f'peak_rss_before={rss_before}KiB peak_rss_after={peak_rss()}KiB'
+        )
+
+
+if __name__ == '__main__':
+    main()
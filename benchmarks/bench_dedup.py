@@ -0,0 +1,73 @@
+import argparse
+import os
+import pathlib
+import tempfile
+
+from benchmarks.utils import measure
+from src.file import DirFile
+from src.synchronizer import Synchronizer
+
+parser = argparse.ArgumentParser(description='Bytes written and disk usage of replica with duplicated content.')
+
+
+def make_duplicates(
+        root: pathlib.Path,
+        files: int,
+        unique: int,
+        file_size: int
+) -> None:
+    """
+    Generate tree where files share few distinct contents.
+
+    :param pathlib.Path root: Tree root directory.
+    :param int files: Number of files to create.
+    :param int unique: Number of distinct contents.
+    :param int file_size: Size of each file in bytes.
+    """
+
+    root.mkdir(parents=True)
+    contents = [os.urandom(file_size) for _ in range(unique)]
+    for index in range(files):
+        (root / f'file_{index}.bin').write_bytes(contents[index % unique])
+
+
+def disk_usage(root: pathlib.Path) -> int:
+    """
+    Get bytes allocated by files of the tree, counting every inode once.
+
+    :param pathlib.Path root: Tree root directory.
+    :return: int Allocated bytes.
+    """
+
+    inodes = {}
+    for path in root.rglob('*'):
+        path_stat = path.lstat()
+        inodes[path_stat.st_ino] = path_stat.st_blocks * 512
+
+    return sum(inodes.values())
+
+
+def main():
+    parser.add_argument('--files', type=int, default=1000, help='Number of files in source tree.')
+    parser.add_argument('--unique', type=int, default=50, help='Number of distinct file contents.')
+    parser.add_argument('--file-size', type=int, default=256 * 1024, help='Size of each file in bytes.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = pathlib.Path(tmp) / 'source'
+        make_duplicates(source, args.files, args.unique, args.file_size)
+
+        for dedup in (False, True):
+            replica = pathlib.Path(tmp) / f'replica_{dedup}'
+            synchronizer = Synchronizer(DirFile(source), DirFile(replica), dedup=dedup)
+            result = measure(synchronizer.initialize)
+            saved = synchronizer.dedup.total_bytes_saved if synchronizer.dedup is not None else 0
+            synchronizer.close()
+            print(
+                f'dedup={dedup} initialize={result.elapsed:.2f}s bytes_read={result.bytes_read} '
+                f'bytes_written={result.bytes_written} disk_usage={disk_usage(replica)} bytes_saved={saved}'
+            )
+
+
+if __name__ == '__main__':
+    main()
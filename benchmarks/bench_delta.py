@@ -0,0 +1,40 @@
+import argparse
+import os
+import pathlib
+import tempfile
+
+from benchmarks.utils import make_large_files, measure
+from src.file import DirFile
+from src.synchronizer import Synchronizer
+
+parser = argparse.ArgumentParser(description='Bytes written when synchronizing slightly changed large files.')
+
+
+def main():
+    parser.add_argument('--file-size', type=int, default=1024 ** 3, help='Size of large file in bytes.')
+    parser.add_argument('--changes', type=int, default=1, help='Number of changed bytes spread across the file.')
+    parser.add_argument('--delta-threshold', type=int, default=1, help='Delta transfer threshold, 0 disables.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = pathlib.Path(tmp) / 'source'
+        make_large_files(source, 1, args.file_size)
+        sync = Synchronizer(
+            DirFile(source), DirFile(pathlib.Path(tmp) / 'replica'), delta_threshold=args.delta_threshold or None
+        )
+        measure(sync.initialize)
+
+        with open(source / 'large_0.bin', 'r+b') as file:
+            for change in range(args.changes):
+                os.pwrite(file.fileno(), b'!', args.file_size * change // args.changes)
+
+        result = measure(sync.sync)
+        sync.close()
+        print(
+            f'file_size={args.file_size} changes={args.changes} sync={result.elapsed:.2f}s '
+            f'bytes_written={result.bytes_written} ratio={result.bytes_written / args.file_size:.4f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
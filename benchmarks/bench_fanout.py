@@ -0,0 +1,45 @@
+import argparse
+import pathlib
+import tempfile
+
+from benchmarks.utils import make_tree, measure
+from src.fanout import FanOutSynchronizer
+from src.file import DirFile
+from src.synchronizer import Synchronizer
+
+parser = argparse.ArgumentParser(description='Bytes read when mirroring one source to many replicas.')
+
+
+def main():
+    parser.add_argument('--files', type=int, default=10_000, help='Number of files in source tree.')
+    parser.add_argument('--file-size', type=int, default=64 * 1024, help='Size of each file in bytes.')
+    parser.add_argument('--replicas', type=int, default=3, help='Number of replicas.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = pathlib.Path(tmp) / 'source'
+        make_tree(source, args.files, file_size=args.file_size)
+
+        separate = [
+            Synchronizer(DirFile(source), DirFile(pathlib.Path(tmp) / f'separate_{index}'))
+            for index in range(args.replicas)
+        ]
+        result = measure(lambda: [synchronizer.initialize() for synchronizer in separate])
+        print(
+            f'separate replicas={args.replicas} initialize={result.elapsed:.2f}s '
+            f'bytes_read={result.bytes_read} bytes_written={result.bytes_written}'
+        )
+
+        fanout = FanOutSynchronizer(
+            DirFile(source), [DirFile(pathlib.Path(tmp) / f'fanout_{index}') for index in range(args.replicas)]
+        )
+        result = measure(fanout.initialize)
+        fanout.close()
+        print(
+            f'fan-out replicas={args.replicas} initialize={result.elapsed:.2f}s '
+            f'bytes_read={result.bytes_read} bytes_written={result.bytes_written}'
+        )
+
+
+if __name__ == '__main__':
+    main()
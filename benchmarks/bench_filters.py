@@ -0,0 +1,79 @@
+import argparse
+import pathlib
+import shutil
+import tempfile
+
+from benchmarks.bench_scan import count_stats
+from benchmarks.utils import measure
+from src.file import DirFile
+from src.filters import FileFilter
+from src.scanner import scan
+from src.synchronizer import Synchronizer
+
+parser = argparse.ArgumentParser(description='Scan and sync cost of tree with most entries excluded by filter rules.')
+
+# Rules of the generated tree, excluding 80% of its files
+RULES = ['node_modules/', '.git/', '*.tmp']
+
+
+def make_project_tree(
+        root: pathlib.Path,
+        files: int,
+        files_per_dir: int = 100,
+        file_size: int = 1024
+) -> None:
+    """
+    Generate projects with 20% of files in sources and 80% in node_modules, .git and temporary files.
+
+    :param pathlib.Path root: Tree root directory.
+    :param int files: Number of files to create.
+    :param int files_per_dir: Number of files in a single directory.
+    :param int file_size: Size of each file in bytes.
+    """
+
+    payload = b'x' * file_size
+    for index in range(files):
+        project = root / f'project_{index // (files_per_dir * 10)}'
+        kind = index % 10
+        if kind < 2:
+            directory = project / 'src'
+            name = f'file_{index}.py'
+        elif kind < 3:
+            directory = project
+            name = f'file_{index}.tmp'
+        elif kind < 5:
+            directory = project / '.git' / 'objects'
+            name = f'object_{index}'
+        else:
+            directory = project / 'node_modules' / f'package_{index % 7}'
+            name = f'file_{index}.js'
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / name).write_bytes(payload)
+
+
+def main():
+    parser.add_argument('--files', type=int, default=50_000, help='Number of files in source tree.')
+    parser.add_argument('--dir', type=pathlib.Path, default=None, help='Directory for generated trees.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        source = pathlib.Path(tmp) / 'source'
+        make_project_tree(source, args.files)
+
+        for name, file_filter in (('all', None), ('filtered', FileFilter(source, RULES))):
+            with count_stats() as counter:
+                files = scan(DirFile(source), file_filter=file_filter)
+            replica = pathlib.Path(tmp) / 'replica'
+            sync = Synchronizer(DirFile(source), DirFile(replica), file_filter=file_filter)
+            initialize = measure(sync.initialize)
+            rescan = measure(sync.sync)
+            sync.close()
+            shutil.rmtree(replica)
+            print(
+                f'{name:<8} entries={len(files)} stat_calls={counter["stat"]} listings={counter["scandir"]} '
+                f'initialize={initialize.elapsed:.2f}s written={initialize.bytes_written} sync={rescan.elapsed:.2f}s'
+            )
+
+
+if __name__ == '__main__':
+    main()
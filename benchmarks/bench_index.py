@@ -0,0 +1,34 @@
+import argparse
+import pathlib
+import tempfile
+
+from benchmarks.utils import make_tree, measure
+from src.file import DirFile
+from src.index import SyncIndex
+from src.synchronizer import Synchronizer
+
+parser = argparse.ArgumentParser(description='Cold start versus warm start with persistent sync index.')
+
+
+def main():
+    parser.add_argument('--files', type=int, default=100_000, help='Number of files in source tree.')
+    parser.add_argument('--file-size', type=int, default=4096, help='Size of each file in bytes.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = pathlib.Path(tmp) / 'source'
+        replica = pathlib.Path(tmp) / 'replica'
+        make_tree(source, args.files, file_size=args.file_size)
+
+        for start in ('cold', 'warm'):
+            index = SyncIndex.for_replica(replica)
+            result = measure(Synchronizer(DirFile(source), DirFile(replica), index=index).initialize)
+            index.close()
+            print(
+                f'{start} start files={args.files} initialize={result.elapsed:.2f}s '
+                f'bytes_read={result.bytes_read} bytes_written={result.bytes_written}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import argparse
+import gc
+import logging
+import pathlib
+import tempfile
+import tracemalloc
+
+from benchmarks.utils import make_tree
+from src.file import DirFile
+from src.synchronizer import Synchronizer
+
+parser = argparse.ArgumentParser(description='Memory held by tracked state per million tracked entries.')
+
+
+def main():
+    parser.add_argument('--files', type=int, default=100_000, help='Number of files in source tree.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = pathlib.Path(tmp) / 'source'
+        make_tree(source, args.files, file_size=0)
+
+        logging.disable(logging.CRITICAL)
+        tracemalloc.start()
+        sync = Synchronizer(DirFile(source), DirFile(pathlib.Path(tmp) / 'replica'))
+        sync.initialize()
+        sync.sync()
+        gc.collect()
+        held, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        logging.disable(logging.NOTSET)
+
+        entries = len(sync.tracked_files)
+        sync.close()
+        print(
+            f'entries={entries} held={held / 1024 ** 2:.1f}MiB peak={peak / 1024 ** 2:.1f}MiB '
+            f'per_entry={held / entries:.0f}B per_million={held / entries * 1_000_000 / 1024 ** 3:.2f}GiB'
+        )
+
+
+if __name__ == '__main__':
+    main()
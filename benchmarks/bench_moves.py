@@ -0,0 +1,43 @@
+import argparse
+import os
+import pathlib
+import tempfile
+import unittest.mock
+
+from benchmarks.utils import make_tree, measure
+from src.file import DirFile
+from src.index import SyncIndex
+from src.synchronizer import Synchronizer
+
+parser = argparse.ArgumentParser(description='Synchronization of renamed directories.')
+
+
+def main():
+    parser.add_argument('--files', type=int, default=100_000, help='Number of files in source tree.')
+    parser.add_argument('--file-size', type=int, default=4096, help='Size of each file in bytes.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = pathlib.Path(tmp) / 'source'
+        replica = pathlib.Path(tmp) / 'replica'
+        make_tree(source, args.files, file_size=args.file_size)
+
+        index = SyncIndex.for_replica(replica)
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica), index=index)
+        measure(synchronizer.initialize)
+
+        for directory in list(source.iterdir()):
+            directory.rename(directory.with_name(f'renamed_{directory.name}'))
+
+        with unittest.mock.patch('os.replace', wraps=os.replace) as replace_mock:
+            result = measure(synchronizer.sync)
+        synchronizer.close()
+
+        print(
+            f'renamed dirs files={args.files} sync={result.elapsed:.2f}s renames={replace_mock.call_count} '
+            f'bytes_read={result.bytes_read} bytes_written={result.bytes_written}'
+        )
+
+
+if __name__ == '__main__':
+    main()
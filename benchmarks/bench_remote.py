@@ -0,0 +1,49 @@
+import argparse
+import pathlib
+import shutil
+import tempfile
+import threading
+
+from benchmarks.utils import make_tree, measure
+from src.file import DirFile
+from src.remote import RemoteBackend, ReplicaServer
+from src.synchronizer import Synchronizer
+
+parser = argparse.ArgumentParser(description='Initial synchronization to local replica and to replica server.')
+
+
+def main():
+    parser.add_argument('--files', type=int, default=20_000, help='Number of files in source tree.')
+    parser.add_argument('--file-size', type=int, default=4096, help='Size of each file in bytes.')
+    parser.add_argument('--workers', type=int, default=8, help='Number of threads copying files.')
+    parser.add_argument('--dir', type=pathlib.Path, default=None, help='Directory for generated trees.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        source = pathlib.Path(tmp) / 'source'
+        make_tree(source, args.files, files_per_dir=100, file_size=args.file_size)
+        replica = pathlib.Path(tmp) / 'replica'
+        served = pathlib.Path(tmp) / 'served'
+
+        for name, address in (('local', None), ('unix', f'unix://{tmp}/replica.sock'), ('tcp', 'tcp://127.0.0.1:0')):
+            server = backend = None
+            if address is not None:
+                server = ReplicaServer(served, address)
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                backend = RemoteBackend(server.address, replica)
+            sync = Synchronizer(DirFile(source), DirFile(replica), workers=args.workers, backend=backend)
+            result = measure(sync.initialize)
+            sync.close()
+            line = f'{name:<6} files={args.files} time={result.elapsed:.2f}s'
+            if backend is not None:
+                server.close()
+                line += (
+                    f' batches={backend.batches} operations={backend.messages}'
+                    f' sent={backend.bytes_sent} content={args.files * args.file_size}'
+                )
+            print(line)
+            shutil.rmtree(served if address is not None else replica)
+
+
+if __name__ == '__main__':
+    main()
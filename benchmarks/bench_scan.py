@@ -0,0 +1,129 @@
+import argparse
+import contextlib
+import os
+import pathlib
+import tempfile
+import time
+import typing
+import unittest.mock
+
+from benchmarks.utils import make_tree
+from src.file import DirFile
+from src.scanner import ScanCache, scan
+
+import src.settings as settings
+
+parser = argparse.ArgumentParser(description='Stat calls per entry of the source tree walk.')
+
+
+class _CountingEntry:
+    """os.DirEntry proxy counting stat calls which are not served from cache."""
+
+    def __init__(self, entry: os.DirEntry, counter: dict[str, int]) -> None:
+        self._entry = entry
+        self._counter = counter
+        self._stat_taken = False
+
+    def __getattr__(self, name):
+        return getattr(self._entry, name)
+
+    def stat(self, *args, **kwargs):
+        if not self._stat_taken:
+            self._counter['stat'] += 1
+            self._stat_taken = True
+        return self._entry.stat(*args, **kwargs)
+
+
+@contextlib.contextmanager
+def count_stats():
+    """Count stat, lstat and uncached DirEntry.stat calls, and directory listings."""
+
+    counter = {'stat': 0, 'scandir': 0}
+    original_stat, original_lstat, original_scandir = os.stat, os.lstat, os.scandir
+
+    def counting_stat(*args, **kwargs):
+        counter['stat'] += 1
+        return original_stat(*args, **kwargs)
+
+    def counting_lstat(*args, **kwargs):
+        counter['stat'] += 1
+        return original_lstat(*args, **kwargs)
+
+    @contextlib.contextmanager
+    def counting_scandir(*args, **kwargs):
+        counter['scandir'] += 1
+        with original_scandir(*args, **kwargs) as entries:
+            yield (_CountingEntry(entry, counter) for entry in entries)
+
+    with unittest.mock.patch('os.stat', counting_stat), unittest.mock.patch('os.lstat', counting_lstat), \
+            unittest.mock.patch('os.scandir', counting_scandir):
+        yield counter
+
+
+def legacy_scan(root: pathlib.Path) -> int:
+    """
+    Reproduce per entry calls of a sync cycle before single pass scanner.
+
+    Recursive walk with iterdir and is_dir, inode lookup when saving tracked file,
+    exists and stat in deletion detection and snapshot before content comparison.
+    """
+
+    entries = 0
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        entries += 1
+        is_dir = path.is_dir()
+        path.stat()
+        path.exists()
+        path.stat()
+        if is_dir:
+            stack.extend(path.iterdir())
+        else:
+            path.stat()
+
+    return entries
+
+
+def rescan(source: pathlib.Path, trust_files: bool) -> typing.Callable[[], int]:
+    """
+    Prepare rescan of unchanged tree with listings cached by previous scan.
+
+    :param pathlib.Path source: Source tree.
+    :param bool trust_files: Reuse snapshots of files of unchanged directories.
+    :return: typing.Callable Function running the rescan and returning number of entries.
+    """
+
+    cache = ScanCache(trust_files)
+    scan(DirFile(source), cache)
+    return lambda: len(scan(DirFile(source), cache))
+
+
+def main():
+    parser.add_argument('--files', type=int, default=100_000, help='Number of files in source tree.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = pathlib.Path(tmp) / 'source'
+        make_tree(source, args.files)
+        # Listings of directories modified just now are not cached
+        time.sleep(settings.SCAN_CACHE_MIN_AGE_NS / 10 ** 9)
+
+        for name, walk in (
+                ('before', lambda: legacy_scan(source)),
+                ('after', lambda: len(scan(DirFile(source)))),
+                ('pruned', rescan(source, trust_files=False)),
+                ('trust', rescan(source, trust_files=True)),
+        ):
+            with count_stats() as counter:
+                start = time.perf_counter()
+                entries = walk()
+                elapsed = time.perf_counter() - start
+            print(
+                f'{name:<6} entries={entries} stat_calls={counter["stat"]} listings={counter["scandir"]} '
+                f'per_entry={counter["stat"] / entries:.2f} walk={elapsed:.2f}s'
+            )
+
+
+if __name__ == '__main__':
+    main()
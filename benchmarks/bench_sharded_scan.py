@@ -0,0 +1,72 @@
+import argparse
+import concurrent.futures
+import multiprocessing
+import os
+import pathlib
+import tempfile
+import time
+
+from benchmarks.utils import make_tree
+from src.file import DirFile, TextFile
+from src.scanner import scan
+from src.sharded_scanner import sharded_scan
+from src.transfer import hash_file
+
+import src.settings as settings
+
+parser = argparse.ArgumentParser(description='Scan and hash time of sharded scan with different number of processes.')
+
+
+def single_scan(source: pathlib.Path, digests: bool) -> int:
+    """
+    Scan (and hash) tree in the main process, as a sync cycle without scan workers does.
+
+    :param pathlib.Path source: Source tree.
+    :param bool digests: Hash every file.
+    :return: int Number of entries.
+    """
+
+    files = scan(DirFile(source))
+    if digests:
+        for file in files:
+            if isinstance(file, TextFile):
+                file.digest = hash_file(file.path)
+    return len(files)
+
+
+def main():
+    parser.add_argument('--files', type=int, default=100_000, help='Number of files in source tree.')
+    parser.add_argument('--file-size', type=int, default=4096, help='Size of each file in bytes.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, 8], help='Tested numbers of scan processes.')
+    parser.add_argument('--dir', type=pathlib.Path, default=None, help='Directory for generated tree.')
+    args = parser.parse_args()
+    print(f'cpus={os.cpu_count()}')
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        source = pathlib.Path(tmp) / 'source'
+        make_tree(source, args.files, files_per_dir=100, file_size=args.file_size)
+
+        for digests in (False, True):
+            mode = 'scan+hash' if digests else 'scan'
+            start = time.perf_counter()
+            entries = single_scan(source, digests)
+            baseline = time.perf_counter() - start
+            print(f'{mode:<9} workers=1 entries={entries} time={baseline:.2f}s speedup=1.00')
+
+            for workers in args.workers:
+                with concurrent.futures.ProcessPoolExecutor(
+                        workers, mp_context=multiprocessing.get_context(settings.SCAN_MP_CONTEXT)
+                ) as executor:
+                    # Start worker processes before measuring
+                    list(executor.map(abs, range(workers)))
+                    start = time.perf_counter()
+                    entries = len(sharded_scan(DirFile(source), executor, workers, digests))
+                    elapsed = time.perf_counter() - start
+                print(
+                    f'{mode:<9} workers={workers} entries={entries} time={elapsed:.2f}s '
+                    f'speedup={baseline / elapsed:.2f}'
+                )
+
+
+if __name__ == '__main__':
+    main()
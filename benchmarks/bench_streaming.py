@@ -0,0 +1,70 @@
+import argparse
+import logging
+import pathlib
+import tempfile
+import threading
+import time
+
+from benchmarks.utils import make_tree
+from src.async_synchronizer import AsyncSynchronizer
+from src.file import DirFile
+from src.synchronizer import Synchronizer
+
+parser = argparse.ArgumentParser(description='Latency of the first change and total time of sync with and without streaming.')
+
+
+def first_change_latency(path: pathlib.Path, content: bytes, start: float, done: threading.Event) -> list[float]:
+    """
+    Poll replica file in background thread until it has expected content.
+
+    :param pathlib.Path path: Replica file path.
+    :param bytes content: Expected content.
+    :param float start: Start of the measurement.
+    :param threading.Event done: Set when synchronization finished.
+    :return: list[float] Filled with the latency once the change is seen.
+    """
+
+    latency = []
+
+    def poll():
+        while not done.is_set() or not latency:
+            if path.read_bytes() == content:
+                latency.append(time.perf_counter() - start)
+                return
+            time.sleep(0.001)
+
+    threading.Thread(target=poll, daemon=True).start()
+    return latency
+
+
+def main():
+    parser.add_argument('--files', type=int, default=100_000, help='Number of files in source tree.')
+    parser.add_argument('--workers', type=int, default=4, help='Number of copy workers.')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    for synchronizer_class in (Synchronizer, AsyncSynchronizer):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = pathlib.Path(tmp) / 'source'
+            replica = pathlib.Path(tmp) / 'replica'
+            make_tree(source, args.files)
+            sync = synchronizer_class(DirFile(source), DirFile(replica), workers=args.workers)
+            sync.initialize()
+
+            changed = next(source.iterdir()).iterdir().__next__()
+            changed.write_bytes(b'changed')
+            done = threading.Event()
+            start = time.perf_counter()
+            latency = first_change_latency(replica / changed.relative_to(source), b'changed', start, done)
+            sync.sync()
+            elapsed = time.perf_counter() - start
+            done.set()
+            sync.close()
+
+            while not latency:
+                time.sleep(0.001)
+            print(f'{synchronizer_class.__name__} files={args.files} first_change={latency[0]:.3f}s sync={elapsed:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+import argparse
+import pathlib
+import shutil
+import tempfile
+
+from benchmarks.utils import make_large_files, make_tree, measure
+from src.file import DirFile
+from src.synchronizer import Synchronizer
+
+parser = argparse.ArgumentParser(description='Copy throughput of initial synchronization with different number of workers.')
+
+
+def main():
+    parser.add_argument('--files', type=int, default=20_000, help='Number of small files.')
+    parser.add_argument('--large-files', type=int, default=8, help='Number of large files.')
+    parser.add_argument('--large-file-size', type=int, default=128 * 1024 * 1024, help='Size of large file in bytes.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16], help='Tested numbers of workers.')
+    parser.add_argument('--dir', type=pathlib.Path, default=None, help='Directory for generated trees.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        small = pathlib.Path(tmp) / 'small'
+        large = pathlib.Path(tmp) / 'large'
+        make_tree(small, args.files, file_size=4096)
+        make_large_files(large, args.large_files, args.large_file_size)
+
+        for name, source, total in (
+                ('small', small, args.files * 4096),
+                ('large', large, args.large_files * args.large_file_size),
+        ):
+            for workers in args.workers:
+                replica = pathlib.Path(tmp) / 'replica'
+                sync = Synchronizer(DirFile(source), DirFile(replica), workers=workers)
+                elapsed = measure(sync.initialize).elapsed
+                sync.close()
+                shutil.rmtree(replica)
+                print(
+                    f'{name} files workers={workers} initialize={elapsed:.2f}s '
+                    f'throughput={total / elapsed / 1024 ** 2:.1f}MiB/s'
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+import argparse
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import os
+import pathlib
+import subprocess
+import tempfile
+
+from benchmarks.trees import CHURN_PATTERNS, SIZE_DISTRIBUTIONS, TreeProfile, apply_churn, make_synthetic_tree
+from benchmarks.utils import measure, peak_rss
+from src.file import DirFile
+from src.index import SyncIndex
+from src.synchronizer import Synchronizer
+
+import src.settings as settings
+
+parser = argparse.ArgumentParser(description='Initial and incremental sync of synthetic trees on tmpfs and on disk.')
+
+# Directory where suite results are stored, one JSON file per version
+RESULTS_DIR = pathlib.Path(__file__).resolve().parent / 'results'
+# Tree shape used when not overridden by command line options
+DEFAULT_PROFILE = TreeProfile()
+
+
+def filesystem_type(path: pathlib.Path) -> str:
+    """
+    Get type of filesystem holding the path from mount table.
+
+    :param pathlib.Path path: Existing path.
+    :return: str Filesystem type, e.g. tmpfs or ext4, unknown if mount table is not available.
+    """
+
+    path = path.resolve()
+    best, fs_type = None, 'unknown'
+    try:
+        with open('/proc/mounts') as mounts:
+            for line in mounts:
+                _, mount_point, mount_type, *_ = line.split()
+                mount_path = pathlib.Path(mount_point.replace('\\040', ' '))
+                if path.is_relative_to(mount_path) and (best is None or len(mount_path.parts) > len(best.parts)):
+                    best, fs_type = mount_path, mount_type
+    except OSError:
+        pass
+
+    return fs_type
+
+
+def current_version() -> str:
+    """
+    Get version of the tree the suite runs against.
+    :return: str Output of git describe, unknown outside of git checkout.
+    """
+
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_scenario(
+        base_dir: pathlib.Path,
+        profile: TreeProfile,
+        churn: str,
+        churn_fraction: float,
+        workers: int,
+        durability: str = 'none'
+) -> dict:
+    """
+    Run initial sync of generated tree, apply churn and run incremental sync.
+
+    Run in its own process, so peak RSS belongs to this scenario only.
+
+    :param pathlib.Path base_dir: Directory where the trees are generated.
+    :param TreeProfile profile: Shape of the source tree.
+    :param str churn: Churn pattern applied between syncs.
+    :param float churn_fraction: Part of the tree changed by the churn.
+    :param int workers: Number of synchronizer workers.
+    :param str durability: Flushing of replica writes to disk, one of settings.DURABILITY_MODES.
+    :return: dict Measurements of initial and incremental sync.
+    """
+
+    with tempfile.TemporaryDirectory(dir=base_dir, prefix='sync-bench-') as tmp:
+        source = pathlib.Path(tmp) / 'source'
+        replica = pathlib.Path(tmp) / 'replica'
+        make_synthetic_tree(source, profile)
+
+        synchronizer = Synchronizer(
+            DirFile(source), DirFile(replica), index=SyncIndex.for_replica(replica), workers=workers,
+            durability=durability
+        )
+        result = {}
+        for step, function in (('initialize', synchronizer.initialize), ('sync', synchronizer.sync)):
+            if step == 'sync':
+                result['changed'] = apply_churn(source, churn, churn_fraction, profile.seed)
+            measurement = measure(function)
+            result[step] = {
+                **measurement._asdict(),
+                'peak_rss_kib': peak_rss(),
+                'phases': synchronizer.metrics.last['phases'],
+                'fsyncs': synchronizer.metrics.last['counters'].get('fsyncs', 0),
+            }
+        synchronizer.close()
+
+    return result
+
+
+def compare(results: list[dict], baseline: list[dict]) -> None:
+    """
+    Print ratio of wall time and bytes written of every scenario to the baseline run.
+
+    :param list[dict] results: Current results.
+    :param list[dict] baseline: Results of previous version.
+    """
+
+    previous = {(result['target'], result['churn'], result.get('durability', 'none')): result for result in baseline}
+    for result in results:
+        old = previous.get((result['target'], result['churn'], result['durability']))
+        if old is None:
+            continue
+        for step in ('initialize', 'sync'):
+            ratios = ' '.join(
+                f'{name}={result[step][name] / old[step][name]:.2f}x' if old[step][name] else f'{name}=n/a'
+                for name in ('elapsed', 'bytes_written', 'read_syscalls', 'peak_rss_kib')
+            )
+            print(
+                f'  vs baseline {result["target"]:<6} {result["churn"]:<9} {result["durability"]:<6} {step:<10} {ratios}'
+            )
+
+
+def main():
+    parser.add_argument('--files', type=int, default=DEFAULT_PROFILE.files, help='Number of files in source tree.')
+    parser.add_argument('--depth', type=int, default=DEFAULT_PROFILE.depth, help='Depth of directory tree.')
+    parser.add_argument('--fanout', type=int, default=DEFAULT_PROFILE.fanout, help='Subdirectories of every directory.')
+    parser.add_argument('--file-size', type=int, default=DEFAULT_PROFILE.file_size, help='Mean file size in bytes.')
+    parser.add_argument(
+        '--size-distribution', choices=sorted(SIZE_DISTRIBUTIONS), default=DEFAULT_PROFILE.size_distribution,
+        help='Distribution of file sizes.'
+    )
+    parser.add_argument(
+        '--churn', nargs='+', choices=CHURN_PATTERNS, default=list(CHURN_PATTERNS),
+        help='Churn patterns applied before incremental sync, each in its own scenario.'
+    )
+    parser.add_argument('--churn-fraction', type=float, default=0.01, help='Part of the tree changed by churn.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of synchronizer workers.')
+    parser.add_argument(
+        '--durability', nargs='+', choices=settings.DURABILITY_MODES, default=[settings.DEFAULT_DURABILITY],
+        help='Durability modes of replica writes, each in its own scenario, to measure the cost of flushing.'
+    )
+    parser.add_argument('--seed', type=int, default=0, help='Seed of tree generator and churn.')
+    parser.add_argument('--tmpfs-dir', type=pathlib.Path, default=pathlib.Path('/dev/shm'), help='Directory on tmpfs.')
+    parser.add_argument(
+        '--disk-dir', type=pathlib.Path, default=pathlib.Path(tempfile.gettempdir()),
+        help='Directory on disk, set it if the default temporary directory is on tmpfs.'
+    )
+    parser.add_argument('--output', type=pathlib.Path, help='Results file. Default benchmarks/results/VERSION.json.')
+    parser.add_argument('--compare', type=pathlib.Path, help='Results file of previous version to compare with.')
+    args = parser.parse_args()
+
+    profile = TreeProfile(args.files, args.depth, args.fanout, args.file_size, args.size_distribution, args.seed)
+    targets = {'tmpfs': args.tmpfs_dir, 'disk': args.disk_dir}
+    version = current_version()
+    results = []
+
+    for target, base_dir in targets.items():
+        if not base_dir.is_dir():
+            print(f'Skipping {target}, {base_dir} does not exist.')
+            continue
+
+        fs_type = filesystem_type(base_dir)
+        for churn, durability in itertools.product(args.churn, args.durability):
+            with concurrent.futures.ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('fork')) as executor:
+                result = executor.submit(
+                    run_scenario, base_dir, profile, churn, args.churn_fraction, args.workers, durability
+                ).result()
+            results.append({'target': target, 'filesystem': fs_type, 'churn': churn, 'durability': durability, **result})
+            for step in ('initialize', 'sync'):
+                measurement = result[step]
+                print(
+                    f'{target:<6} {fs_type:<8} {churn:<9} {durability:<6} {step:<10} elapsed={measurement["elapsed"]:.2f}s '
+                    f'read={measurement["bytes_read"]} written={measurement["bytes_written"]} '
+                    f'syscalls={measurement["read_syscalls"] + measurement["write_syscalls"]} '
+                    f'fsyncs={measurement["fsyncs"]} peak_rss={measurement["peak_rss_kib"]}KiB'
+                )
+
+    output = args.output or RESULTS_DIR / f'{version}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump({'version': version, 'cpus': os.cpu_count(), 'profile': profile._asdict(), 'results': results}, file, indent=2)
+    print(f'Results stored to {output}')
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        print(f'Comparison with {baseline["version"]}:')
+        compare(results, baseline['results'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import os
+import pathlib
+import random
+import typing
+
+# Distributions of generated file sizes, called with random generator and mean size,
+# lognormvariate(0, 1.5) has mean e ** 1.125 = 3.08, so it is scaled to the requested mean
+SIZE_DISTRIBUTIONS: dict[str, typing.Callable[[random.Random, int], int]] = {
+    'fixed': lambda rng, mean: mean,
+    'uniform': lambda rng, mean: rng.randint(0, 2 * mean),
+    'lognormal': lambda rng, mean: int(rng.lognormvariate(0, 1.5) * mean / 3.08),
+}
+
+CHURN_PATTERNS = ('edits', 'renames', 'deletes', 'dir_moves')
+
+
+class TreeProfile(typing.NamedTuple):
+    """Shape of generated source tree."""
+
+    files: int = 10_000
+    depth: int = 3
+    fanout: int = 8
+    file_size: int = 4096
+    size_distribution: str = 'lognormal'
+    seed: int = 0
+
+
+def make_synthetic_tree(root: pathlib.Path, profile: TreeProfile) -> list[pathlib.Path]:
+    """
+    Generate tree of directories nested to given depth with files spread over all of them.
+
+    :param pathlib.Path root: Tree root directory.
+    :param TreeProfile profile: Shape of the tree.
+    :return: list[pathlib.Path] Generated directories, root first.
+    """
+
+    rng = random.Random(profile.seed)
+    directories = [root]
+    level = [root]
+    for _ in range(profile.depth):
+        level = [parent / f'dir_{index}' for parent in level for index in range(profile.fanout)]
+        directories.extend(level)
+    for directory in directories:
+        directory.mkdir(parents=True, exist_ok=True)
+
+    sizes = SIZE_DISTRIBUTIONS[profile.size_distribution]
+    payload = os.urandom(max(profile.file_size * 4, 1))
+    for index in range(profile.files):
+        size = min(sizes(rng, profile.file_size), len(payload))
+        offset = rng.randrange(len(payload) - size + 1)
+        (rng.choice(directories) / f'file_{index}.bin').write_bytes(payload[offset:offset + size])
+
+    return directories
+
+
+def apply_churn(
+        root: pathlib.Path,
+        pattern: str,
+        fraction: float,
+        seed: int = 0
+) -> int:
+    """
+    Change part of the tree with given churn pattern.
+
+    :param pathlib.Path root: Tree root directory.
+    :param str pattern: One of CHURN_PATTERNS.
+    :param float fraction: Part of files (or directories for dir_moves) which are changed.
+    :param int seed: Seed of the random generator.
+    :return: int Number of changed files or directories.
+    """
+
+    rng = random.Random(seed)
+    directories = sorted(path for path in root.rglob('*') if path.is_dir())
+    if pattern == 'dir_moves':
+        moved = rng.sample(directories, max(1, int(len(directories) * fraction)) if directories else 0)
+        # Deepest first, so moved directory is never an ancestor of one moved later
+        for index, directory in enumerate(sorted(moved, key=lambda path: len(path.parts), reverse=True)):
+            directory.rename(root / f'moved_{index}_{directory.name}')
+        return len(moved)
+
+    files = sorted(path for path in root.rglob('*') if path.is_file())
+    changed = rng.sample(files, max(1, int(len(files) * fraction)) if files else 0)
+    for index, path in enumerate(changed):
+        if pattern == 'edits':
+            with open(path, 'ab') as file:
+                file.write(b'churn')
+        elif pattern == 'renames':
+            path.rename(path.with_name(f'renamed_{index}_{path.name}'))
+        elif pattern == 'deletes':
+            path.unlink()
+        else:
+            raise ValueError(f'Unknown churn pattern {pattern}')
+
+    return len(changed)
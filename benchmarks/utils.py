@@ -0,0 +1,112 @@
+import logging
+import os
+import pathlib
+import resource
+import time
+import typing
+
+
+def make_tree(
+        root: pathlib.Path,
+        files: int,
+        files_per_dir: int = 1000,
+        file_size: int = 64
+) -> None:
+    """
+    Generate flat synthetic tree.
+
+    :param pathlib.Path root: Tree root directory.
+    :param int files: Number of files to create.
+    :param int files_per_dir: Number of files in a single directory.
+    :param int file_size: Size of each file in bytes.
+    """
+
+    payload = b'x' * file_size
+    for index in range(files):
+        directory = root / f'dir_{index // files_per_dir}'
+        if index % files_per_dir == 0:
+            directory.mkdir(parents=True, exist_ok=True)
+        (directory / f'file_{index}.txt').write_bytes(payload)
+
+
+def make_large_files(
+        root: pathlib.Path,
+        files: int,
+        file_size: int,
+        chunk_size: int = 1024 * 1024
+) -> None:
+    """
+    Generate directory with few large files written in chunks.
+
+    :param pathlib.Path root: Directory path.
+    :param int files: Number of files to create.
+    :param int file_size: Size of each file in bytes.
+    :param int chunk_size: Size of a single written chunk.
+    """
+
+    root.mkdir(parents=True, exist_ok=True)
+    chunk = os.urandom(chunk_size)
+    for index in range(files):
+        with open(root / f'large_{index}.bin', 'wb') as file:
+            for offset in range(0, file_size, chunk_size):
+                file.write(chunk[:file_size - offset])
+
+
+def peak_rss() -> int:
+    """
+    Get peak resident set size of current process.
+    :return: int Peak RSS in kilobytes.
+    """
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Measurement(typing.NamedTuple):
+    """Result of measured call."""
+
+    elapsed: float
+    bytes_read: int
+    bytes_written: int
+    read_syscalls: int = 0
+    write_syscalls: int = 0
+
+
+def io_counters() -> dict[str, int]:
+    """
+    Get I/O counters of current process.
+    :return: dict[str, int] Counters from /proc/self/io (rchar, wchar, syscr, ...).
+    """
+
+    counters = {}
+    for line in pathlib.Path('/proc/self/io').read_text().splitlines():
+        name, value = line.split(':')
+        counters[name] = int(value)
+
+    return counters
+
+
+def measure(function: typing.Callable, *args, **kwargs) -> Measurement:
+    """
+    Measure wall time, bytes read and written and read and write syscalls made by the call.
+
+    :param typing.Callable function: Measured callable.
+    :return: Measurement Wall time in seconds, bytes read and written and read and write syscalls.
+    """
+
+    logging.disable(logging.CRITICAL)
+    before = io_counters()
+    start = time.perf_counter()
+    try:
+        function(*args, **kwargs)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    elapsed = time.perf_counter() - start
+    after = io_counters()
+    return Measurement(
+        elapsed,
+        after['rchar'] - before['rchar'],
+        after['wchar'] - before['wchar'],
+        after['syscr'] - before['syscr'],
+        after['syscw'] - before['syscw'],
+    )
@@ -1,33 +1,195 @@
 import argparse
-import logging
 import pathlib
-import schedule
 
+from src.async_synchronizer import AsyncSynchronizer
+from src.backend import ReplicaBackend
+from src.config import load_config, load_limits
+from src.daemon import Daemon
+from src.fanout import FanOutSynchronizer
 from src.file import DirFile
+from src.filters import FileFilter, collect_rules
+from src.index import SyncIndex
+from src.logs import setup_logging
+from src.metrics import Metrics, MetricsExporter, MetricsServer
+from src.remote import RemoteBackend
+from src.runtime import Runtime
+from src.scanner import scan
 from src.synchronizer import Synchronizer
+from src.throttle import Throttle
+from src.watcher import InotifyWatcher
 
 import src.settings as settings
 
 parser = argparse.ArgumentParser(description='')
 
+
+def watch(
+        sync: Synchronizer | FanOutSynchronizer,
+        watcher: InotifyWatcher,
+        runtime: Runtime
+):
+    """Synchronize paths reported by watcher until next full rescan deadline."""
+
+    def idle(timeout: float):
+        paths, overflow = watcher.collect(timeout=timeout, wakeup_fd=runtime.wakeup_fd)
+        if overflow:
+            runtime.trigger()
+        elif paths and not runtime.stopped.is_set():
+            runtime.run_cycle(lambda: sync.sync_paths(paths))
+
+    runtime.run(sync.sync, idle=idle)
+
+
+def run_daemon(config_path: pathlib.Path):
+    """Synchronize all pairs listed in config file until stopped."""
+
+    daemon = Daemon(load_config(config_path), config_path)
+    daemon.install_signal_handlers()
+    try:
+        daemon.initialize()
+        daemon.run()
+    finally:
+        daemon.close()
+
+
+def create_filter(args: argparse.Namespace) -> FileFilter | None:
+    """Create filter of source files given on command line."""
+
+    return FileFilter.create(
+        args.source_dir.resolve(),
+        collect_rules(args.filter_file, args.exclude, args.include),
+        args.min_size,
+        args.max_size,
+        args.min_age,
+        args.max_age
+    )
+
+
+def create_backend(args: argparse.Namespace, replica_dir: pathlib.Path) -> ReplicaBackend | None:
+    """Connect to replica server given on command line, None for local replica."""
+
+    if args.remote is None:
+        return None
+    token = args.remote_token_file.read_text().strip() if args.remote_token_file is not None else None
+    return RemoteBackend(args.remote, replica_dir, token)
+
+
+def run(args: argparse.Namespace):
+    """Synchronize source with replicas given on command line until stopped."""
+
+    replica_dirs = [replica_dir.resolve() for replica_dir in args.replica_dir]
+    metrics = Metrics(
+        args.source_dir.resolve(),
+        ','.join(str(replica_dir) for replica_dir in replica_dirs),
+        args.rescan_interval if args.watch else args.interval
+    )
+    exporter = MetricsExporter(args.metrics_file, args.metrics_log)
+    exporter.register(metrics)
+    metrics_server = MetricsServer(exporter, args.metrics_port) if args.metrics_port is not None else None
+    throttle = Throttle(args.bandwidth_limit or None, args.iops_limit or None)
+    if args.limits_file is not None:
+        throttle.configure(*load_limits(args.limits_file))
+        throttle.install_reload_handler(lambda: load_limits(args.limits_file))
+    file_filter = create_filter(args)
+    if len(replica_dirs) > 1:
+        sync = FanOutSynchronizer(
+            DirFile(args.source_dir.resolve()),
+            [DirFile(replica_dir) for replica_dir in replica_dirs],
+            checksum=args.checksum,
+            indexes=[SyncIndex.for_replica(replica_dir) for replica_dir in replica_dirs],
+            workers=args.workers,
+            delta_threshold=args.delta_threshold or None,
+            metrics=metrics,
+            throttle=throttle,
+            prune_scan=args.prune_scan,
+            scan_workers=args.scan_workers,
+            file_filter=file_filter,
+            scrub_period=args.scrub_period * 3600 or None,
+            durability=args.durability
+        )
+    else:
+        synchronizer_class = AsyncSynchronizer if args.streaming else Synchronizer
+        sync = synchronizer_class(
+            DirFile(args.source_dir.resolve()),
+            DirFile(replica_dirs[0]),
+            checksum=args.checksum,
+            index=SyncIndex.for_replica(replica_dirs[0]),
+            workers=args.workers,
+            delta_threshold=args.delta_threshold or None,
+            dedup=args.dedup,
+            metrics=metrics,
+            throttle=throttle,
+            prune_scan=args.prune_scan,
+            scan_workers=args.scan_workers,
+            file_filter=file_filter,
+            scrub_period=args.scrub_period * 3600 or None,
+            backend=create_backend(args, replica_dirs[0]),
+            durability=args.durability
+        )
+    runtime = Runtime(args.rescan_interval if args.watch else args.interval)
+    runtime.install_signal_handlers()
+    watcher = InotifyWatcher(args.source_dir.resolve(), file_filter=file_filter) if args.watch else None
+    sync.initialize()
+
+    try:
+        if watcher is not None:
+            watch(sync, watcher, runtime)
+        else:
+            runtime.run(sync.sync)
+    finally:
+        if watcher is not None:
+            watcher.close()
+        sync.close()
+        runtime.close()
+        if metrics_server is not None:
+            metrics_server.close()
+
+
+def dry_run(args: argparse.Namespace):
+    """Print plan of initial synchronization of every replica given on command line without touching it."""
+
+    source = DirFile(args.source_dir.resolve())
+    file_filter = create_filter(args)
+    files = scan(source, file_filter=file_filter)
+    for replica_dir in args.replica_dir:
+        replica_dir = replica_dir.resolve()
+        index_path = SyncIndex.path_for(replica_dir)
+        sync = Synchronizer(
+            source,
+            DirFile(replica_dir),
+            index=SyncIndex(index_path, read_only=True) if index_path.exists() else None,
+            delta_threshold=args.delta_threshold or None,
+            dedup=args.dedup,
+            file_filter=file_filter,
+            backend=create_backend(args, replica_dir)
+        )
+        print(sync.plan_initialize(files).format())
+        sync.close()
+
+
 def main():
     parser.add_argument(
         '--source-dir',
         type=pathlib.Path,
-        required=True,
-        help='Required. Path to source directory.'
+        help='Required unless --config is given. Path to source directory.'
     )
     parser.add_argument(
         '--replica-dir',
         type=pathlib.Path,
-        required=True,
-        help='Required. Path to replica directory.'
+        nargs='+',
+        help='Required unless --config is given. Path to replica directory, '
+             'many replicas are synchronized from single source scan.'
+    )
+    parser.add_argument(
+        '--config',
+        type=pathlib.Path,
+        help='Optional. TOML file listing source/replica pairs synchronized by single daemon.'
     )
     parser.add_argument(
         '--interval',
         type=int,
-        default=30,
-        help='Optional. Synchronization interval in seconds. Default 30 seconds.'
+        default=settings.DEFAULT_INTERVAL,
+        help=f'Optional. Synchronization interval in seconds. Default {settings.DEFAULT_INTERVAL} seconds.'
     )
     parser.add_argument(
         '--log-file',
@@ -41,30 +203,198 @@ def main():
         choices=settings.LOGGING_LEVELS,
         help='Optional. Set the logging level',
     )
-    args = parser.parse_args(namespace=parser)
-
-    logging.basicConfig(
-        level=logging.getLevelName(args.log_level),
-        format='%(asctime)s - [ %(levelname)s ] - %(message)s',
-        handlers=[
-            logging.FileHandler(args.log_file.resolve()),
-            logging.StreamHandler()
-        ],
-        datefmt='%Y-%m-%d %H:%M:%S',
+    parser.add_argument(
+        '--log-summary',
+        action='store_true',
+        help='Optional. Log summary of every cycle instead of every file operation, for large trees.'
     )
-
-    sync = Synchronizer(
-        DirFile(args.source_dir.resolve()),
-        DirFile(args.replica_dir.resolve())
+    parser.add_argument(
+        '--checksum',
+        action='store_true',
+        help='Optional. Compare content of every file on each sync instead of relying on file metadata.'
     )
-    sync.initialize()
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Optional. Number of threads copying, moving and deleting files. Default 1.'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Optional. Synchronize changed paths reported by inotify instead of polling every interval (Linux only).'
+    )
+    parser.add_argument(
+        '--rescan-interval',
+        type=int,
+        default=settings.DEFAULT_RESCAN_INTERVAL,
+        help=f'Optional. Full rescan interval in seconds in watch mode. Default {settings.DEFAULT_RESCAN_INTERVAL} seconds.'
+    )
+    parser.add_argument(
+        '--delta-threshold',
+        type=int,
+        default=settings.DELTA_THRESHOLD,
+        help='Optional. Minimal size in bytes of changed file updated in place block by block, 0 disables. '
+             f'Default {settings.DELTA_THRESHOLD} bytes.'
+    )
+    parser.add_argument(
+        '--streaming',
+        action='store_true',
+        help='Optional. Copy changes while the source tree is still being scanned.'
+    )
+    parser.add_argument(
+        '--dedup',
+        action='store_true',
+        help='Optional. Share data of replica files with identical content (reflinks or hardlinks) '
+             'and keep source hardlinks as hardlinks.'
+    )
+    parser.add_argument(
+        '--metrics-file',
+        type=pathlib.Path,
+        help='Optional. Prometheus text format file with sync metrics, rewritten after every cycle.'
+    )
+    parser.add_argument(
+        '--metrics-log',
+        type=pathlib.Path,
+        help='Optional. File to which JSON summary of every cycle is appended.'
+    )
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        help='Optional. Serve sync metrics in Prometheus text format on http://127.0.0.1:PORT/metrics.'
+    )
+    parser.add_argument(
+        '--prune-scan',
+        default='off',
+        choices=settings.PRUNE_SCAN_MODES,
+        help='Optional. Reuse listings of directories which modification time did not change: stat their children, '
+             'or with trust reuse snapshots of their files too, missing content changed in place. Default off.'
+    )
+    parser.add_argument(
+        '--scan-workers',
+        type=int,
+        default=0,
+        help='Optional. Number of processes scanning source subtrees in parallel, in checksum mode hashing them too. '
+             'Default 0, scanning in the main process.'
+    )
+    parser.add_argument(
+        '--exclude',
+        nargs='+',
+        action='extend',
+        default=[],
+        metavar='PATTERN',
+        help='Optional. Gitignore-style patterns of source paths which are not replicated, '
+             'excluded directories are not scanned at all.'
+    )
+    parser.add_argument(
+        '--include',
+        nargs='+',
+        action='extend',
+        default=[],
+        metavar='PATTERN',
+        help='Optional. Gitignore-style patterns of paths replicated even if they match --exclude or --filter-file.'
+    )
+    parser.add_argument(
+        '--filter-file',
+        type=pathlib.Path,
+        help='Optional. Gitignore-style file of rules, --exclude and --include patterns take precedence over it.'
+    )
+    parser.add_argument(
+        '--min-size',
+        type=int,
+        help='Optional. Files smaller than given number of bytes are not replicated.'
+    )
+    parser.add_argument(
+        '--max-size',
+        type=int,
+        help='Optional. Files larger than given number of bytes are not replicated.'
+    )
+    parser.add_argument(
+        '--min-age',
+        type=float,
+        help='Optional. Files modified less than given number of seconds ago are not replicated yet.'
+    )
+    parser.add_argument(
+        '--max-age',
+        type=float,
+        help='Optional. Files modified more than given number of seconds ago are not replicated.'
+    )
+    parser.add_argument(
+        '--scrub-period',
+        type=float,
+        default=0,
+        help='Optional. Verify content of the whole replica against the index once per given number of hours, '
+             'slice by slice after every sync, and copy mismatching files again. 0 disables. Default 0.'
+    )
+    parser.add_argument(
+        '--remote',
+        help='Optional. Address of replica server (python -m src.remote) storing the replica on another host, '
+             'tcp://host:port or unix:///path/to/socket. --replica-dir then names the replica locally, '
+             'its index is stored next to it. Connection is not encrypted, use TCP on loopback or trusted '
+             'network only.'
+    )
+    parser.add_argument(
+        '--remote-token-file',
+        type=pathlib.Path,
+        help='Optional. File with shared secret the replica server was started with.'
+    )
+    parser.add_argument(
+        '--durability',
+        default=settings.DEFAULT_DURABILITY,
+        choices=settings.DURABILITY_MODES,
+        help='Optional. Flushing of replica writes to disk: none leaves it to the system, batch flushes the replica '
+             'filesystem once per cycle, strict flushes every file and its directory after the atomic rename. '
+             f'Durability of --remote replica is set on the replica server. Default {settings.DEFAULT_DURABILITY}.'
+    )
+    parser.add_argument(
+        '--bandwidth-limit',
+        type=int,
+        default=0,
+        help='Optional. Maximal number of bytes written to replicas per second, 0 for unlimited. Default 0.'
+    )
+    parser.add_argument(
+        '--iops-limit',
+        type=int,
+        default=0,
+        help='Optional. Maximal number of file writes, moves and deletions per second, 0 for unlimited. Default 0.'
+    )
+    parser.add_argument(
+        '--limits-file',
+        type=pathlib.Path,
+        help='Optional. TOML file with bandwidth_limit and iops_limit overriding the options above, '
+             'reloaded on SIGHUP.'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Optional. Print operations the initial synchronization would run and exit without touching the replica.'
+    )
+    args = parser.parse_args(namespace=parser)
+    if args.config is None and (args.source_dir is None or args.replica_dir is None):
+        parser.error('--source-dir and --replica-dir are required unless --config is given.')
+    if args.replica_dir is not None and len(args.replica_dir) > 1 and args.streaming:
+        parser.error('--streaming supports single replica only.')
+    if args.replica_dir is not None and len(args.replica_dir) > 1 and args.dedup:
+        parser.error('--dedup supports single replica only.')
+    if args.remote is not None and (args.replica_dir is None or len(args.replica_dir) > 1 or args.dedup):
+        parser.error('--remote supports single --replica-dir without --dedup only.')
+    if args.remote is not None and args.durability != 'none':
+        parser.error('--durability of --remote replica is set on the replica server.')
+    if args.scan_workers > 1 and args.prune_scan != 'off':
+        parser.error('--scan-workers can not be combined with --prune-scan.')
+    if args.config is not None and args.dry_run:
+        parser.error('--dry-run supports --source-dir and --replica-dir only.')
 
-    schedule.every(args.interval).seconds.do(sync.sync)
-    while True:
-        try:
-            schedule.run_pending()
-        except KeyboardInterrupt:
-            logging.info('Stopping synchronizer.')
+    listener = setup_logging(args.log_level, args.log_file.resolve(), summary=args.log_summary)
+    try:
+        if args.dry_run:
+            dry_run(args)
+        elif args.config is not None:
+            run_daemon(args.config)
+        else:
+            run(args)
+    finally:
+        listener.stop()
 
 if __name__ == '__main__':
     main()
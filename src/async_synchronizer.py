@@ -0,0 +1,155 @@
+import asyncio
+import functools
+import logging
+
+import src.settings as settings
+from src.file import DirFile, TextFile
+from src.scanner import iter_scan
+from src.sharded_scanner import iter_sharded_scan
+from src.synchronizer import Synchronizer
+
+
+class AsyncSynchronizer(Synchronizer):
+    """Synchronizer streaming scan results through diff stage to copy workers."""
+
+    def __init__(
+            self,
+            *args,
+            scan_queue_size: int = settings.SCAN_QUEUE_SIZE,
+            copy_queue_size: int = settings.COPY_QUEUE_SIZE,
+            **kwargs
+    ) -> None:
+        """
+        Init AsyncSynchronizer class, accepting Synchronizer arguments.
+
+        :param int scan_queue_size: Maximum number of scanned directory listings waiting for the diff stage.
+        :param int copy_queue_size: Maximum number of copy tasks waiting for copy workers.
+        """
+
+        super().__init__(*args, **kwargs)
+        self.scan_queue_size: int = scan_queue_size
+        self.copy_queue_size: int = copy_queue_size
+        self.copy_workers: int = max(self.pool.workers, 1)
+
+    def sync(self) -> None:
+        """Run source and replica dir synchronization on event loop."""
+
+        asyncio.run(self.sync_async())
+
+    async def sync_async(self) -> None:
+        """
+        Run source and replica dir synchronization, copying changes while the scan is still running.
+
+        New files and changed content of files which stayed in place are replicated as soon as they are scanned.
+        Moves, deletions and files depending on them need the whole scan and are applied afterwards.
+        """
+
+        logging.info(f'Synchronizing {self.source.path} with {self.replica.path}')
+        with self.metrics.cycle('sync'):
+            saved_files_ids = set(self.tracked_files.keys())
+            self.source_paths = {}
+            links = self.reset_links()
+
+            scan_queue = asyncio.Queue(self.scan_queue_size)
+            copy_queue = asyncio.Queue(self.copy_queue_size)
+            with self.metrics.phase('stream'):
+                async with asyncio.TaskGroup() as group:
+                    group.create_task(self.scan_tree(scan_queue))
+                    workers = [group.create_task(self.copy_worker(copy_queue)) for _ in range(self.copy_workers)]
+                    scanned_files_ids, handled_files_ids = await self.diff(scan_queue, copy_queue)
+                    for _ in workers:
+                        await copy_queue.put(None)
+            self.metrics.count('files_scanned', len(scanned_files_ids))
+            if self.scan_cache is not None:
+                self.metrics.count('dirs_listed', self.scan_cache.listed)
+                self.metrics.count('dirs_reused', self.scan_cache.reused)
+
+            self.remove_links(links)
+            self.apply_changes(saved_files_ids, scanned_files_ids, handled_files_ids)
+            self.scrub()
+
+    async def scan_tree(self, scan_queue: asyncio.Queue) -> None:
+        """
+        Scan source tree on worker thread, putting every directory listing or scanned subtree to the queue.
+
+        :param asyncio.Queue scan_queue: Queue of scanned files batches, None marks end of the scan.
+        """
+
+        if self.scan_executor is not None:
+            batches = iter_sharded_scan(
+                self.source, self.scan_executor, self.scan_workers, digests=self.checksum, file_filter=self.file_filter
+            )
+        else:
+            batches = iter_scan(self.source, self.scan_cache, self.file_filter)
+        while (files := await asyncio.to_thread(next, batches, None)) is not None:
+            await scan_queue.put(files)
+        await scan_queue.put(None)
+
+    async def diff(
+            self,
+            scan_queue: asyncio.Queue,
+            copy_queue: asyncio.Queue
+    ) -> tuple[set[int], set[int]]:
+        """
+        Track scanned files, sending tasks of files which can be replicated right away to copy workers.
+
+        File is replicated during the scan only when its parent directory replica is already in place
+        and it is either new with a free replica path or tracked with unchanged path and type.
+
+        :param asyncio.Queue scan_queue: Queue of scanned files batches.
+        :param asyncio.Queue copy_queue: Queue of copy tasks.
+        :return: tuple[set[int], set[int]] Ids of scanned files and ids of files handled during the scan.
+        """
+
+        scanned_files_ids = set()
+        handled_files_ids = set()
+        settled_dirs = set()
+
+        while (files := await scan_queue.get()) is not None:
+            self.metrics.queue_depth('scan', scan_queue.qsize())
+            self.metrics.queue_depth('copy', copy_queue.qsize())
+            for file in files:
+                file_id = file.get_id()
+                tracked = self.tracked_files.get(file_id)
+                self.save_tracked_file(file)
+                scanned_files_ids.add(file_id)
+
+                if file.path != self.source.path and file.path.parent not in settled_dirs:
+                    continue
+
+                if tracked is None:
+                    if isinstance(file, TextFile) and not self.accepts_content(file):
+                        continue
+                    if await asyncio.to_thread(self.backend.exists, self.replica.path / file.path.relative_to(self.source.path)):
+                        continue
+                    function, args, callback = self.replica_task(file)
+                    if isinstance(file, DirFile):
+                        callback(await asyncio.to_thread(function, *args))
+                    else:
+                        await copy_queue.put((function, args, callback))
+                elif tracked.replica is None or type(tracked.replica) is not type(file) or self.is_moved(tracked):
+                    continue
+                elif isinstance(file, TextFile):
+                    task = self.content_task(tracked)
+                    if task is not None:
+                        await copy_queue.put(task)
+
+                handled_files_ids.add(file_id)
+                if isinstance(file, DirFile):
+                    settled_dirs.add(file.path)
+
+        return scanned_files_ids, handled_files_ids
+
+    async def copy_worker(self, copy_queue: asyncio.Queue) -> None:
+        """
+        Run copy tasks from the queue on worker threads, with callbacks run on event loop.
+
+        Tasks run on executor of the task pool if it has one, so limits of shared pool apply.
+
+        :param asyncio.Queue copy_queue: Queue of copy tasks, None stops the worker.
+        """
+
+        loop = asyncio.get_running_loop()
+        while (task := await copy_queue.get()) is not None:
+            function, args, callback = task
+            callback(await loop.run_in_executor(self.pool.executor, functools.partial(function, *args)))
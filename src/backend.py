@@ -0,0 +1,302 @@
+import os
+import pathlib
+import stat
+import typing
+
+from src.durability import Durability
+from src.file import DirFile, TextFile
+from src.transfer import files_equal, hash_file
+
+
+class ReplicaStat(typing.NamedTuple):
+    """Metadata of replica file returned by the backend."""
+
+    mode: int
+    size: int
+    mtime_ns: int
+    nlink: int = 1
+
+    @classmethod
+    def from_stat(cls, stat_result: os.stat_result) -> 'ReplicaStat':
+        """
+        Build replica metadata from stat result.
+
+        :param os.stat_result stat_result: Result of stat call.
+        :return: ReplicaStat Replica file metadata.
+        """
+
+        return cls(stat_result.st_mode, stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_nlink)
+
+    @property
+    def is_dir(self) -> bool:
+        return stat.S_ISDIR(self.mode)
+
+
+class ReplicaBackend:
+    """
+    Storage of the replica tree, covering every operation synchronizer runs on the replica.
+
+    Paths are absolute paths below the replica directory, missing files raise FileNotFoundError as local calls do.
+    """
+
+    def stat(
+            self,
+            path: pathlib.Path,
+            follow_symlinks: bool = True
+    ) -> ReplicaStat:
+        """
+        Get metadata of replica file.
+
+        :param pathlib.Path path: Replica path.
+        :param bool follow_symlinks: Metadata of symlink target instead of the link.
+        :return: ReplicaStat Replica file metadata.
+        """
+
+        raise NotImplementedError
+
+    def listdir(self, path: pathlib.Path) -> list[tuple[str, ReplicaStat]]:
+        """
+        List replica directory with metadata of its children, symlinks are not followed.
+
+        :param pathlib.Path path: Replica directory path.
+        :return: list[tuple[str, ReplicaStat]] Names and metadata of children.
+        """
+
+        raise NotImplementedError
+
+    def mkdir(self, path: pathlib.Path) -> None:
+        """
+        Create replica directory together with missing parents.
+
+        :param pathlib.Path path: Replica directory path.
+        """
+
+        raise NotImplementedError
+
+    def write(self, replica_file: TextFile) -> int:
+        """
+        Write content of origin file to the replica, the same way TextFile.create does.
+
+        Digest and block hashes of the replica file are updated as by TextFile.create.
+
+        :param TextFile replica_file: Replica file with origin set.
+        :return: int Number of written bytes.
+        """
+
+        raise NotImplementedError
+
+    def rename(
+            self,
+            path: pathlib.Path,
+            new_path: pathlib.Path
+    ) -> None:
+        """
+        Rename replica file, creating missing parents of the new path.
+
+        :param pathlib.Path path: Replica path.
+        :param pathlib.Path new_path: New replica path.
+        """
+
+        raise NotImplementedError
+
+    def delete(
+            self,
+            path: pathlib.Path,
+            is_dir: bool
+    ) -> None:
+        """
+        Delete replica file, directories together with their content.
+
+        :param pathlib.Path path: Replica path.
+        :param bool is_dir: Path is directory.
+        """
+
+        raise NotImplementedError
+
+    def set_mtime(
+            self,
+            path: pathlib.Path,
+            mtime_ns: int
+    ) -> None:
+        """
+        Set modification time of replica file, keeping its access time.
+
+        :param pathlib.Path path: Replica path.
+        :param int mtime_ns: Modification time in nanoseconds.
+        """
+
+        raise NotImplementedError
+
+    def digest(self, path: pathlib.Path) -> bytes:
+        """
+        Compute content digest of replica file.
+
+        :param pathlib.Path path: Replica path.
+        :return: bytes Replica content digest.
+        """
+
+        raise NotImplementedError
+
+    def content_equal(
+            self,
+            path: pathlib.Path,
+            origin: pathlib.Path
+    ) -> bool:
+        """
+        Compare content of replica file with local file.
+
+        :param pathlib.Path path: Replica path.
+        :param pathlib.Path origin: Local file.
+        :return: bool True if contents are equal.
+        """
+
+        return self.digest(path) == hash_file(origin)
+
+    def flush(self) -> int:
+        """
+        Flush replica changes made since the previous flush to disk, as configured durability requires.
+
+        :return: int Number of flush calls made since the previous flush.
+        """
+
+        return 0
+
+    def close(self) -> None:
+        """Release resources of the backend."""
+
+    def exists(self, path: pathlib.Path) -> bool:
+        """
+        Check if replica path exists, broken symlinks included.
+
+        :param pathlib.Path path: Replica path.
+        :return: bool True if path exists.
+        """
+
+        try:
+            self.stat(path, follow_symlinks=False)
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+        return True
+
+    def is_dir(self, path: pathlib.Path) -> bool:
+        """
+        Check if replica path is directory, following symlinks.
+
+        :param pathlib.Path path: Replica path.
+        :return: bool True if path is directory.
+        """
+
+        try:
+            return self.stat(path).is_dir
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+
+    def is_single_link(self, path: pathlib.Path) -> bool:
+        """
+        Check if replica path is an existing regular file with no other hardlinks.
+
+        :param pathlib.Path path: Replica path.
+        :return: bool True if file can be written in place.
+        """
+
+        try:
+            replica_stat = self.stat(path)
+        except FileNotFoundError:
+            return False
+
+        return stat.S_ISREG(replica_stat.mode) and replica_stat.nlink == 1
+
+    def walk(self, path: pathlib.Path) -> typing.Iterator[tuple[pathlib.Path, list[str], list[str]]]:
+        """
+        Walk replica tree top-down as os.walk does, directories removed from the yielded list are not entered.
+
+        :param pathlib.Path path: Replica directory path.
+        :return: typing.Iterator Directory path, names of its directories and names of other files.
+        """
+
+        stack = [path]
+        while stack:
+            root = stack.pop()
+            try:
+                children = self.listdir(root)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+            dirs = [name for name, child_stat in children if child_stat.is_dir]
+            files = [name for name, child_stat in children if not child_stat.is_dir]
+            yield root, dirs, files
+            stack.extend(root / name for name in reversed(dirs))
+
+
+class LocalBackend(ReplicaBackend):
+    """Replica stored on local filesystem, written through DirFile and TextFile."""
+
+    def __init__(self, durability: Durability | None = None) -> None:
+        """
+        Init LocalBackend class.
+
+        :param Durability | None durability: Flushing of replica changes to disk, by default left to the kernel.
+        """
+
+        self.durability: Durability = durability or Durability()
+
+    def stat(
+            self,
+            path: pathlib.Path,
+            follow_symlinks: bool = True
+    ) -> ReplicaStat:
+        return ReplicaStat.from_stat(os.stat(path, follow_symlinks=follow_symlinks))
+
+    def listdir(self, path: pathlib.Path) -> list[tuple[str, ReplicaStat]]:
+        with os.scandir(path) as entries:
+            return [(entry.name, ReplicaStat.from_stat(entry.stat(follow_symlinks=False))) for entry in entries]
+
+    def mkdir(self, path: pathlib.Path) -> None:
+        DirFile(path).create()
+        self.durability.dir_changed(path.parent)
+
+    def write(self, replica_file: TextFile) -> int:
+        replica_file.durability = self.durability
+        return replica_file.create()
+
+    def rename(
+            self,
+            path: pathlib.Path,
+            new_path: pathlib.Path
+    ) -> None:
+        TextFile(path).move(new_path)
+        self.durability.dir_changed(path.parent)
+        if new_path.parent != path.parent:
+            self.durability.dir_changed(new_path.parent)
+
+    def delete(
+            self,
+            path: pathlib.Path,
+            is_dir: bool
+    ) -> None:
+        (DirFile(path) if is_dir else TextFile(path)).remove()
+        self.durability.dir_changed(path.parent)
+
+    def set_mtime(
+            self,
+            path: pathlib.Path,
+            mtime_ns: int
+    ) -> None:
+        os.utime(path, ns=(path.stat().st_atime_ns, mtime_ns))
+
+    def digest(self, path: pathlib.Path) -> bytes:
+        return hash_file(path)
+
+    def content_equal(
+            self,
+            path: pathlib.Path,
+            origin: pathlib.Path
+    ) -> bool:
+        return files_equal(origin, path)
+
+    def flush(self) -> int:
+        return self.durability.flush()
+
+    def walk(self, path: pathlib.Path) -> typing.Iterator[tuple[pathlib.Path, list[str], list[str]]]:
+        for root, dirs, files in os.walk(path):
+            yield pathlib.Path(root), dirs, files
@@ -0,0 +1,256 @@
+import pathlib
+import tomllib
+import typing
+
+from src.filters import collect_rules
+from src.remote import parse_address
+
+import src.settings as settings
+
+
+class PairConfig(typing.NamedTuple):
+    """Source and replica pair synchronized by the daemon, with its own options."""
+
+    source_dir: pathlib.Path
+    replica_dir: pathlib.Path
+    interval: float = settings.DEFAULT_INTERVAL
+    checksum: bool = False
+    delta_threshold: int | None = settings.DELTA_THRESHOLD
+    streaming: bool = False
+    dedup: bool = False
+    prune_scan: str = 'off'
+    scan_workers: int = 0
+    filter_rules: tuple[str, ...] = ()
+    min_size: int | None = None
+    max_size: int | None = None
+    min_age: float | None = None
+    max_age: float | None = None
+    scrub_period: float | None = None
+    remote: str | None = None
+    remote_token: str | None = None
+    durability: str = settings.DEFAULT_DURABILITY
+
+
+class DaemonConfig(typing.NamedTuple):
+    """Daemon configuration loaded from config file."""
+
+    pairs: list[PairConfig]
+    workers: int = settings.DEFAULT_DAEMON_WORKERS
+    io_limit: int = settings.DEFAULT_IO_LIMIT
+    metrics_file: pathlib.Path | None = None
+    metrics_log: pathlib.Path | None = None
+    metrics_port: int | None = None
+    bandwidth_limit: int | None = None
+    iops_limit: int | None = None
+
+
+def load_config(path: pathlib.Path) -> DaemonConfig:
+    """
+    Load daemon configuration from TOML file.
+
+    Relative paths of pairs are resolved against directory of the config file.
+
+    :param pathlib.Path path: Path to config file.
+    :return: DaemonConfig Daemon configuration.
+    :raises ValueError: If config file is not valid.
+    """
+
+    with open(path, 'rb') as file:
+        try:
+            data = tomllib.load(file)
+        except tomllib.TOMLDecodeError as error:
+            raise ValueError(f'Invalid config file {path}: {error}') from error
+
+    unknown = set(data) - {
+        'workers', 'io_limit', 'metrics_file', 'metrics_log', 'metrics_port', 'bandwidth_limit', 'iops_limit', 'pair'
+    }
+    if unknown:
+        raise ValueError(f'Unknown config options: {", ".join(sorted(unknown))}')
+
+    pairs = [_load_pair(pair, path.resolve().parent) for pair in data.get('pair', [])]
+    if not pairs:
+        raise ValueError(f'No [[pair]] defined in config file {path}')
+
+    replicas = [pair.replica_dir for pair in pairs]
+    if len(set(replicas)) != len(replicas):
+        raise ValueError('Replica directory can be used by single pair only.')
+
+    workers = data.get('workers', settings.DEFAULT_DAEMON_WORKERS)
+    io_limit = data.get('io_limit', settings.DEFAULT_IO_LIMIT)
+    if not isinstance(workers, int) or workers < 1 or not isinstance(io_limit, int) or io_limit < 1:
+        raise ValueError('Options workers and io_limit have to be positive integers.')
+
+    metrics_port = data.get('metrics_port')
+    if metrics_port is not None and (not isinstance(metrics_port, int) or not 0 <= metrics_port < 65536):
+        raise ValueError('Option metrics_port has to be valid port number.')
+    base_dir = path.resolve().parent
+    metrics_file = (base_dir / data['metrics_file']).resolve() if 'metrics_file' in data else None
+    metrics_log = (base_dir / data['metrics_log']).resolve() if 'metrics_log' in data else None
+
+    return DaemonConfig(pairs, workers, io_limit, metrics_file, metrics_log, metrics_port, *_load_limits(data))
+
+
+def load_limits(path: pathlib.Path) -> tuple[int | None, int | None]:
+    """
+    Load replication limits from TOML file, other options of the file are ignored.
+
+    :param pathlib.Path path: Path to config file.
+    :return: tuple[int | None, int | None] Bandwidth in bytes per second and file operations per second, None for unlimited.
+    :raises ValueError: If config file is not valid.
+    """
+
+    with open(path, 'rb') as file:
+        try:
+            return _load_limits(tomllib.load(file))
+        except tomllib.TOMLDecodeError as error:
+            raise ValueError(f'Invalid config file {path}: {error}') from error
+
+
+def _load_limits(data: dict) -> tuple[int | None, int | None]:
+    """
+    Load replication limits, 0 or missing option means unlimited.
+
+    :param dict data: Config file content.
+    :return: tuple[int | None, int | None] Bandwidth in bytes per second and file operations per second.
+    """
+
+    limits = (data.get('bandwidth_limit', 0), data.get('iops_limit', 0))
+    if any(not isinstance(limit, int) or limit < 0 for limit in limits):
+        raise ValueError('Options bandwidth_limit and iops_limit have to be non-negative integers.')
+
+    return limits[0] or None, limits[1] or None
+
+
+def _load_pair(data: dict, base_dir: pathlib.Path) -> PairConfig:
+    """
+    Load single pair configuration.
+
+    :param dict data: Pair table from config file.
+    :param pathlib.Path base_dir: Directory against which relative paths are resolved.
+    :return: PairConfig Pair configuration.
+    """
+
+    options = set(PairConfig._fields) - {'filter_rules', 'remote_token'} | {
+        'exclude', 'include', 'filter_file', 'remote_token_file'
+    }
+    unknown = set(data) - options
+    if unknown:
+        raise ValueError(f'Unknown pair options: {", ".join(sorted(unknown))}')
+
+    try:
+        source_dir = (base_dir / data['source_dir']).resolve()
+        replica_dir = (base_dir / data['replica_dir']).resolve()
+    except KeyError as error:
+        raise ValueError(f'Pair option {error.args[0]} is required.') from error
+
+    interval = data.get('interval', settings.DEFAULT_INTERVAL)
+    if not isinstance(interval, int | float) or interval <= 0:
+        raise ValueError(f'Interval of pair {source_dir} has to be positive number.')
+
+    prune_scan = data.get('prune_scan', 'off')
+    if prune_scan not in settings.PRUNE_SCAN_MODES:
+        raise ValueError(f'Option prune_scan of pair {source_dir} has to be one of {", ".join(settings.PRUNE_SCAN_MODES)}.')
+
+    scan_workers = data.get('scan_workers', 0)
+    if not isinstance(scan_workers, int) or scan_workers < 0:
+        raise ValueError(f'Option scan_workers of pair {source_dir} has to be non-negative integer.')
+    if scan_workers > 1 and prune_scan != 'off':
+        raise ValueError(f'Options scan_workers and prune_scan of pair {source_dir} can not be combined.')
+
+    filter_rules = _load_filter_rules(data, base_dir, source_dir)
+    limits = {name: data.get(name) for name in ('min_size', 'max_size', 'min_age', 'max_age')}
+    if any(limit is not None and (not isinstance(limit, int | float) or limit < 0) for limit in limits.values()):
+        raise ValueError(f'Options min_size, max_size, min_age and max_age of pair {source_dir} have to be non-negative.')
+    if any(isinstance(limits[name], float) for name in ('min_size', 'max_size')):
+        raise ValueError(f'Options min_size and max_size of pair {source_dir} have to be integers.')
+
+    scrub_period = data.get('scrub_period', 0)
+    if not isinstance(scrub_period, int | float) or scrub_period < 0:
+        raise ValueError(f'Option scrub_period of pair {source_dir} has to be non-negative number of hours.')
+
+    remote, remote_token = _load_remote(data, base_dir, source_dir)
+
+    durability = data.get('durability', settings.DEFAULT_DURABILITY)
+    if durability not in settings.DURABILITY_MODES:
+        raise ValueError(f'Option durability of pair {source_dir} has to be one of {", ".join(settings.DURABILITY_MODES)}.')
+    if remote is not None and durability != 'none':
+        raise ValueError(f'Durability of remote replica of pair {source_dir} is configured by the replica server.')
+
+    return PairConfig(
+        source_dir,
+        replica_dir,
+        interval=interval,
+        checksum=bool(data.get('checksum', False)),
+        delta_threshold=data.get('delta_threshold', settings.DELTA_THRESHOLD) or None,
+        streaming=bool(data.get('streaming', False)),
+        dedup=bool(data.get('dedup', False)),
+        prune_scan=prune_scan,
+        scan_workers=scan_workers,
+        filter_rules=filter_rules,
+        scrub_period=scrub_period * 3600 or None,
+        remote=remote,
+        remote_token=remote_token,
+        durability=durability,
+        **limits
+    )
+
+
+def _load_filter_rules(
+        data: dict,
+        base_dir: pathlib.Path,
+        source_dir: pathlib.Path
+) -> tuple[str, ...]:
+    """
+    Load include/exclude rules of single pair from its filter file and exclude and include lists.
+
+    :param dict data: Pair table from config file.
+    :param pathlib.Path base_dir: Directory against which relative filter file path is resolved.
+    :param pathlib.Path source_dir: Source directory of the pair, used in error messages.
+    :return: tuple[str, ...] Gitignore-style rules, the last matching one decides.
+    """
+
+    exclude = data.get('exclude', [])
+    include = data.get('include', [])
+    if any(not isinstance(patterns, list) or not all(isinstance(pattern, str) for pattern in patterns)
+           for patterns in (exclude, include)):
+        raise ValueError(f'Options exclude and include of pair {source_dir} have to be lists of patterns.')
+
+    filter_file = data.get('filter_file')
+    try:
+        return tuple(collect_rules(base_dir / filter_file if filter_file is not None else None, exclude, include))
+    except OSError as error:
+        raise ValueError(f'Could not read filter file of pair {source_dir}: {error}') from error
+
+
+def _load_remote(
+        data: dict,
+        base_dir: pathlib.Path,
+        source_dir: pathlib.Path
+) -> tuple[str | None, str | None]:
+    """
+    Load address of replica server of single pair and the token read from its token file.
+
+    :param dict data: Pair table from config file.
+    :param pathlib.Path base_dir: Directory against which relative token file path is resolved.
+    :param pathlib.Path source_dir: Source directory of the pair, used in error messages.
+    :return: tuple[str | None, str | None] Server address and token, None for local replica.
+    """
+
+    remote = data.get('remote')
+    if remote is None:
+        if 'remote_token_file' in data:
+            raise ValueError(f'Option remote_token_file of pair {source_dir} requires remote.')
+        return None, None
+    if not isinstance(remote, str):
+        raise ValueError(f'Option remote of pair {source_dir} has to be address string.')
+    parse_address(remote)
+    if data.get('dedup', False):
+        raise ValueError(f'Options remote and dedup of pair {source_dir} can not be combined.')
+
+    token_file = data.get('remote_token_file')
+    if token_file is None:
+        return remote, None
+    try:
+        return remote, (base_dir / token_file).read_text().strip()
+    except OSError as error:
+        raise ValueError(f'Could not read remote token file of pair {source_dir}: {error}') from error
@@ -0,0 +1,175 @@
+import concurrent.futures
+import logging
+import pathlib
+import signal
+import threading
+import time
+import typing
+
+from src.async_synchronizer import AsyncSynchronizer
+from src.config import DaemonConfig, PairConfig, load_limits
+from src.file import DirFile
+from src.filters import FileFilter
+from src.index import SyncIndex
+from src.metrics import Metrics, MetricsExporter, MetricsServer
+from src.pool import TaskPool
+from src.remote import RemoteBackend
+from src.runtime import Runtime
+from src.synchronizer import Synchronizer
+from src.throttle import Throttle
+
+
+class Job(typing.NamedTuple):
+    """Synchronized pair with its synchronizer and schedule."""
+
+    config: PairConfig
+    synchronizer: Synchronizer
+    runtime: Runtime
+
+
+class Daemon:
+    """Daemon scheduling synchronization of many source/replica pairs on shared worker threads."""
+
+    def __init__(
+            self,
+            config: DaemonConfig,
+            config_path: pathlib.Path | None = None
+    ) -> None:
+        """
+        Init daemon and synchronizers of all configured pairs.
+
+        Cycles of all pairs run on shared cycle threads and their file operations on shared I/O threads,
+        so at most io_limit file operations run at once. Every pair may have at most io_limit operations
+        pending, so the shared queue is served in turns between pairs with pending work.
+        Bandwidth and file operation limits apply to all pairs together.
+
+        :param DaemonConfig config: Daemon configuration.
+        :param pathlib.Path | None config_path: Config file from which limits are reloaded on SIGHUP.
+        """
+
+        self.config: DaemonConfig = config
+        self.config_path: pathlib.Path | None = config_path
+        self.throttle: Throttle = Throttle(config.bandwidth_limit, config.iops_limit)
+        self.stopped: threading.Event = threading.Event()
+        self.cycle_executor = concurrent.futures.ThreadPoolExecutor(config.workers, thread_name_prefix='sync-cycle')
+        self.io_executor = concurrent.futures.ThreadPoolExecutor(config.io_limit, thread_name_prefix='sync-io')
+        self.exporter: MetricsExporter = MetricsExporter(config.metrics_file, config.metrics_log)
+        self.jobs: list[Job] = [self.create_job(pair) for pair in config.pairs]
+        self.initialized: set[Synchronizer] = set()
+        self.metrics_server: MetricsServer | None = (
+            MetricsServer(self.exporter, config.metrics_port) if config.metrics_port is not None else None
+        )
+
+    def create_job(self, pair: PairConfig) -> Job:
+        """
+        Create synchronizer of the pair using shared I/O threads.
+
+        :param PairConfig pair: Pair configuration.
+        :return: Job Scheduled pair.
+        """
+
+        synchronizer_class = AsyncSynchronizer if pair.streaming else Synchronizer
+        synchronizer = synchronizer_class(
+            DirFile(pair.source_dir),
+            DirFile(pair.replica_dir),
+            checksum=pair.checksum,
+            index=SyncIndex.for_replica(pair.replica_dir),
+            delta_threshold=pair.delta_threshold,
+            pool=TaskPool(self.config.io_limit, max_pending=self.config.io_limit, executor=self.io_executor),
+            dedup=pair.dedup,
+            metrics=Metrics(pair.source_dir, pair.replica_dir, pair.interval),
+            throttle=self.throttle,
+            prune_scan=pair.prune_scan,
+            scan_workers=pair.scan_workers,
+            file_filter=FileFilter.create(
+                pair.source_dir, pair.filter_rules, pair.min_size, pair.max_size, pair.min_age, pair.max_age
+            ),
+            scrub_period=pair.scrub_period,
+            backend=RemoteBackend(pair.remote, pair.replica_dir, pair.remote_token) if pair.remote is not None else None,
+            durability=pair.durability
+        )
+        self.exporter.register(synchronizer.metrics)
+        return Job(pair, synchronizer, Runtime(pair.interval))
+
+    def install_signal_handlers(self) -> None:
+        """Stop daemon gracefully on SIGTERM and SIGINT, reload bandwidth and file operation limits on SIGHUP."""
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        if self.config_path is not None:
+            self.throttle.install_reload_handler(lambda: load_limits(self.config_path))
+
+    def stop(self, signum: int | None = None, frame=None) -> None:
+        """
+        Request stop, running cycles are finished first.
+
+        :param int | None signum: Number of received signal.
+        """
+
+        if signum is not None:
+            logging.info(f'Received {signal.Signals(signum).name}, stopping after running cycles.')
+        self.stopped.set()
+
+    def initialize(self) -> None:
+        """Initialize all pairs on cycle threads, pair which initialization failed is initialized again by its next cycle."""
+
+        futures = {self.cycle_executor.submit(self.initialize_job, job): job for job in self.jobs}
+        for future, job in futures.items():
+            try:
+                future.result()
+            except Exception:
+                logging.exception(f'Initialization of {job.config.source_dir} failed, retrying on the next cycle.')
+
+    def initialize_job(self, job: Job) -> None:
+        """
+        Initialize synchronization of the pair.
+
+        :param Job job: Scheduled pair.
+        """
+
+        job.synchronizer.initialize()
+        self.initialized.add(job.synchronizer)
+
+    def dispatch(self, job: Job, now: float) -> None:
+        """
+        Run cycle of the pair on cycle threads and schedule the next one.
+
+        Ticks missed while the previous cycle was running are skipped. Pair which is not initialized yet
+        is initialized instead.
+
+        :param Job job: Scheduled pair.
+        :param float now: Current monotonic time.
+        """
+
+        missed = int((now - job.runtime.next_run) // job.runtime.interval)
+        job.runtime.next_run += (missed + 1) * job.runtime.interval
+        logging.debug(f'Dispatching synchronization of {job.config.source_dir}')
+        if job.synchronizer in self.initialized:
+            self.cycle_executor.submit(job.runtime.run_cycle, job.synchronizer.sync)
+        else:
+            self.cycle_executor.submit(job.runtime.run_cycle, lambda: self.initialize_job(job))
+
+    def run(self) -> None:
+        """Run cycles of due pairs until stopped, earliest deadline first."""
+
+        while not self.stopped.is_set():
+            now = time.monotonic()
+            for job in sorted(self.jobs, key=lambda job: job.runtime.next_run):
+                if job.runtime.next_run > now:
+                    break
+                self.dispatch(job, now)
+
+            self.stopped.wait(max(min(job.runtime.next_run for job in self.jobs) - time.monotonic(), 0))
+
+        logging.info('Stopping daemon.')
+
+    def close(self) -> None:
+        """Wait for running cycles and release resources of all pairs."""
+
+        self.cycle_executor.shutdown(cancel_futures=True)
+        for job in self.jobs:
+            job.synchronizer.close()
+            job.runtime.close()
+        self.io_executor.shutdown()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
@@ -0,0 +1,197 @@
+import logging
+import os
+import pathlib
+import stat
+import threading
+import typing
+
+from src.durability import Durability
+from src.file import TextFile
+from src.logs import file_log
+from src.transfer import clone_file, hash_file, link_file
+
+
+class _Copy(typing.NamedTuple):
+    """Replica file known to hold content of given digest."""
+
+    path: pathlib.Path
+    inode: int
+    size: int
+    mtime_ns: int
+
+
+class DedupStore:
+    """
+    Content-addressed store of replica files, sharing data of replicas with identical content.
+
+    Replica is cloned (reflink) from a replica with the same content where filesystem supports it,
+    hardlinked to it otherwise. Hardlinked files share permissions and modification time too, so
+    hardlink is made only to a replica with the same metadata as the origin. Recorded replica is
+    used only while its inode, size and modification time did not change, so a replica rewritten
+    in the meantime is never linked.
+
+    Origin is hashed upfront only when a replica of the same size is recorded, other content is
+    hashed while it is copied, so it is read once.
+    """
+
+    def __init__(self, durability: Durability | None = None) -> None:
+        """
+        Init DedupStore class.
+
+        :param Durability | None durability: Flushing of linked replicas to disk, by default left to the kernel.
+        """
+
+        self.durability: Durability = durability or Durability()
+        self.copies: dict[bytes, _Copy] = {}
+        self.sizes: set[int] = set()
+        self.lock: threading.Lock = threading.Lock()
+        self.reflinks: int = 0
+        self.hardlinks: int = 0
+        self.bytes_saved: int = 0
+        self.total_bytes_saved: int = 0
+
+    def write(self, replica_file: TextFile) -> int:
+        """
+        Write content of origin file to the replica, linking it to a replica with identical content if known.
+
+        :param TextFile replica_file: Replica file with origin set.
+        :return: int Number of written bytes, 0 if replica has been linked.
+        """
+
+        with self.lock:
+            known_size = replica_file.origin.stat().st_size in self.sizes
+
+        if known_size:
+            digest = hash_file(replica_file.origin)
+            with self.lock:
+                copy = self.copies.get(digest)
+
+            if copy is not None and copy.path != replica_file.path and self.link(digest, copy, replica_file):
+                replica_file.digest = digest
+                replica_file.blocks = None
+                return 0
+
+        replica_file.compute_digest = True
+        written = replica_file.create()
+        self.add(replica_file.digest, replica_file.path)
+        return written
+
+    def link(
+            self,
+            digest: bytes,
+            copy: _Copy,
+            replica_file: TextFile
+    ) -> bool:
+        """
+        Clone or hardlink replica file to the recorded copy of the same content.
+
+        :param bytes digest: Content digest.
+        :param _Copy copy: Replica file with the same content.
+        :param TextFile replica_file: Replica file with origin set.
+        :return: bool True if replica has been linked, False if the copy is no longer valid or cannot be linked.
+        """
+
+        try:
+            copy_stat = os.lstat(copy.path)
+        except FileNotFoundError:
+            copy_stat = None
+
+        if copy_stat is None or (copy_stat.st_ino, copy_stat.st_size, copy_stat.st_mtime_ns) != (copy.inode, copy.size, copy.mtime_ns):
+            with self.lock:
+                if self.copies.get(digest) is copy:
+                    del self.copies[digest]
+            return False
+
+        replica_file.path.parent.mkdir(exist_ok=True, parents=True)
+        try:
+            clone_file(copy.path, replica_file.path, origin=replica_file.origin)
+            cloned = True
+        except OSError as error:
+            origin_stat = os.stat(replica_file.origin)
+            if (stat.S_IMODE(copy_stat.st_mode), copy_stat.st_mtime_ns) != (stat.S_IMODE(origin_stat.st_mode), origin_stat.st_mtime_ns):
+                file_log.debug('Cloning %s is not supported (%s), metadata of %s differs, copying.', copy.path, error, replica_file.path)
+                return False
+            file_log.debug('Cloning %s is not supported (%s), hardlinking %s.', copy.path, error, replica_file.path)
+            try:
+                link_file(copy.path, replica_file.path)
+            except OSError as error:
+                logging.warning(f'Could not link {replica_file.path} to {copy.path}: {error}')
+                return False
+            cloned = False
+        self.durability.file_written(replica_file.path)
+
+        file_log.info('Content of %s shared with %s', replica_file.path, copy.path)
+        with self.lock:
+            if cloned:
+                self.reflinks += 1
+            else:
+                self.hardlinks += 1
+            self.bytes_saved += copy.size
+        return True
+
+    def link_path(
+            self,
+            path: pathlib.Path,
+            link_path: pathlib.Path
+    ) -> None:
+        """
+        Hardlink replica path to another replica, keeping source hardlinks as hardlinks in the replica.
+
+        :param pathlib.Path path: Existing replica file.
+        :param pathlib.Path link_path: Replica path of other hardlink of the same source file.
+        """
+
+        try:
+            if os.path.samefile(path, link_path):
+                return
+        except FileNotFoundError:
+            pass
+
+        try:
+            link_path.parent.mkdir(exist_ok=True, parents=True)
+            link_file(path, link_path)
+        except OSError as error:
+            logging.warning(f'Could not link {link_path} to {path}: {error}')
+            return
+        self.durability.dir_changed(link_path.parent)
+
+        file_log.info('Linked %s to %s', link_path, path)
+        with self.lock:
+            self.hardlinks += 1
+            self.bytes_saved += os.stat(path).st_size
+
+    def add(
+            self,
+            digest: bytes | None,
+            path: pathlib.Path
+    ) -> None:
+        """
+        Record replica file holding content of given digest.
+
+        :param bytes | None digest: Content digest, nothing is recorded if None.
+        :param pathlib.Path path: Replica file.
+        """
+
+        if digest is None:
+            return
+
+        try:
+            path_stat = os.lstat(path)
+        except FileNotFoundError:
+            return
+
+        with self.lock:
+            self.copies[digest] = _Copy(path, path_stat.st_ino, path_stat.st_size, path_stat.st_mtime_ns)
+            self.sizes.add(path_stat.st_size)
+
+    def report(self) -> None:
+        """Log bytes saved by deduplication since the last report."""
+
+        with self.lock:
+            if self.reflinks or self.hardlinks:
+                self.total_bytes_saved += self.bytes_saved
+                logging.info(
+                    f'Deduplication saved {self.bytes_saved} bytes ({self.reflinks} reflinks, '
+                    f'{self.hardlinks} hardlinks), {self.total_bytes_saved} bytes in total'
+                )
+            self.reflinks = self.hardlinks = self.bytes_saved = 0
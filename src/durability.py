@@ -0,0 +1,110 @@
+import logging
+import pathlib
+import threading
+
+from src.transfer import fsync_path, sync_filesystem
+
+
+class Durability:
+    """
+    Flushing of replica writes to disk, trading throughput for crash safety.
+
+    Mode none leaves flushing to the kernel. Mode batch records changed files and directories and flushes
+    them before every index commit, with single syncfs of the replica filesystem where supported. Mode strict flushes
+    content of every file before its atomic rename and the parent directory after it, so every replica
+    change survives a crash as soon as it is made.
+    """
+
+    def __init__(
+            self,
+            mode: str = 'none',
+            root: pathlib.Path | None = None
+    ) -> None:
+        """
+        Init Durability class.
+
+        :param str mode: Durability level, one of settings.DURABILITY_MODES.
+        :param pathlib.Path | None root: Replica directory, flushed as a whole by batch mode.
+        """
+
+        self.mode: str = mode
+        self.root: pathlib.Path | None = root
+        self.lock: threading.Lock = threading.Lock()
+        self.files: set[pathlib.Path] = set()
+        self.dirs: set[pathlib.Path] = set()
+        self.syncs: int = 0
+
+    @property
+    def strict(self) -> bool:
+        return self.mode == 'strict'
+
+    def file_written(
+            self,
+            path: pathlib.Path,
+            flushed: bool = False
+    ) -> None:
+        """
+        Record replica file written and renamed into place.
+
+        :param pathlib.Path path: Replica file.
+        :param bool flushed: Content has already been flushed by the writer, before the rename.
+        """
+
+        if self.strict:
+            if not flushed:
+                fsync_path(path)
+            fsync_path(path.parent)
+            with self.lock:
+                self.syncs += 2
+        elif self.mode == 'batch':
+            with self.lock:
+                self.files.add(path)
+                self.dirs.add(path.parent)
+
+    def dir_changed(self, path: pathlib.Path) -> None:
+        """
+        Record directory which entries were created, renamed or removed.
+
+        :param pathlib.Path path: Replica directory.
+        """
+
+        if self.strict:
+            fsync_path(path)
+            with self.lock:
+                self.syncs += 1
+        elif self.mode == 'batch':
+            with self.lock:
+                self.dirs.add(path)
+
+    def flush(self) -> int:
+        """
+        Flush changes recorded since the previous flush in batch mode.
+
+        Files and directories are flushed one by one where syncfs is not supported, the ones
+        removed in the meantime are skipped.
+
+        :return: int Number of flush calls made since the previous flush, in any mode.
+        """
+
+        with self.lock:
+            files, self.files = self.files, set()
+            dirs, self.dirs = self.dirs, set()
+
+        if files or dirs:
+            if sync_filesystem(self.root):
+                syncs = 1
+            else:
+                logging.debug('syncfs is not supported, flushing replica files one by one.')
+                syncs = 0
+                for path in [*sorted(files), *sorted(dirs)]:
+                    try:
+                        fsync_path(path)
+                    except (FileNotFoundError, NotADirectoryError):
+                        continue
+                    syncs += 1
+            with self.lock:
+                self.syncs += syncs
+
+        with self.lock:
+            syncs, self.syncs = self.syncs, 0
+        return syncs
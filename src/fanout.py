@@ -0,0 +1,320 @@
+import concurrent.futures
+import logging
+import multiprocessing
+import pathlib
+import threading
+import typing
+
+from src.file import DirFile, TextFile
+from src.filters import FileFilter
+from src.index import SyncIndex
+from src.logs import file_log
+from src.metrics import Metrics
+from src.scanner import ScanCache, scan, scan_paths
+from src.sharded_scanner import sharded_scan
+from src.synchronizer import Synchronizer
+from src.throttle import Throttle
+from src.transfer import ReadFeed, SharedRead, new_digest
+
+import src.settings as settings
+
+
+class _ReplicaSynchronizer(Synchronizer):
+    """Synchronizer of single fan-out replica, writing content through reads shared with the other replicas."""
+
+    def __init__(self, fanout: 'FanOutSynchronizer', *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.fanout: FanOutSynchronizer = fanout
+        self.collected: TextFile | None = None
+
+    def submit_copy(
+            self,
+            function: typing.Callable,
+            args: tuple,
+            callback: typing.Callable
+    ) -> None:
+        """
+        Run task deciding if replica content has to be written, then submit the write to own pool.
+
+        :param typing.Callable function: Task function.
+        :param tuple args: Task arguments.
+        :param typing.Callable callback: Called with task result once content is written.
+        """
+
+        result = function(*args)
+        replica_file, self.collected = self.collected, None
+        if replica_file is None:
+            callback(result)
+            return
+
+        self.metrics.queue_depth('pool', len(self.pool.pending))
+        self.pool.submit(self.write, replica_file, callback=lambda error: self.finish_write(replica_file, error, callback))
+
+    def write(self, replica_file: TextFile) -> OSError | None:
+        """
+        Write replica content from read of its source shared with the other replicas.
+
+        Existing replica updated block by block with delta transfer is written on its own.
+
+        :param TextFile replica_file: Replica file with origin set.
+        :return: OSError | None Error of the write, None if it succeeded.
+        """
+
+        try:
+            size = replica_file.origin.stat().st_size
+        except OSError as error:
+            return error
+        if self.write_kind(replica_file.path, size) == 'delta':
+            return self.fanout.create(replica_file)
+        return self.fanout.write_shared(replica_file)
+
+    def write_content(self, replica_file: TextFile) -> None:
+        """
+        Collect replica which content has to be written.
+
+        :param TextFile replica_file: Replica file with origin set.
+        """
+
+        self.collected = replica_file
+
+    def finish_write(
+            self,
+            replica_file: TextFile,
+            error: OSError | None,
+            callback: typing.Callable
+    ) -> None:
+        """
+        Run callback of written replica, log failed one.
+
+        :param TextFile replica_file: Replica file.
+        :param OSError | None error: Error of the write, None if it succeeded.
+        :param typing.Callable callback: Callback of the write.
+        """
+
+        if error is None:
+            callback(True)
+        else:
+            self.replication_failed(replica_file.path, error)
+
+
+class FanOutSynchronizer:
+    """Synchronizer mirroring single source scan to many replicas."""
+
+    def __init__(
+            self,
+            source_dir: DirFile,
+            replica_dirs: list[DirFile],
+            checksum: bool = False,
+            indexes: list[SyncIndex | None] | None = None,
+            workers: int = 1,
+            delta_threshold: int | None = None,
+            metrics: Metrics | None = None,
+            throttle: Throttle | None = None,
+            prune_scan: str = 'off',
+            scan_workers: int = 0,
+            file_filter: FileFilter | None = None,
+            scrub_period: float | None = None,
+            durability: str = 'none'
+    ) -> None:
+        """
+        Init FanOutSynchronizer class.
+
+        :param DirFile source_dir: Source directory.
+        :param list[DirFile] replica_dirs: Replica directories.
+        :param bool checksum: Compare content of every file on each sync, even if metadata is unchanged.
+        :param list[SyncIndex | None] | None indexes: Persistent index of every replica.
+        :param int workers: Number of threads copying, moving and deleting files of every replica.
+        :param int | None delta_threshold: Minimal size of changed file updated in place block by block.
+        :param Metrics | None metrics: Metrics shared by all replicas, phase durations of replicas are summed.
+        :param Throttle | None throttle: Bandwidth and file operation limits of writes to all replicas together.
+        :param str prune_scan: Reuse listings of unchanged directories, one of settings.PRUNE_SCAN_MODES.
+        :param int scan_workers: Number of processes scanning (and in checksum mode hashing) source subtrees,
+            sharded scan is used only with more than one.
+        :param FileFilter | None file_filter: Include/exclude rules and size and age limits of replicated source files.
+        :param float | None scrub_period: Time in seconds in which content of every replica with index is verified.
+        :param str durability: Flushing of writes to every replica, one of settings.DURABILITY_MODES.
+        """
+
+        self.source: DirFile = source_dir
+        self.throttle: Throttle = throttle or Throttle()
+        self.scan_cache: ScanCache | None = ScanCache(trust_files=prune_scan == 'trust') if prune_scan != 'off' else None
+        self.checksum: bool = checksum
+        self.scan_workers: int = scan_workers
+        self.file_filter: FileFilter | None = file_filter
+        self.scan_executor: concurrent.futures.ProcessPoolExecutor | None = None
+        if scan_workers > 1:
+            self.scan_executor = concurrent.futures.ProcessPoolExecutor(
+                scan_workers, mp_context=multiprocessing.get_context(settings.SCAN_MP_CONTEXT)
+            )
+        self.metrics: Metrics = metrics or Metrics(
+            source_dir.path, ','.join(str(replica_dir.path) for replica_dir in replica_dirs)
+        )
+        self.replicas: list[_ReplicaSynchronizer] = [
+            _ReplicaSynchronizer(
+                self, source_dir, replica_dir, checksum=checksum, index=index, workers=workers,
+                delta_threshold=delta_threshold, metrics=self.metrics, throttle=self.throttle, file_filter=file_filter,
+                scrub_period=scrub_period, durability=durability
+            )
+            for replica_dir, index in zip(replica_dirs, indexes or [None] * len(replica_dirs))
+        ]
+        self.executor = concurrent.futures.ThreadPoolExecutor(len(self.replicas), thread_name_prefix='sync-replica')
+        self.read_executor = concurrent.futures.ThreadPoolExecutor(
+            workers * len(self.replicas), thread_name_prefix='sync-read'
+        )
+        self.reads: dict[pathlib.Path, SharedRead] = {}
+        self.reads_lock: threading.Lock = threading.Lock()
+
+    def initialize(self) -> None:
+        """Initialize all replicas from single source scan."""
+
+        logging.info('Initialization...')
+        with self.metrics.cycle('initialize'):
+            with self.metrics.phase('scan'):
+                files = self.scan_source()
+            self.run_replicas(lambda replica: replica.initialize_files(files))
+
+    def sync(self) -> None:
+        """Synchronize all replicas from single source scan."""
+
+        with self.metrics.cycle('sync'):
+            with self.metrics.phase('scan'):
+                files = self.scan_source()
+            self.run_replicas(lambda replica: self.sync_replica(replica, files))
+
+    def sync_replica(
+            self,
+            replica: _ReplicaSynchronizer,
+            files: list[DirFile | TextFile]
+    ) -> None:
+        """
+        Synchronize single replica from the source scan and verify next slice of its content.
+
+        :param _ReplicaSynchronizer replica: Replica synchronizer.
+        :param list[DirFile | TextFile] files: Scanned source files, parents first.
+        """
+
+        replica.sync_files(files)
+        replica.scrub()
+
+    def scan_source(self) -> list[DirFile | TextFile]:
+        """
+        Scan whole source tree once for all replicas, sharded across scan processes if enabled.
+        :return: list[DirFile | TextFile] All source files, parents first.
+        """
+
+        if self.scan_executor is not None:
+            return sharded_scan(
+                self.source, self.scan_executor, self.scan_workers, digests=self.checksum, file_filter=self.file_filter
+            )
+        return scan(self.source, self.scan_cache, self.file_filter)
+
+    def sync_paths(self, paths: typing.Iterable[pathlib.Path]) -> None:
+        """
+        Synchronize only given source paths in every replica from single scan of the paths, within single metrics cycle.
+
+        :param typing.Iterable[pathlib.Path] paths: Changed source paths.
+        """
+
+        paths = set(paths)
+        with self.metrics.cycle('sync_paths'):
+            with self.metrics.phase('scan'):
+                files, missing = scan_paths(paths, self.file_filter)
+            self.run_replicas(lambda replica: replica.sync_scanned_paths(files, missing))
+
+    def run_replicas(self, step: typing.Callable[[_ReplicaSynchronizer], typing.Any]) -> None:
+        """
+        Run synchronization step of every replica on its own thread.
+
+        Every replica writes its content with its own pool and commits its index as soon as its step is done,
+        without waiting for the others. Replica which step failed is skipped, the others are synchronized anyway.
+        Reads shared during the step have all ended by then, so they are dropped.
+
+        :param typing.Callable step: Synchronization step of single replica.
+        """
+
+        futures = {self.executor.submit(step, replica): replica for replica in self.replicas}
+        for future, replica in futures.items():
+            try:
+                future.result()
+            except Exception:
+                logging.exception(f'Synchronization of {replica.replica.path} failed.')
+                self.metrics.count('errors')
+
+        with self.reads_lock:
+            self.reads = {}
+
+    def join_read(self, origin: pathlib.Path) -> tuple[SharedRead, ReadFeed]:
+        """
+        Join read of source file shared by replicas writing it, starting new one if the last can not be joined.
+
+        Read joined by every replica is forgotten, so are the oldest ones above settings.SHARED_READS_KEPT.
+
+        :param pathlib.Path origin: Source file.
+        :return: tuple[SharedRead, ReadFeed] Shared read and feed of the joining writer.
+        """
+
+        with self.reads_lock:
+            shared_read = self.reads.pop(origin, None)
+            feed = shared_read.join(self.read_executor) if shared_read is not None else None
+            if feed is None:
+                shared_read = SharedRead(origin)
+                feed = shared_read.join(self.read_executor)
+            if len(shared_read.feeds) < len(self.replicas):
+                self.reads[origin] = shared_read
+                while len(self.reads) > settings.SHARED_READS_KEPT:
+                    del self.reads[next(iter(self.reads))]
+            return shared_read, feed
+
+    def write_shared(self, replica_file: TextFile) -> OSError | None:
+        """
+        Write single replica from read of its source shared with the other replicas.
+
+        :param TextFile replica_file: Replica file with origin set.
+        :return: OSError | None Error of the write, None if it succeeded.
+        """
+
+        shared_read, feed = self.join_read(replica_file.origin)
+        file_log.info('Copying %s to %s', replica_file.origin, replica_file.path)
+        digest = new_digest() if replica_file.compute_digest else None
+        fsync = replica_file.durability.strict
+        self.throttle.operation()
+        try:
+            written = shared_read.write(feed, replica_file.path, digest=digest, throttle=self.throttle, fsync=fsync)
+        except FileNotFoundError:
+            return self.create(replica_file)
+        except OSError as error:
+            return error
+
+        replica_file.digest = digest.digest() if digest is not None else None
+        replica_file.blocks = None
+        replica_file.durability.file_written(replica_file.path, flushed=fsync)
+        self.metrics.count('files_copied')
+        self.metrics.count('bytes_written', written)
+        return None
+
+    def create(self, replica_file: TextFile) -> OSError | None:
+        """
+        Create single replica, creating missing parent directories.
+
+        :param TextFile replica_file: Replica file with origin set.
+        :return: OSError | None Error of the write, None if it succeeded.
+        """
+
+        self.throttle.operation()
+        try:
+            written = replica_file.create()
+        except OSError as error:
+            return error
+        self.metrics.count('files_copied')
+        self.metrics.count('bytes_written', written)
+        return None
+
+    def close(self) -> None:
+        """Finish pending file operations and close all replicas."""
+
+        self.executor.shutdown()
+        self.read_executor.shutdown()
+        if self.scan_executor is not None:
+            self.scan_executor.shutdown()
+        for replica in self.replicas:
+            replica.close()
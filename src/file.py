@@ -1,11 +1,67 @@
-import logging
+import os
 import pathlib
+import stat
 import typing
 import shutil
 
+from src.durability import Durability
+from src.filters import FileFilter
+from src.logs import file_log
+from src.throttle import Throttle
+from src.transfer import copy_file, delta_copy, new_digest
+
+
+class Snapshot(typing.NamedTuple):
+    """File metadata used to detect changes without reading file content."""
+
+    size: int
+    mtime_ns: int
+    ctime_ns: int
+    inode: int
+    nlink: int = 1
+
+    @classmethod
+    def from_stat(cls, stat: os.stat_result) -> 'Snapshot':
+        """
+        Build snapshot from stat result.
+
+        :param os.stat_result stat: Result of stat call.
+        :return: Snapshot File metadata snapshot.
+        """
+
+        return cls(stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_ino, stat.st_nlink)
+
+
+class TrackedFile:
+    """Record pairing tracked source file with its replica and last replicated snapshot."""
+
+    __slots__ = ('source', 'replica', 'snapshot', 'links')
+
+    def __init__(
+            self,
+            source: 'DirFile | TextFile',
+            replica: 'DirFile | TextFile | None' = None,
+            snapshot: Snapshot | None = None
+    ) -> None:
+        """
+        Init TrackedFile record.
+
+        :param DirFile | TextFile source: Source file.
+        :param DirFile | TextFile | None replica: Replica file, None until the file is replicated.
+        :param Snapshot | None snapshot: Snapshot of replicated source content.
+        """
+
+        self.source: DirFile | TextFile = source
+        self.replica: DirFile | TextFile | None = replica
+        self.snapshot: Snapshot | None = snapshot
+        self.links: set[pathlib.Path] | None = None
+
+
 class _File:
     """Private class which handle default file information"""
 
+    __slots__ = ('path', 'snapshot')
+
     def __init__(self, path: pathlib.Path) -> None:
         """
         Init File class
@@ -14,15 +70,28 @@ class _File:
         """
 
         self.path: pathlib.Path = path
+        self.snapshot: Snapshot | None = None
 
     def get_id(self) -> int:
         """
-        Get file inode.
+        Get file inode, from snapshot if it was already taken.
         :return: int File inode.
         """
 
+        if self.snapshot is not None:
+            return self.snapshot.inode
+
         return self.path.stat().st_ino
 
+    def get_snapshot(self) -> Snapshot:
+        """
+        Refresh and get file metadata snapshot.
+        :return: Snapshot File metadata snapshot.
+        """
+
+        self.snapshot = Snapshot.from_stat(self.path.stat())
+        return self.snapshot
+
     def create(self):
         """Create file."""
 
@@ -34,62 +103,149 @@ class _File:
         raise NotImplementedError
 
     def move(self, new_path: pathlib.Path):
-        """Move  file to object path."""
+        """
+        Move file to new path with a single rename, without rewriting its content.
 
-        logging.info(f'Replacing to {self.path}')
-        self.remove()
+        :param pathlib.Path new_path: New path of the file.
+        """
+
+        file_log.info('Replacing %s to %s', self.path, new_path)
+        try:
+            os.replace(self.path, new_path)
+        except FileNotFoundError:
+            if not os.path.lexists(self.path):
+                raise
+            new_path.parent.mkdir(exist_ok=True, parents=True)
+            os.replace(self.path, new_path)
         self.path = new_path
-        self.create()
 
 
 class DirFile(_File):
     """Class which handle dir file object"""
 
+    __slots__ = ('children',)
+
     def __init__(self, path: pathlib.Path) -> None:
         super().__init__(path)
         self.children: typing.List[typing.Union[DirFile, TextFile]] = []
 
-    def update_children(self):
-        """Update children attribute."""
+    def update_children(self, file_filter: FileFilter | None = None):
+        """
+        Update children attribute, taking children snapshots from cached directory entries.
+
+        Children paths are joined to the directory path, so they share its path components.
+        Children which can not be stat-ed, e.g. dangling symlinks or files removed during the listing,
+        are skipped one by one, errors of listing the directory itself are raised.
+
+        :param FileFilter | None file_filter: Rules excluding children by path before they are stat-ed.
+        """
 
         self.children = []
 
-        for file in self.path.iterdir():
-            self.children.append(
-                DirFile(file) if file.is_dir() else TextFile(file)
-            )
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                path = self.path / entry.name
+                is_dir = entry.is_dir()
+                if file_filter is not None and not file_filter.accepts_path(path, is_dir):
+                    continue
+                try:
+                    snapshot = Snapshot.from_stat(entry.stat())
+                except (FileNotFoundError, NotADirectoryError):
+                    file_log.debug('Skipping %s, it disappeared or is a dangling symlink.', path)
+                    continue
+                child = DirFile(path) if is_dir else TextFile(path)
+                child.snapshot = snapshot
+                self.children.append(child)
 
     def create(self):
         """Create dir from object path."""
 
-        logging.info(f'Creating dir from path: {self.path}')
+        file_log.info('Creating dir from path: %s', self.path)
         self.path.mkdir(exist_ok=True, parents=True)
 
     def remove(self):
         """Remove dir from object path."""
 
-        logging.info(f'Removing dir from path: {self.path}')
+        file_log.info('Removing dir from path: %s', self.path)
         shutil.rmtree(self.path)
 
 
 class TextFile(_File):
-    """Class which handle text file object"""
+    """Class which handle regular (text or binary) file object"""
+
+    __slots__ = ('origin', 'compute_digest', 'digest', 'delta_threshold', 'blocks', 'throttle', 'durability')
 
     def __init__(self, path: pathlib.Path) -> None:
         super().__init__(path)
-        self.content: str = ''
-
-    def create(self):
-        """Create text file from object path."""
+        self.origin: pathlib.Path | None = None
+        self.compute_digest: bool = False
+        self.digest: bytes | None = None
+        self.delta_threshold: int | None = None
+        self.blocks: list[bytes] | None = None
+        self.throttle: Throttle | None = None
+        self.durability: Durability | None = None
+
+    def create(self) -> int:
+        """
+        Create file from object path, streaming content from origin file if set.
+        :return: int Number of written bytes.
+        """
 
-        logging.info(f'Creating file from path: {self.path}')
+        file_log.info('Creating file from path: %s', self.path)
         try:
-            self.path.write_text(self.content)
+            return self._write()
         except FileNotFoundError:
+            if self.path.parent.exists():
+                raise
             self.path.parent.mkdir(exist_ok=True, parents=True)
+            return self._write()
+
+    def _write(self) -> int:
+        """
+        Write content of origin file to object path.
+
+        Existing files at least delta threshold large are updated in place block by block,
+        unless they are hardlinked, as writing in place would change the other links too.
+        Written file is passed to durability, in strict mode its content is flushed before the rename.
+        """
+
+        if self.origin is None:
+            self.path.touch()
+            if self.durability is not None:
+                self.durability.file_written(self.path)
+            return 0
+
+        digest = new_digest() if self.compute_digest else None
+        fsync = self.durability is not None and self.durability.strict
+        if self.delta_threshold is not None and self.origin.stat().st_size >= self.delta_threshold and self._is_single_link():
+            result = delta_copy(self.origin, self.path, self.blocks, digest=digest, throttle=self.throttle, fsync=fsync)
+            self.blocks = result.blocks
+            written = result.written
+            file_log.info('Delta transfer of %s: written %d of %d bytes', self.path, written, result.size)
+        else:
+            written = copy_file(self.origin, self.path, digest=digest, throttle=self.throttle, fsync=fsync)
+            self.blocks = None
+        self.digest = digest.digest() if digest is not None else None
+        if self.durability is not None:
+            self.durability.file_written(self.path, flushed=fsync)
+
+        return written
+
+    def _is_single_link(self) -> bool:
+        """
+        Check if object path is an existing regular file with no other hardlinks.
+        :return: bool True if file can be written in place.
+        """
+
+        try:
+            replica_stat = self.path.stat()
+        except FileNotFoundError:
+            return False
+
+        return stat.S_ISREG(replica_stat.st_mode) and replica_stat.st_nlink == 1
 
     def remove(self):
         """Remove text file from object path."""
 
-        logging.info(f'Removing file from path: {self.path}')
+        file_log.info('Removing file from path: %s', self.path)
         self.path.unlink()
@@ -0,0 +1,243 @@
+import os
+import pathlib
+import re
+import time
+import typing
+
+
+class _Rule(typing.NamedTuple):
+    """Single gitignore-style rule translated to regular expression matching path relative to the root."""
+
+    regex: str
+    negated: bool
+    dir_only: bool
+
+
+def _translate_segment(segment: str) -> str:
+    """
+    Translate glob of single path segment to regular expression.
+
+    :param str segment: Glob with *, ? and [...] wildcards, backslash escapes next character.
+    :return: str Regular expression matching the segment.
+    """
+
+    regex = []
+    index = 0
+    while index < len(segment):
+        char = segment[index]
+        if char == '*':
+            regex.append('[^/]*')
+        elif char == '?':
+            regex.append('[^/]')
+        elif char == '\\' and index + 1 < len(segment):
+            index += 1
+            regex.append(re.escape(segment[index]))
+        elif char == '[':
+            start = index + 2 if segment[index + 1:index + 2] in ('!', '^') else index + 1
+            end = segment.find(']', start + 1 if segment[start:start + 1] == ']' else start)
+            if end < 0:
+                regex.append(re.escape(char))
+            else:
+                content = segment[index + 1:end].replace('\\', '\\\\')
+                if content[0] == '!':
+                    content = '^' + content[1:]
+                regex.append(f'[{content}]')
+                index = end
+        else:
+            regex.append(re.escape(char))
+        index += 1
+
+    return ''.join(regex)
+
+
+def parse_rule(pattern: str) -> _Rule | None:
+    """
+    Parse single gitignore-style pattern.
+
+    Leading ! re-includes matched paths, trailing / matches only directories. Pattern with / in the beginning or
+    middle is matched against path relative to the root, otherwise against name at any depth. ** matches any
+    number of directories.
+
+    :param str pattern: Pattern line.
+    :return: _Rule | None Parsed rule, None for blank and comment lines.
+    """
+
+    pattern = pattern.strip()
+    if not pattern or pattern.startswith('#'):
+        return None
+
+    negated = pattern.startswith('!')
+    if negated or pattern.startswith('\\!') or pattern.startswith('\\#'):
+        pattern = pattern[1:]
+    dir_only = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    if not pattern:
+        return None
+
+    segments = pattern.split('/')
+    regex = [] if anchored else ['(?:.*/)?']
+    for index, segment in enumerate(segments):
+        last = index == len(segments) - 1
+        if segment == '**':
+            regex.append('.*' if last else '(?:.*/)?')
+        else:
+            regex.append(_translate_segment(segment) + ('' if last else '/'))
+
+    return _Rule(''.join(regex), negated, dir_only)
+
+
+def load_rules(path: pathlib.Path) -> list[str]:
+    """
+    Load patterns from gitignore-style file.
+
+    :param pathlib.Path path: Path to the file, one pattern per line.
+    :return: list[str] Patterns, blank and comment lines are skipped.
+    """
+
+    return [line for line in path.read_text().splitlines() if parse_rule(line) is not None]
+
+
+def collect_rules(
+        filter_file: pathlib.Path | None = None,
+        exclude: typing.Iterable[str] = (),
+        include: typing.Iterable[str] = ()
+) -> list[str]:
+    """
+    Collect rules from filter file and exclude and include patterns, in this order of precedence.
+
+    :param pathlib.Path | None filter_file: Gitignore-style file.
+    :param typing.Iterable[str] exclude: Patterns of excluded paths.
+    :param typing.Iterable[str] include: Patterns of paths included even if they match exclude patterns.
+    :return: list[str] Rules, the last matching one decides.
+    """
+
+    rules = load_rules(filter_file) if filter_file is not None else []
+    return rules + list(exclude) + [f'!{pattern}' for pattern in include]
+
+
+class FileFilter:
+    """
+    Include/exclude rules of the source tree with size and age limits of files.
+
+    Rules are compiled into single regular expression for files and single one for directories, the last rule
+    matching the path decides as in gitignore. Path rules are checked before the entry is stat-ed and excluded
+    directories are never listed, so files below them can not be re-included. Size and age limits apply to files only.
+    """
+
+    def __init__(
+            self,
+            root: pathlib.Path,
+            rules: typing.Iterable[str] = (),
+            min_size: int | None = None,
+            max_size: int | None = None,
+            min_age: float | None = None,
+            max_age: float | None = None
+    ) -> None:
+        """
+        Init FileFilter class.
+
+        :param pathlib.Path root: Root of filtered tree, rules are matched against paths relative to it.
+        :param typing.Iterable[str] rules: Gitignore-style patterns, later patterns override earlier ones.
+        :param int | None min_size: Files smaller than given number of bytes are excluded.
+        :param int | None max_size: Files larger than given number of bytes are excluded.
+        :param float | None min_age: Files modified less than given number of seconds ago are excluded.
+        :param float | None max_age: Files modified more than given number of seconds ago are excluded.
+        """
+
+        self.root: pathlib.Path = root
+        self.prefix_length: int = len(os.path.join(root, ''))
+        self.rules: list[str] = list(rules)
+        self.min_size: int | None = min_size
+        self.max_size: int | None = max_size
+        self.min_age_ns: int | None = int(min_age * 10 ** 9) if min_age is not None else None
+        self.max_age_ns: int | None = int(max_age * 10 ** 9) if max_age is not None else None
+
+        parsed = [rule for rule in map(parse_rule, self.rules) if rule is not None]
+        self.dir_matcher: tuple[re.Pattern | None, list[bool]] = self.compile(parsed)
+        self.file_matcher: tuple[re.Pattern | None, list[bool]] = self.compile(
+            [rule for rule in parsed if not rule.dir_only]
+        )
+        self.limits_files: bool = any(
+            limit is not None for limit in (min_size, max_size, self.min_age_ns, self.max_age_ns)
+        )
+
+    @classmethod
+    def create(
+            cls,
+            root: pathlib.Path,
+            rules: typing.Iterable[str] = (),
+            min_size: int | None = None,
+            max_size: int | None = None,
+            min_age: float | None = None,
+            max_age: float | None = None
+    ) -> 'FileFilter | None':
+        """
+        Create filter if any rule or limit is given.
+
+        :return: FileFilter | None Filter, None if it would accept everything.
+        """
+
+        file_filter = cls(root, rules, min_size, max_size, min_age, max_age)
+        if not file_filter.rules and not file_filter.limits_files:
+            return None
+        return file_filter
+
+    @classmethod
+    def compile(cls, rules: list[_Rule]) -> tuple[re.Pattern | None, list[bool]]:
+        """
+        Compile rules into single regular expression, which alternative of the last rule comes first.
+
+        :param list[_Rule] rules: Parsed rules in order of precedence, the last wins.
+        :return: tuple[re.Pattern | None, list[bool]] Expression with one group per rule and negation flags of the groups.
+        """
+
+        if not rules:
+            return None, []
+        rules = rules[::-1]
+        return re.compile('|'.join(f'({rule.regex})' for rule in rules), re.DOTALL), [rule.negated for rule in rules]
+
+    def accepts_path(
+            self,
+            path: str | os.PathLike,
+            is_dir: bool
+    ) -> bool:
+        """
+        Check path against include/exclude rules, parent directories are expected to be accepted already.
+
+        :param str | os.PathLike path: Path below the root.
+        :param bool is_dir: Path is directory.
+        :return: bool True if the path is included.
+        """
+
+        pattern, negated = self.dir_matcher if is_dir else self.file_matcher
+        if pattern is None:
+            return True
+        match = pattern.fullmatch(os.fspath(path)[self.prefix_length:])
+        return match is None or negated[match.lastindex - 1]
+
+    def accepts_file(
+            self,
+            size: int,
+            mtime_ns: int
+    ) -> bool:
+        """
+        Check file metadata against size and age limits.
+
+        :param int size: File size in bytes.
+        :param int mtime_ns: File modification time in nanoseconds.
+        :return: bool True if the file is included.
+        """
+
+        if self.min_size is not None and size < self.min_size:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        if self.min_age_ns is not None or self.max_age_ns is not None:
+            age = time.time_ns() - mtime_ns
+            if self.min_age_ns is not None and age < self.min_age_ns:
+                return False
+            if self.max_age_ns is not None and age > self.max_age_ns:
+                return False
+        return True
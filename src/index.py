@@ -0,0 +1,199 @@
+import logging
+import pathlib
+import sqlite3
+import typing
+
+import src.settings as settings
+
+
+class IndexEntry(typing.NamedTuple):
+    """Single replicated file stored in sync index."""
+
+    path: str
+    inode: int
+    size: int
+    mtime_ns: int
+    digest: bytes | None
+    is_dir: bool
+
+
+class SyncIndex:
+    """Persistent index of replicated files stored in SQLite database."""
+
+    def __init__(
+            self,
+            path: pathlib.Path,
+            read_only: bool = False
+    ) -> None:
+        """
+        Open (or create) sync index.
+
+        Index may be used from different threads, but only by one at a time. Read only index is opened
+        without creating WAL files next to it, unless another connection has already created them.
+
+        :param pathlib.Path path: Path to index database file.
+        :param bool read_only: Open existing index for reading only.
+        """
+
+        self.path: pathlib.Path = path
+        if read_only:
+            immutable = '' if path.with_name(f'{path.name}-wal').exists() else '&immutable=1'
+            self.connection = sqlite3.connect(
+                f'{path.resolve().as_uri()}?mode=ro{immutable}', uri=True, check_same_thread=False
+            )
+            return
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            'path TEXT PRIMARY KEY, inode INTEGER, size INTEGER, mtime_ns INTEGER, digest BLOB, is_dir INTEGER'
+            ') WITHOUT ROWID'
+        )
+        self.connection.execute('CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value TEXT)')
+
+    @classmethod
+    def for_replica(cls, replica_dir: pathlib.Path) -> 'SyncIndex':
+        """
+        Open sync index stored next to the replica directory.
+
+        :param pathlib.Path replica_dir: Path to replica directory.
+        :return: SyncIndex Sync index.
+        """
+
+        path = cls.path_for(replica_dir)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return cls(path)
+
+    @classmethod
+    def path_for(cls, replica_dir: pathlib.Path) -> pathlib.Path:
+        """
+        Get path of sync index of the replica directory.
+
+        :param pathlib.Path replica_dir: Path to replica directory.
+        :return: pathlib.Path Path to index database file.
+        """
+
+        return replica_dir.with_name(f'.{replica_dir.name}{settings.INDEX_SUFFIX}')
+
+    def load(self) -> dict[str, IndexEntry]:
+        """
+        Load all index entries.
+        :return: dict[str, IndexEntry] Entries by relative path.
+        """
+
+        entries = {
+            row[0]: IndexEntry(row[0], row[1], row[2], row[3], row[4], bool(row[5]))
+            for row in self.connection.execute('SELECT path, inode, size, mtime_ns, digest, is_dir FROM files')
+        }
+        logging.info(f'Loaded {len(entries)} entries from {self.path}')
+        return entries
+
+    def put(self, entry: IndexEntry) -> None:
+        """
+        Insert or replace index entry.
+
+        :param IndexEntry entry: Index entry.
+        """
+
+        self.connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)', entry)
+
+    def delete(self, path: str) -> None:
+        """
+        Delete index entry together with entries of its descendants.
+
+        :param str path: Relative path of the file.
+        """
+
+        self.connection.execute(
+            'DELETE FROM files WHERE path = ? OR (path >= ? AND path < ?)',
+            (path, f'{path}/', f'{path}0')
+        )
+
+    def move(self, path: str, new_path: str) -> None:
+        """
+        Move index entry together with entries of its descendants.
+
+        :param str path: Relative path of the file.
+        :param str new_path: New relative path of the file.
+        """
+
+        self.connection.execute(
+            'UPDATE OR REPLACE files SET path = ? || substr(path, ?) '
+            'WHERE path = ? OR (path >= ? AND path < ?)',
+            (new_path, len(path) + 1, path, f'{path}/', f'{path}0')
+        )
+
+    def files_after(
+            self,
+            path: str,
+            limit: int
+    ) -> list[IndexEntry]:
+        """
+        Get entries of files with known digest following given path in path order.
+
+        :param str path: Relative path after which entries start, empty string for the first entries.
+        :param int limit: Maximum number of entries.
+        :return: list[IndexEntry] Entries ordered by path.
+        """
+
+        return [
+            IndexEntry(row[0], row[1], row[2], row[3], row[4], bool(row[5]))
+            for row in self.connection.execute(
+                'SELECT path, inode, size, mtime_ns, digest, is_dir FROM files '
+                'WHERE path > ? AND is_dir = 0 AND digest IS NOT NULL ORDER BY path LIMIT ?',
+                (path, limit)
+            )
+        ]
+
+    def files_size(self) -> int:
+        """
+        Get total size of files with known digest.
+        :return: int Size in bytes.
+        """
+
+        return self.connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM files WHERE is_dir = 0 AND digest IS NOT NULL'
+        ).fetchone()[0]
+
+    def get_state(
+            self,
+            name: str,
+            default: str | None = None
+    ) -> str | None:
+        """
+        Get persistent state value, e.g. position of the scrubber.
+
+        :param str name: Name of the value.
+        :param str | None default: Returned if the value is not stored.
+        :return: str | None Stored value.
+        """
+
+        row = self.connection.execute('SELECT value FROM state WHERE name = ?', (name,)).fetchone()
+        return row[0] if row is not None else default
+
+    def set_state(
+            self,
+            name: str,
+            value: str
+    ) -> None:
+        """
+        Store persistent state value, committed together with index changes.
+
+        :param str name: Name of the value.
+        :param str value: Stored value.
+        """
+
+        self.connection.execute('INSERT OR REPLACE INTO state VALUES (?, ?)', (name, value))
+
+    def commit(self) -> None:
+        """Persist pending changes."""
+
+        self.connection.commit()
+
+    def close(self) -> None:
+        """Persist pending changes and close index."""
+
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,39 @@
+import logging
+import logging.handlers
+import pathlib
+import queue
+
+import src.settings as settings
+
+# Logger of single file operations, logged lazily as there may be millions of them per cycle
+file_log = logging.getLogger('synchronizer.files')
+
+
+def setup_logging(
+        level: str,
+        log_file: pathlib.Path,
+        summary: bool = False
+) -> logging.handlers.QueueListener:
+    """
+    Log through queue to file and stderr handlers run on listener thread, so log I/O does not block file operations.
+
+    :param str level: Name of the logging level.
+    :param pathlib.Path log_file: Path to log file.
+    :param bool summary: Log only summary of every cycle instead of every file operation.
+    :return: logging.handlers.QueueListener Started listener, stopped to flush remaining records.
+    """
+
+    formatter = logging.Formatter(settings.LOG_FORMAT, datefmt=settings.LOG_DATE_FORMAT)
+    handlers = [logging.FileHandler(log_file), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(logging.getLevelName(level))
+    root.addHandler(logging.handlers.QueueHandler(records))
+    file_log.setLevel(logging.WARNING if summary else logging.NOTSET)
+
+    listener = logging.handlers.QueueListener(records, *handlers)
+    listener.start()
+    return listener
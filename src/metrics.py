@@ -0,0 +1,296 @@
+import contextlib
+import http.server
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import threading
+import time
+import typing
+
+from collections import defaultdict
+
+
+class Metrics:
+    """Phase timings, file and byte counters and queue depths of single synchronized pair, collected per cycle."""
+
+    def __init__(
+            self,
+            source: pathlib.Path,
+            replica: pathlib.Path | str,
+            interval: float | None = None
+    ) -> None:
+        """
+        Init Metrics class.
+
+        :param pathlib.Path source: Source directory.
+        :param pathlib.Path | str replica: Replica directory, or description of many replicas.
+        :param float | None interval: Synchronization interval in seconds, reported next to cycle duration.
+        """
+
+        self.labels: dict[str, str] = {'source': str(source), 'replica': str(replica)}
+        self.interval: float | None = interval
+        self.lock: threading.Lock = threading.Lock()
+        self.phases: dict[str, float] = defaultdict(float)
+        self.counters: dict[str, int] = defaultdict(int)
+        self.queues: dict[str, int] = defaultdict(int)
+        self.phase_totals: dict[str, float] = defaultdict(float)
+        self.counter_totals: dict[str, int] = defaultdict(int)
+        self.cycles: int = 0
+        self.last: dict | None = None
+        self.exporters: list['MetricsExporter'] = []
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> typing.Iterator[None]:
+        """
+        Measure duration of synchronization phase, durations of repeated phases are summed.
+
+        :param str name: Phase name, e.g. scan, diff, move, delete, copy or commit.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.phases[name] += elapsed
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        Increase counter of the current cycle.
+
+        :param str name: Counter name, e.g. files_copied or bytes_copied.
+        :param int value: Increment.
+        """
+
+        with self.lock:
+            self.counters[name] += value
+
+    def queue_depth(self, name: str, depth: int) -> None:
+        """
+        Record depth of the queue, maximum depth of the cycle is reported.
+
+        :param str name: Queue name.
+        :param int depth: Number of items waiting in the queue.
+        """
+
+        if depth > self.queues.get(name, 0):
+            with self.lock:
+                self.queues[name] = max(self.queues[name], depth)
+
+    @contextlib.contextmanager
+    def cycle(self, kind: str) -> typing.Iterator[None]:
+        """
+        Collect metrics of single synchronization cycle and export its summary when it ends.
+
+        Failed cycle is counted as an error and the exception is re-raised.
+
+        :param str kind: Kind of the cycle, e.g. initialize, sync or sync_paths.
+        """
+
+        with self.lock:
+            self.phases.clear()
+            self.counters.clear()
+            self.queues.clear()
+
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            self.count('errors')
+            raise
+        finally:
+            self.finish(kind, time.perf_counter() - start, failed)
+
+    def finish(
+            self,
+            kind: str,
+            elapsed: float,
+            failed: bool
+    ) -> None:
+        """
+        Build summary of finished cycle, add it to totals and pass it to exporters.
+
+        :param str kind: Kind of the cycle.
+        :param float elapsed: Cycle duration in seconds.
+        :param bool failed: Cycle ended with an exception.
+        """
+
+        with self.lock:
+            for name, value in self.phases.items():
+                self.phase_totals[name] += value
+            for name, value in self.counters.items():
+                self.counter_totals[name] += value
+            self.cycles += 1
+            self.last = {
+                'time': time.time(),
+                **self.labels,
+                'kind': kind,
+                'duration': round(elapsed, 6),
+                'interval': self.interval,
+                'failed': failed,
+                'phases': {name: round(value, 6) for name, value in self.phases.items()},
+                'counters': dict(self.counters),
+                'queues': dict(self.queues),
+            }
+            summary = self.last
+
+        logging.info(
+            f'Finished {kind} of {self.labels["source"]} in {elapsed:.3f}s'
+            + ''.join(f', {name}={value}' for name, value in summary['counters'].items())
+            + (' (failed)' if failed else '')
+        )
+        for exporter in self.exporters:
+            exporter.export(summary)
+
+
+class MetricsExporter:
+    """Exporter writing cycle summaries as JSON lines and metrics of all pairs in Prometheus text format."""
+
+    def __init__(
+            self,
+            textfile: pathlib.Path | None = None,
+            log_file: pathlib.Path | None = None
+    ) -> None:
+        """
+        Init MetricsExporter class.
+
+        :param pathlib.Path | None textfile: Prometheus text format file rewritten after every cycle.
+        :param pathlib.Path | None log_file: File to which JSON summary of every cycle is appended.
+        """
+
+        self.textfile: pathlib.Path | None = textfile
+        self.log_file: pathlib.Path | None = log_file
+        self.metrics: list[Metrics] = []
+        self.lock: threading.Lock = threading.Lock()
+
+    def register(self, metrics: Metrics) -> None:
+        """
+        Export metrics of the pair.
+
+        :param Metrics metrics: Metrics of synchronized pair.
+        """
+
+        self.metrics.append(metrics)
+        metrics.exporters.append(self)
+
+    def export(self, summary: dict) -> None:
+        """
+        Write summary of finished cycle and refresh Prometheus text file.
+
+        :param dict summary: Cycle summary.
+        """
+
+        with self.lock:
+            try:
+                if self.log_file is not None:
+                    with open(self.log_file, 'a') as file:
+                        file.write(json.dumps(summary) + '\n')
+                if self.textfile is not None:
+                    self.write_textfile()
+            except OSError as error:
+                logging.error(f'Could not export metrics: {error}')
+
+    def write_textfile(self) -> None:
+        """Replace Prometheus text file atomically, so collector never reads partially written file."""
+
+        fd, temp_path = tempfile.mkstemp(prefix=f'.{self.textfile.name}.', suffix='.tmp', dir=self.textfile.parent)
+        try:
+            with open(fd, 'w') as file:
+                file.write(self.render())
+            os.replace(temp_path, self.textfile)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def render(self) -> str:
+        """
+        Render metrics of all pairs in Prometheus text format.
+        :return: str Prometheus text exposition.
+        """
+
+        samples = defaultdict(list)
+        for metrics in self.metrics:
+            with metrics.lock:
+                labels = metrics.labels
+                samples['sync_cycles_total'].append((labels, metrics.cycles))
+                for name, value in metrics.phase_totals.items():
+                    samples['sync_phase_seconds_total'].append(({**labels, 'phase': name}, value))
+                for name, value in metrics.counter_totals.items():
+                    samples[f'sync_{name}_total'].append((labels, value))
+                if metrics.interval is not None:
+                    samples['sync_interval_seconds'].append((labels, metrics.interval))
+                if metrics.last is not None:
+                    samples['sync_last_cycle_seconds'].append((labels, metrics.last['duration']))
+                    samples['sync_last_cycle_timestamp_seconds'].append((labels, metrics.last['time']))
+                    for name, value in metrics.last['phases'].items():
+                        samples['sync_last_cycle_phase_seconds'].append(({**labels, 'phase': name}, value))
+                    for name, value in metrics.last['queues'].items():
+                        samples['sync_last_cycle_queue_depth'].append(({**labels, 'queue': name}, value))
+
+        lines = []
+        for name, values in samples.items():
+            lines.append(f'# TYPE {name} {"counter" if name.endswith("_total") else "gauge"}')
+            for labels, value in values:
+                rendered = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+                lines.append(f'{name}{{{rendered}}} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Local HTTP endpoint serving metrics in Prometheus text format on /metrics."""
+
+    def __init__(
+            self,
+            exporter: MetricsExporter,
+            port: int,
+            host: str = '127.0.0.1'
+    ) -> None:
+        """
+        Init MetricsServer class and start serving on background thread.
+
+        :param MetricsExporter exporter: Exporter rendering the metrics.
+        :param int port: Listening port, 0 selects free port.
+        :param str host: Listening address.
+        """
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(f'Metrics request: {format % args}')
+
+        self.server: http.server.ThreadingHTTPServer = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.port: int = self.server.server_address[1]
+        self.thread: threading.Thread = threading.Thread(
+            target=self.server.serve_forever, name='sync-metrics', daemon=True
+        )
+        self.thread.start()
+        logging.info(f'Serving metrics on http://{host}:{self.port}/metrics')
+
+    def close(self) -> None:
+        """Stop serving metrics."""
+
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _escape(value: str) -> str:
+    """Escape Prometheus label value."""
+
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,139 @@
+import pathlib
+import typing
+
+from src.file import DirFile, TextFile, TrackedFile
+
+# Operations which write content of single file to the replica
+WRITE_KINDS = ('copy', 'delta', 'verify', 'keep')
+# Execution order of operation kinds, renames and deletes free replica paths, directories are created before files
+KIND_ORDER = {'rename': 0, 'delete': 1, 'mkdir': 2, **{kind: 3 for kind in WRITE_KINDS}}
+
+
+class PlanOperation(typing.NamedTuple):
+    """
+    Single replica operation of synchronization plan.
+
+    Kinds: mkdir, copy, delta (in place update of changed blocks), verify (copy only if content differs),
+    rename, delete and keep (replica is up to date, only its tracking is restored). Rename of directory
+    carries its descendants moved together with it, which only get their paths updated.
+    """
+
+    kind: str
+    path: pathlib.Path
+    size: int = 0
+    source: pathlib.Path | None = None
+    inode: int = 0
+    file: DirFile | TextFile | TrackedFile | None = None
+    task: tuple[typing.Callable, tuple, typing.Callable] | None = None
+    descendants: tuple[TrackedFile, ...] = ()
+
+
+class SyncPlan:
+    """Ordered replica operations of single synchronization cycle, with estimated bytes written."""
+
+    def __init__(self, replica: pathlib.Path) -> None:
+        """
+        Init SyncPlan class.
+
+        :param pathlib.Path replica: Replica directory the plan applies to.
+        """
+
+        self.replica: pathlib.Path = replica
+        self.operations: list[PlanOperation] = []
+
+    def add(
+            self,
+            kind: str,
+            path: pathlib.Path,
+            size: int = 0,
+            source: pathlib.Path | None = None,
+            inode: int = 0,
+            file: DirFile | TextFile | TrackedFile | None = None,
+            task: tuple[typing.Callable, tuple, typing.Callable] | None = None,
+            descendants: tuple[TrackedFile, ...] = ()
+    ) -> None:
+        """
+        Append operation to the plan.
+
+        :param str kind: Operation kind.
+        :param pathlib.Path path: Replica path created, written, deleted or renamed to.
+        :param int size: Estimated bytes written, upper bound for delta and verify.
+        :param pathlib.Path | None source: Source file read, or replica path renamed from.
+        :param int inode: Inode of the source file, used to order writes.
+        :param DirFile | TextFile | TrackedFile | None file: File the executor runs the operation on.
+        :param tuple | None task: Prepared task writing the replica.
+        :param tuple[TrackedFile, ...] descendants: Files moved together with renamed directory.
+        """
+
+        self.operations.append(PlanOperation(kind, path, size, source, inode, file, task, descendants))
+
+    def order(self) -> None:
+        """
+        Sort operations to execution order, keeping order of operations of the same kind.
+
+        Writes are ordered by source inode, which follows on-disk placement of files on most
+        filesystems better than the scan order, so reads of many small files seek less.
+        """
+
+        self.operations.sort(key=lambda operation: (
+            KIND_ORDER[operation.kind], operation.inode if operation.kind in WRITE_KINDS else 0
+        ))
+
+    def of_kind(self, *kinds: str) -> list[PlanOperation]:
+        """
+        Get operations of given kinds in plan order.
+
+        :param str kinds: Operation kinds.
+        :return: list[PlanOperation] Operations.
+        """
+
+        return [operation for operation in self.operations if operation.kind in kinds]
+
+    @property
+    def changes(self) -> list[PlanOperation]:
+        """Operations changing the replica, i.e. all except keep."""
+
+        return [operation for operation in self.operations if operation.kind != 'keep']
+
+    @property
+    def bytes(self) -> int:
+        """Estimated number of bytes written by the plan."""
+
+        return sum(operation.size for operation in self.operations)
+
+    def summary(self) -> dict[str, int]:
+        """
+        Count operations by kind.
+        :return: dict[str, int] Number of operations of every kind present in the plan.
+        """
+
+        counts = {}
+        for operation in self.operations:
+            counts[operation.kind] = counts.get(operation.kind, 0) + 1
+        return counts
+
+    def format(self) -> str:
+        """
+        Render plan as text, one line per replica change followed by totals, renamed directory on single line.
+        :return: str Rendered plan.
+        """
+
+        lines = []
+        for operation in self.changes:
+            path = operation.path.relative_to(self.replica)
+            if operation.kind == 'rename':
+                descendants = f' (with {len(operation.descendants)} files below)' if operation.descendants else ''
+                lines.append(
+                    f'{operation.kind:<7} {"":>12} {operation.source.relative_to(self.replica)} -> {path}{descendants}'
+                )
+            else:
+                lines.append(f'{operation.kind:<7} {operation.size:>12} {path}')
+
+        summary = self.summary()
+        kept = summary.pop('keep', 0)
+        counts = ', '.join(f'{kind} {count}' for kind, count in summary.items())
+        lines.append(
+            f'Plan for {self.replica}: {len(self.changes)} changes ({counts or "nothing to do"}), '
+            f'{self.bytes} bytes, {kept} files up to date'
+        )
+        return '\n'.join(lines)
@@ -0,0 +1,83 @@
+import concurrent.futures
+import logging
+import typing
+
+
+class TaskPool:
+    """Bounded thread pool running file operations, with completion callbacks run in the submitting thread."""
+
+    def __init__(
+            self,
+            workers: int = 1,
+            max_pending: int | None = None,
+            executor: concurrent.futures.Executor | None = None
+    ) -> None:
+        """
+        Init task pool.
+
+        :param int workers: Number of worker threads, with 1 tasks are run inline.
+        :param int | None max_pending: Maximum number of submitted and not finished tasks.
+        :param concurrent.futures.Executor | None executor: Executor shared with other pools, not shut down on close.
+        """
+
+        self.workers: int = workers
+        self.max_pending: int = max_pending or workers * 4
+        self.pending: dict[concurrent.futures.Future, typing.Callable | None] = {}
+        self.shared: bool = executor is not None
+        self.executor: concurrent.futures.Executor | None = executor or (
+            concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix='sync-worker') if workers > 1 else None
+        )
+
+    def submit(
+            self,
+            function: typing.Callable,
+            *args,
+            callback: typing.Callable | None = None
+    ) -> None:
+        """
+        Submit task, blocking while too many tasks are pending.
+
+        :param typing.Callable function: Task run on worker thread.
+        :param typing.Callable | None callback: Called with task result in the submitting thread.
+        """
+
+        if self.executor is None:
+            result = function(*args)
+            if callback is not None:
+                callback(result)
+            return
+
+        while len(self.pending) >= self.max_pending:
+            self._drain(concurrent.futures.FIRST_COMPLETED)
+
+        self.pending[self.executor.submit(function, *args)] = callback
+
+    def wait(self) -> None:
+        """Wait for all submitted tasks and run their callbacks."""
+
+        while self.pending:
+            self._drain(concurrent.futures.FIRST_COMPLETED)
+
+    def _drain(self, return_when: str) -> None:
+        """Run callbacks of finished tasks, on failure wait for remaining tasks and re-raise."""
+
+        done, _ = concurrent.futures.wait(self.pending, return_when=return_when)
+        for future in done:
+            callback = self.pending.pop(future)
+            try:
+                result = future.result()
+            except BaseException:
+                logging.error('File operation failed, waiting for pending operations.')
+                concurrent.futures.wait(self.pending)
+                self.pending = {}
+                raise
+
+            if callback is not None:
+                callback(result)
+
+    def close(self) -> None:
+        """Wait for pending tasks and stop worker threads."""
+
+        self.wait()
+        if self.executor is not None and not self.shared:
+            self.executor.shutdown()
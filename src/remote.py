@@ -0,0 +1,952 @@
+import argparse
+import concurrent.futures
+import errno
+import hmac
+import ipaddress
+import itertools
+import json
+import logging
+import os
+import pathlib
+import queue
+import socket
+import stat
+import struct
+import tempfile
+import threading
+import zlib
+
+from src.backend import LocalBackend, ReplicaBackend, ReplicaStat
+from src.durability import Durability
+from src.file import TextFile
+from src.logs import file_log
+from src.transfer import block_hash, new_digest
+
+import src.settings as settings
+
+# Batch header: number of messages and length of the body
+_FRAME = struct.Struct('!II')
+# Message header: length of JSON header and length of raw payload following it
+_MESSAGE = struct.Struct('!II')
+
+
+def parse_address(address: str) -> tuple[int, str | tuple[str, int]]:
+    """
+    Parse replica server address.
+
+    :param str address: tcp://host:port or unix:///path/to/socket.
+    :return: tuple[int, str | tuple[str, int]] Socket family and socket address.
+    :raises ValueError: If address is not valid.
+    """
+
+    if address.startswith('unix://') and len(address) > len('unix://'):
+        return socket.AF_UNIX, address[len('unix://'):]
+    if address.startswith('tcp://'):
+        host, _, port = address[len('tcp://'):].rpartition(':')
+        if host and port.isdigit():
+            host = host.strip('[]')
+            return socket.AF_INET6 if ':' in host else socket.AF_INET, (host, int(port))
+    raise ValueError(f'Invalid replica address {address}, expected tcp://host:port or unix:///path.')
+
+
+def is_loopback(host: str) -> bool:
+    """
+    Check if TCP host is reachable only from the local host.
+
+    :param str host: Host name or IP address.
+    :return: bool True for localhost and loopback addresses.
+    """
+
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _receive_exactly(connection: socket.socket, size: int) -> bytearray | None:
+    """
+    Receive given number of bytes.
+
+    :param socket.socket connection: Connected socket.
+    :param int size: Number of bytes.
+    :return: bytearray | None Received bytes, None if connection was closed before the first byte.
+    :raises ConnectionError: If connection was closed in the middle.
+    """
+
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        read = connection.recv_into(view[received:])
+        if not read:
+            if received == 0:
+                return None
+            raise ConnectionError('Connection closed in the middle of a batch.')
+        received += read
+
+    return buffer
+
+
+def read_batch(
+        connection: socket.socket,
+        max_length: int | None = None
+) -> list[tuple[dict, bytes]] | None:
+    """
+    Read single batch of messages.
+
+    :param socket.socket connection: Connected socket.
+    :param int | None max_length: Largest accepted batch body in bytes, checked before the body is read.
+    :return: list[tuple[dict, bytes]] | None Headers and payloads of messages, None if connection was closed.
+    :raises ConnectionError: If batch is larger than max_length.
+    """
+
+    header = _receive_exactly(connection, _FRAME.size)
+    if header is None:
+        return None
+    count, length = _FRAME.unpack(header)
+    if max_length is not None and length > max_length:
+        raise ConnectionError(f'Batch of {length} bytes exceeds limit of {max_length} bytes.')
+    body = _receive_exactly(connection, length) if length else bytearray()
+    if body is None:
+        raise ConnectionError('Connection closed in the middle of a batch.')
+
+    messages = []
+    view = memoryview(body)
+    offset = 0
+    for _ in range(count):
+        header_length, payload_length = _MESSAGE.unpack_from(body, offset)
+        offset += _MESSAGE.size
+        message = json.loads(bytes(view[offset:offset + header_length]))
+        offset += header_length
+        messages.append((message, bytes(view[offset:offset + payload_length])))
+        offset += payload_length
+
+    return messages
+
+
+def write_batch(
+        connection: socket.socket,
+        messages: list[tuple[dict, bytes]]
+) -> int:
+    """
+    Write messages as single batch.
+
+    :param socket.socket connection: Connected socket.
+    :param list[tuple[dict, bytes]] messages: Headers and payloads of messages.
+    :return: int Number of sent bytes.
+    """
+
+    parts = []
+    for message, payload in messages:
+        header = json.dumps(message, separators=(',', ':')).encode()
+        parts.extend((_MESSAGE.pack(len(header), len(payload)), header, payload))
+    body = b''.join(parts)
+    connection.sendall(_FRAME.pack(len(messages), len(body)) + body)
+
+    return _FRAME.size + len(body)
+
+
+class RemoteBackend(ReplicaBackend):
+    """
+    Replica stored by replica server on another host, reached over TCP or Unix socket.
+
+    Connection is not encrypted, the token and file content are sent in plaintext, so TCP transport
+    is meant for trusted networks and loopback only, other networks have to be crossed through
+    SSH tunnel or VPN.
+
+    Operations are queued and sent by sender thread, which packs all queued operations into single batch,
+    and replies are matched to waiting callers by receiver thread, so operations of many worker threads
+    share round trips. Directory creation, modification time updates and file content are sent without
+    waiting for reply, server runs operations of the connection in order. File content is compressed
+    with streaming zlib codec, existing files at least delta threshold large get only changed blocks.
+    """
+
+    def __init__(
+            self,
+            address: str,
+            replica_dir: pathlib.Path,
+            token: str | None = None,
+            compression_level: int = settings.REMOTE_COMPRESSION_LEVEL
+    ) -> None:
+        """
+        Connect to replica server.
+
+        :param str address: Server address, tcp://host:port or unix:///path/to/socket.
+        :param pathlib.Path replica_dir: Path of the replica directory used by synchronizer, mapped to server root.
+        :param str | None token: Shared secret server was started with, sent unencrypted.
+        :param int compression_level: Level of zlib compression of file content, 0 disables it.
+        """
+
+        self.address: str = address
+        self.replica_dir: pathlib.Path = replica_dir
+        self.compression_level: int = compression_level
+        family, socket_address = parse_address(address)
+        if family == socket.AF_UNIX:
+            self.connection: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.connection.settimeout(settings.REMOTE_CONNECT_TIMEOUT)
+            self.connection.connect(socket_address)
+        else:
+            self.connection = socket.create_connection(socket_address, timeout=settings.REMOTE_CONNECT_TIMEOUT)
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connection.settimeout(None)
+
+        self.queue: queue.Queue = queue.Queue(settings.REMOTE_QUEUE_SIZE)
+        self.pending: dict[int, concurrent.futures.Future] = {}
+        self.lock: threading.Lock = threading.Lock()
+        self.ids: itertools.count = itertools.count(1)
+        self.error: OSError | None = None
+        self.batches: int = 0
+        self.messages: int = 0
+        self.bytes_sent: int = 0
+        self.sender: threading.Thread = threading.Thread(target=self.send_batches, name='replica-sender', daemon=True)
+        self.receiver: threading.Thread = threading.Thread(
+            target=self.receive_batches, name='replica-receiver', daemon=True
+        )
+        self.sender.start()
+        self.receiver.start()
+        try:
+            self.call('hello', token=token, version=settings.REMOTE_PROTOCOL_VERSION)
+        except OSError:
+            self.close()
+            raise
+
+    def relative(self, path: pathlib.Path) -> str:
+        """
+        Get path relative to the server root.
+
+        :param pathlib.Path path: Replica path.
+        :return: str Relative POSIX path.
+        """
+
+        return path.relative_to(self.replica_dir).as_posix()
+
+    def request(
+            self,
+            operation: str,
+            payload: bytes = b'',
+            messages: list[tuple[dict, bytes]] | None = None,
+            **arguments
+    ) -> concurrent.futures.Future:
+        """
+        Queue operation which reply is awaited.
+
+        :param str operation: Operation name.
+        :param bytes payload: Raw payload of the operation.
+        :param list[tuple[dict, bytes]] | None messages: Operations without reply queued before this one,
+            so they go in the same batch.
+        :return: concurrent.futures.Future Future resolved with reply result and payload.
+        """
+
+        future = concurrent.futures.Future()
+        request_id = next(self.ids)
+        with self.lock:
+            if self.error is not None:
+                raise ConnectionError(f'Connection to replica server {self.address} failed: {self.error}')
+            self.pending[request_id] = future
+        self.queue.put([*(messages or ()), ({'id': request_id, 'op': operation, **arguments}, payload)])
+        return future
+
+    def call(
+            self,
+            operation: str,
+            payload: bytes = b'',
+            **arguments
+    ) -> tuple[object, bytes]:
+        """
+        Run operation on the server and wait for its reply.
+
+        :param str operation: Operation name.
+        :param bytes payload: Raw payload of the operation.
+        :return: tuple[object, bytes] Result and payload of the reply.
+        :raises OSError: Error of the operation raised by the server.
+        """
+
+        return self.request(operation, payload, **arguments).result()
+
+    def post(
+            self,
+            operation: str,
+            payload: bytes = b'',
+            **arguments
+    ) -> None:
+        """
+        Queue operation without waiting for its reply, server reports only its failure.
+
+        :param str operation: Operation name.
+        :param bytes payload: Raw payload of the operation.
+        """
+
+        self.send([({'op': operation, **arguments}, payload)])
+
+    def send(self, messages: list[tuple[dict, bytes]]) -> None:
+        """
+        Queue operations without waiting for their replies, they go in the same batch.
+
+        :param list[tuple[dict, bytes]] messages: Headers and payloads of operations.
+        """
+
+        if self.error is not None:
+            raise ConnectionError(f'Connection to replica server {self.address} failed: {self.error}')
+        self.queue.put(messages)
+
+    def queue_data(
+            self,
+            messages: list[tuple[dict, bytes]],
+            payload: bytes,
+            **arguments
+    ) -> list[tuple[dict, bytes]]:
+        """
+        Add file content to operations of an upload, queueing them once they hold a chunk of content.
+
+        :param list[tuple[dict, bytes]] messages: Operations of the upload not queued yet.
+        :param bytes payload: Compressed file content.
+        :return: list[tuple[dict, bytes]] Operations of the upload still not queued.
+        """
+
+        messages.append(({'op': 'write_data', **arguments}, payload))
+        if sum(len(message_payload) for _, message_payload in messages) < settings.COPY_CHUNK_SIZE:
+            return messages
+        self.send(messages)
+        return []
+
+    def send_batches(self) -> None:
+        """Send queued operations, all operations queued in the meantime go in single batch."""
+
+        try:
+            stopped = False
+            while not stopped:
+                queued = self.queue.get()
+                if queued is None:
+                    break
+                messages = list(queued)
+                size = sum(len(payload) for _, payload in queued)
+                while size < settings.REMOTE_BATCH_SIZE and len(messages) < settings.REMOTE_BATCH_MESSAGES:
+                    try:
+                        queued = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if queued is None:
+                        stopped = True
+                        break
+                    messages.extend(queued)
+                    size += sum(len(payload) for _, payload in queued)
+                self.bytes_sent += write_batch(self.connection, messages)
+                self.batches += 1
+                self.messages += len(messages)
+        except OSError as error:
+            self.fail(error)
+            while self.queue.get() is not None:
+                pass
+
+    def receive_batches(self) -> None:
+        """Resolve callers waiting for replies, failures of operations sent without waiting are logged."""
+
+        try:
+            while (messages := read_batch(self.connection)) is not None:
+                for message, payload in messages:
+                    self.resolve(message, payload)
+            error = ConnectionError(f'Replica server {self.address} closed connection.')
+        except (OSError, ValueError, struct.error) as exception:
+            error = exception if isinstance(exception, OSError) else ConnectionError(f'Invalid reply: {exception}')
+        self.fail(error)
+
+    def resolve(
+            self,
+            message: dict,
+            payload: bytes
+    ) -> None:
+        """
+        Pass reply to the caller waiting for it.
+
+        :param dict message: Reply header.
+        :param bytes payload: Reply payload.
+        """
+
+        with self.lock:
+            future = self.pending.pop(message.get('id'), None)
+
+        if 'error' in message:
+            code, reason, path = message['error']
+            error = OSError(code, reason, str(self.replica_dir / path) if path is not None else None)
+            if future is None:
+                logging.error(f'Replica operation {message.get("op")} failed: {error}')
+            else:
+                future.set_exception(error)
+        elif future is not None:
+            future.set_result((message.get('result'), payload))
+
+    def fail(self, error: OSError) -> None:
+        """
+        Fail all operations waiting for reply after the connection broke.
+
+        :param OSError error: Connection error.
+        """
+
+        with self.lock:
+            if self.error is None:
+                self.error = error
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            future.set_exception(ConnectionError(f'Connection to replica server {self.address} failed: {error}'))
+
+    def stat(
+            self,
+            path: pathlib.Path,
+            follow_symlinks: bool = True
+    ) -> ReplicaStat:
+        result, _ = self.call('stat', path=self.relative(path), follow=follow_symlinks)
+        return ReplicaStat(*result)
+
+    def listdir(self, path: pathlib.Path) -> list[tuple[str, ReplicaStat]]:
+        result, _ = self.call('list', path=self.relative(path))
+        return [(name, ReplicaStat(*child_stat)) for name, *child_stat in result]
+
+    def mkdir(self, path: pathlib.Path) -> None:
+        file_log.info('Creating dir from path: %s', path)
+        self.post('mkdir', path=self.relative(path))
+
+    def rename(
+            self,
+            path: pathlib.Path,
+            new_path: pathlib.Path
+    ) -> None:
+        file_log.info('Replacing %s to %s', path, new_path)
+        self.call('rename', path=self.relative(path), new_path=self.relative(new_path))
+
+    def delete(
+            self,
+            path: pathlib.Path,
+            is_dir: bool
+    ) -> None:
+        file_log.info('Removing %s from path: %s', 'dir' if is_dir else 'file', path)
+        self.call('delete', path=self.relative(path), is_dir=is_dir)
+
+    def set_mtime(
+            self,
+            path: pathlib.Path,
+            mtime_ns: int
+    ) -> None:
+        self.post('set_mtime', path=self.relative(path), mtime_ns=mtime_ns)
+
+    def digest(self, path: pathlib.Path) -> bytes:
+        _, digest = self.call('digest', path=self.relative(path))
+        return digest
+
+    def flush(self) -> int:
+        result, _ = self.call('flush')
+        return result
+
+    def block_hashes(
+            self,
+            path: pathlib.Path,
+            block_size: int = settings.DELTA_BLOCK_SIZE
+    ) -> list[bytes]:
+        """
+        Get hashes of blocks of replica file content.
+
+        :param pathlib.Path path: Replica path.
+        :param int block_size: Size of a single block in bytes.
+        :return: list[bytes] Block hashes.
+        """
+
+        _, hashes = self.call('hashes', path=self.relative(path), block_size=block_size)
+        return [hashes[offset:offset + settings.DIGEST_SIZE] for offset in range(0, len(hashes), settings.DIGEST_SIZE)]
+
+    def write(self, replica_file: TextFile) -> int:
+        file_log.info('Creating file from path: %s', replica_file.path)
+        if replica_file.origin is None:
+            self.call('touch', path=self.relative(replica_file.path))
+            return 0
+
+        digest = new_digest() if replica_file.compute_digest else None
+        if (
+                replica_file.delta_threshold is not None
+                and replica_file.origin.stat().st_size >= replica_file.delta_threshold
+                and self.is_single_link(replica_file.path)
+        ):
+            blocks = replica_file.blocks or self.block_hashes(replica_file.path)
+            written, size, replica_file.blocks = self.send_blocks(replica_file, blocks, digest)
+            file_log.info('Delta transfer of %s: written %d of %d bytes', replica_file.path, written, size)
+        else:
+            written = self.send_file(replica_file, digest)
+            replica_file.blocks = None
+        replica_file.digest = digest.digest() if digest is not None else None
+
+        return written
+
+    def send_file(
+            self,
+            replica_file: TextFile,
+            digest=None
+    ) -> int:
+        """
+        Send whole content of origin file, server writes it through temporary file and atomic rename.
+
+        :param TextFile replica_file: Replica file with origin set.
+        :param digest: Optional hash object updated with sent content.
+        :return: int Number of sent bytes before compression.
+        """
+
+        upload = next(self.ids)
+        compressor = zlib.compressobj(self.compression_level)
+        sent = 0
+        messages = [({'op': 'write_begin', 'path': self.relative(replica_file.path), 'write': upload, 'delta': False}, b'')]
+        with open(replica_file.origin, 'rb', buffering=0) as source:
+            try:
+                while chunk := source.read(settings.COPY_CHUNK_SIZE):
+                    if digest is not None:
+                        digest.update(chunk)
+                    data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                    messages = self.queue_data(messages, data, write=upload)
+                    sent += len(chunk)
+                    if replica_file.throttle is not None:
+                        replica_file.throttle.transfer(len(chunk))
+                source_stat = os.fstat(source.fileno())
+            except BaseException:
+                self.send([*messages, ({'op': 'write_abort', 'write': upload}, b'')])
+                raise
+
+        self.request(
+            'write_end', messages=messages, path=self.relative(replica_file.path), write=upload, size=sent,
+            mode=stat.S_IMODE(source_stat.st_mode), atime_ns=source_stat.st_atime_ns, mtime_ns=source_stat.st_mtime_ns
+        ).result()
+        return sent
+
+    def send_blocks(
+            self,
+            replica_file: TextFile,
+            blocks: list[bytes],
+            digest=None
+    ) -> tuple[int, int, list[bytes]]:
+        """
+        Send blocks of origin file which differ from the replica, server updates the replica in place.
+
+        :param TextFile replica_file: Replica file with origin set.
+        :param list[bytes] blocks: Block hashes of the replica content.
+        :param digest: Optional hash object updated with origin content.
+        :return: tuple[int, int, list[bytes]] Bytes sent before compression, file size and block hashes of the new content.
+        """
+
+        upload = next(self.ids)
+        compressor = zlib.compressobj(self.compression_level)
+        hashes = []
+        sent = 0
+        offset = 0
+        messages = [({'op': 'write_begin', 'path': self.relative(replica_file.path), 'write': upload, 'delta': True}, b'')]
+        with open(replica_file.origin, 'rb', buffering=0) as source:
+            try:
+                while block := source.read(settings.DELTA_BLOCK_SIZE):
+                    if digest is not None:
+                        digest.update(block)
+                    current = block_hash(block)
+                    if len(hashes) >= len(blocks) or blocks[len(hashes)] != current:
+                        data = compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                        messages = self.queue_data(messages, data, write=upload, offset=offset)
+                        sent += len(block)
+                        if replica_file.throttle is not None:
+                            replica_file.throttle.transfer(len(block))
+                    hashes.append(current)
+                    offset += len(block)
+                source_stat = os.fstat(source.fileno())
+            except BaseException:
+                self.send([*messages, ({'op': 'write_abort', 'write': upload}, b'')])
+                raise
+
+        self.request(
+            'write_end', messages=messages, path=self.relative(replica_file.path), write=upload, size=offset,
+            mode=stat.S_IMODE(source_stat.st_mode), atime_ns=source_stat.st_atime_ns, mtime_ns=source_stat.st_mtime_ns
+        ).result()
+        return sent, offset, hashes
+
+    def close(self) -> None:
+        """Send remaining operations and close the connection."""
+
+        self.queue.put(None)
+        self.sender.join()
+        try:
+            self.connection.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        self.receiver.join()
+        self.connection.close()
+
+
+class _Upload:
+    """File content being received by the server."""
+
+    def __init__(
+            self,
+            path: pathlib.Path,
+            delta: bool
+    ) -> None:
+        """
+        Open replica file or its temporary file, error is kept until the end of upload.
+
+        :param pathlib.Path path: Replica path.
+        :param bool delta: Existing file is updated in place.
+        """
+
+        self.path: pathlib.Path = path
+        self.delta: bool = delta
+        self.decompressor = zlib.decompressobj()
+        self.error: OSError | None = None
+        self.fd: int | None = None
+        self.temp_path: str | None = None
+        try:
+            if delta:
+                self.fd = os.open(path, os.O_RDWR)
+            else:
+                self.open_temp()
+        except OSError as error:
+            self.error = error
+
+    def open_temp(self) -> None:
+        """Create temporary file next to the replica path, creating missing parents."""
+
+        try:
+            self.fd, self.temp_path = tempfile.mkstemp(prefix=f'.{self.path.name}.', suffix='.tmp', dir=self.path.parent)
+        except FileNotFoundError:
+            self.path.parent.mkdir(exist_ok=True, parents=True)
+            self.fd, self.temp_path = tempfile.mkstemp(prefix=f'.{self.path.name}.', suffix='.tmp', dir=self.path.parent)
+
+    def write(
+            self,
+            payload: bytes,
+            offset: int | None = None
+    ) -> None:
+        """
+        Write received content.
+
+        :param bytes payload: Compressed content.
+        :param int | None offset: Offset of the block updated in place.
+        """
+
+        if self.error is not None:
+            return
+        try:
+            data = memoryview(self.decompressor.decompress(payload))
+            written = 0
+            while written < len(data):
+                if offset is None:
+                    written += os.write(self.fd, data[written:])
+                else:
+                    written += os.pwrite(self.fd, data[written:], offset + written)
+        except (OSError, zlib.error) as error:
+            self.error = error if isinstance(error, OSError) else OSError(errno.EIO, str(error))
+
+    def finish(
+            self,
+            size: int,
+            mode: int,
+            atime_ns: int,
+            mtime_ns: int,
+            durability: Durability
+    ) -> None:
+        """
+        Finish replica file with metadata of the origin.
+
+        :param int size: Size of the origin file.
+        :param int mode: Permissions of the origin file.
+        :param int atime_ns: Access time of the origin file in nanoseconds.
+        :param int mtime_ns: Modification time of the origin file in nanoseconds.
+        :param Durability durability: Flushing of the replica file, in strict mode its content is flushed before the rename.
+        """
+
+        if self.error is not None:
+            raise self.error
+        if self.delta:
+            os.ftruncate(self.fd, size)
+        os.fchmod(self.fd, mode)
+        os.utime(self.fd, ns=(atime_ns, mtime_ns))
+        if durability.strict:
+            os.fsync(self.fd)
+        os.close(self.fd)
+        self.fd = None
+        if self.temp_path is not None:
+            os.replace(self.temp_path, self.path)
+            self.temp_path = None
+        durability.file_written(self.path, flushed=durability.strict)
+
+    def abort(self) -> None:
+        """Close replica file, removing temporary file."""
+
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        if self.temp_path is not None:
+            os.unlink(self.temp_path)
+            self.temp_path = None
+
+
+class ReplicaServer:
+    """
+    Server storing replica in local directory for RemoteBackend clients.
+
+    Every connection is served by its own thread, which runs operations of a batch in order and replies
+    to all of them in single batch. Paths outside of the root are rejected. Token only authenticates
+    clients, it is compared in constant time but the connection is not encrypted, so server listening
+    on TCP beyond loopback warns that it has to be reachable from trusted network only.
+    """
+
+    def __init__(
+            self,
+            root: pathlib.Path,
+            address: str,
+            token: str | None = None,
+            durability: str = 'none'
+    ) -> None:
+        """
+        Start listening.
+
+        :param pathlib.Path root: Replica directory.
+        :param str address: Listening address, tcp://host:port or unix:///path/to/socket.
+        :param str | None token: Shared secret clients have to present, None accepts every client.
+        :param str durability: Flushing of replica writes to disk, one of settings.DURABILITY_MODES.
+            In batch mode changes are flushed when client finishes synchronization cycle.
+        """
+
+        self.root: pathlib.Path = root.resolve()
+        self.token: str | None = token
+        self.backend: LocalBackend = LocalBackend(Durability(durability, self.root))
+        self.stopped: threading.Event = threading.Event()
+        family, socket_address = parse_address(address)
+        if family == socket.AF_UNIX:
+            self.listener: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.listener.bind(socket_address)
+            self.listener.listen()
+        else:
+            self.listener = socket.create_server(socket_address, family=family)
+            if not is_loopback(socket_address[0]):
+                logging.warning(
+                    f'Replica server listens on {address} without encryption, token and file content are sent '
+                    f'in plaintext. Use it on trusted network only, otherwise tunnel the connection over SSH.'
+                )
+        self.socket_path: str | None = socket_address if family == socket.AF_UNIX else None
+
+    @property
+    def address(self) -> str:
+        """
+        Address clients connect to, with port chosen by the system when listening on port 0.
+        :return: str Server address.
+        """
+
+        if self.socket_path is not None:
+            return f'unix://{self.socket_path}'
+        host, port = self.listener.getsockname()[:2]
+        return f'tcp://[{host}]:{port}' if ':' in host else f'tcp://{host}:{port}'
+
+    def serve_forever(self) -> None:
+        """Accept connections until closed."""
+
+        logging.info(f'Serving replica {self.root} on {self.address}')
+        while not self.stopped.is_set():
+            try:
+                connection, _ = self.listener.accept()
+            except OSError:
+                if self.stopped.is_set():
+                    break
+                raise
+            threading.Thread(target=self.serve, args=(connection,), name='replica-connection', daemon=True).start()
+
+    def close(self) -> None:
+        """Stop accepting connections."""
+
+        self.stopped.set()
+        try:
+            self.listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.listener.close()
+        if self.socket_path is not None and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def serve(self, connection: socket.socket) -> None:
+        """
+        Run operations received over single connection.
+
+        :param socket.socket connection: Accepted connection.
+        """
+
+        uploads: dict[int, _Upload] = {}
+        authenticated = [self.token is None]
+        try:
+            with connection:
+                while (messages := read_batch(connection, self.frame_limit(authenticated[0]))) is not None:
+                    replies = []
+                    for message, payload in messages:
+                        reply = self.handle(message, payload, uploads, authenticated)
+                        if reply is not None:
+                            replies.append(reply)
+                    if replies:
+                        write_batch(connection, replies)
+        except (OSError, ValueError, struct.error) as error:
+            logging.warning(f'Replica connection failed: {error}')
+        finally:
+            for upload in uploads.values():
+                upload.abort()
+
+    def frame_limit(self, authenticated: bool) -> int:
+        """
+        Get size of the largest batch accepted from the client, small one until client presents the token.
+
+        :param bool authenticated: Client has presented the token.
+        :return: int Largest batch body in bytes.
+        """
+
+        return settings.REMOTE_MAX_FRAME_SIZE if authenticated else settings.REMOTE_HELLO_FRAME_SIZE
+
+    def resolve(self, path: str) -> pathlib.Path:
+        """
+        Get local path of replica path sent by client.
+
+        :param str path: Path relative to the root.
+        :return: pathlib.Path Path below the root.
+        :raises PermissionError: If path points outside of the root.
+        """
+
+        relative = pathlib.PurePosixPath(path)
+        if relative.is_absolute() or '..' in relative.parts:
+            raise PermissionError(errno.EACCES, 'Path outside of replica', path)
+        return self.root.joinpath(*relative.parts)
+
+    def handle(
+            self,
+            message: dict,
+            payload: bytes,
+            uploads: dict[int, _Upload],
+            authenticated: list[bool]
+    ) -> tuple[dict, bytes] | None:
+        """
+        Run single operation.
+
+        :param dict message: Operation header.
+        :param bytes payload: Operation payload.
+        :param dict[int, _Upload] uploads: Uploads of the connection in progress.
+        :param list[bool] authenticated: Single flag set once client presents the token.
+        :return: tuple[dict, bytes] | None Reply, None for successful operations sent without waiting.
+        """
+
+        operation = message.get('op')
+        result, data = None, b''
+        try:
+            if operation == 'hello':
+                if message.get('version') != settings.REMOTE_PROTOCOL_VERSION:
+                    raise OSError(errno.EPROTO, f'Protocol version {settings.REMOTE_PROTOCOL_VERSION} required')
+                if self.token is not None and not hmac.compare_digest(message.get('token') or '', self.token):
+                    raise PermissionError(errno.EACCES, 'Invalid token')
+                authenticated[0] = True
+            elif not authenticated[0]:
+                raise PermissionError(errno.EACCES, 'Not authenticated')
+            elif operation == 'write_data':
+                uploads[message['write']].write(payload, message.get('offset'))
+            elif operation == 'write_begin':
+                uploads[message['write']] = _Upload(self.resolve(message['path']), message['delta'])
+            elif operation == 'write_end':
+                upload = uploads.pop(message['write'])
+                try:
+                    upload.finish(
+                        message['size'], message['mode'], message['atime_ns'], message['mtime_ns'], self.backend.durability
+                    )
+                finally:
+                    upload.abort()
+            elif operation == 'write_abort':
+                uploads.pop(message['write']).abort()
+            elif operation == 'stat':
+                result = list(self.backend.stat(self.resolve(message['path']), message['follow']))
+            elif operation == 'list':
+                result = [[name, *child_stat] for name, child_stat in self.backend.listdir(self.resolve(message['path']))]
+            elif operation == 'mkdir':
+                self.backend.mkdir(self.resolve(message['path']))
+            elif operation == 'touch':
+                replica_file = TextFile(self.resolve(message['path']))
+                self.backend.write(replica_file)
+            elif operation == 'rename':
+                self.backend.rename(self.resolve(message['path']), self.resolve(message['new_path']))
+            elif operation == 'delete':
+                self.backend.delete(self.resolve(message['path']), message['is_dir'])
+            elif operation == 'set_mtime':
+                self.backend.set_mtime(self.resolve(message['path']), message['mtime_ns'])
+            elif operation == 'digest':
+                data = self.backend.digest(self.resolve(message['path']))
+            elif operation == 'hashes':
+                data = self.block_hashes(self.resolve(message['path']), message['block_size'])
+            elif operation == 'flush':
+                result = self.backend.flush()
+            else:
+                raise OSError(errno.ENOSYS, f'Unknown operation {operation}')
+        except (OSError, KeyError, TypeError, ValueError) as error:
+            if not isinstance(error, OSError):
+                error = OSError(errno.EINVAL, f'Invalid {operation} request: {error!r}')
+            reason = [error.errno or errno.EIO, error.strerror or str(error), message.get('path')]
+            return {'id': message.get('id'), 'op': operation, 'error': reason}, b''
+
+        if 'id' not in message:
+            return None
+        return {'id': message['id'], 'result': result}, data
+
+    @classmethod
+    def block_hashes(
+            cls,
+            path: pathlib.Path,
+            block_size: int
+    ) -> bytes:
+        """
+        Hash blocks of replica file content.
+
+        :param pathlib.Path path: Replica path.
+        :param int block_size: Size of a single block in bytes.
+        :return: bytes Concatenated block hashes.
+        """
+
+        hashes = []
+        with open(path, 'rb', buffering=0) as file:
+            while block := file.read(block_size):
+                hashes.append(block_hash(block))
+
+        return b''.join(hashes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve replica directory to synchronizer running on another host.')
+    parser.add_argument('--root', type=pathlib.Path, required=True, help='Required. Path to replica directory.')
+    parser.add_argument(
+        '--listen',
+        required=True,
+        help='Required. Listening address, tcp://host:port or unix:///path/to/socket.'
+    )
+    parser.add_argument(
+        '--token-file',
+        type=pathlib.Path,
+        help='Optional. File with shared secret clients have to present. Recommended when listening on TCP. '
+             'The token and file content are sent unencrypted, listen on TCP only on loopback or trusted network.'
+    )
+    parser.add_argument(
+        '--durability',
+        choices=settings.DURABILITY_MODES,
+        default=settings.DEFAULT_DURABILITY,
+        help=f'Optional. Flushing of replica writes to disk. Default {settings.DEFAULT_DURABILITY}.'
+    )
+    parser.add_argument(
+        '--log-level',
+        type=str.upper,
+        choices=settings.LOGGING_LEVELS,
+        default=settings.DEFAULT_LOG_LEVEL,
+        help=f'Optional. Logging log-level. Default {settings.DEFAULT_LOG_LEVEL}.'
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format=settings.LOG_FORMAT, datefmt=settings.LOG_DATE_FORMAT)
+
+    token = args.token_file.read_text().strip() if args.token_file is not None else None
+    server = ReplicaServer(args.root, args.listen, token, args.durability)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
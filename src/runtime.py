@@ -0,0 +1,125 @@
+import logging
+import os
+import signal
+import threading
+import time
+import typing
+
+
+class Runtime:
+    """Daemon runtime running synchronization cycles at fixed interval until stopped by signal."""
+
+    def __init__(self, interval: float) -> None:
+        """
+        Init runtime.
+
+        :param float interval: Interval between cycles in seconds.
+        """
+
+        self.interval: float = interval
+        self.stopped: threading.Event = threading.Event()
+        self.next_run: float = time.monotonic() + interval
+        self._running: threading.Lock = threading.Lock()
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        os.set_blocking(self._wakeup_read, False)
+        os.set_blocking(self._wakeup_write, False)
+
+    @property
+    def wakeup_fd(self) -> int:
+        """
+        Descriptor which becomes readable when runtime is stopped.
+        :return: int File descriptor.
+        """
+
+        return self._wakeup_read
+
+    def install_signal_handlers(self) -> None:
+        """Stop runtime gracefully on SIGTERM and SIGINT."""
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def stop(self, signum: int | None = None, frame=None) -> None:
+        """
+        Request stop, currently running cycle is finished first.
+
+        :param int | None signum: Number of received signal.
+        """
+
+        if signum is not None:
+            logging.info(f'Received {signal.Signals(signum).name}, stopping after current cycle.')
+        self.stopped.set()
+        try:
+            os.write(self._wakeup_write, b'\0')
+        except BlockingIOError:
+            pass
+
+    def trigger(self) -> None:
+        """Run next cycle as soon as possible."""
+
+        self.next_run = time.monotonic()
+
+    def run_cycle(self, cycle: typing.Callable[[], typing.Any]) -> float | None:
+        """
+        Run single cycle unless previous one is still running.
+
+        :param typing.Callable cycle: Synchronization cycle.
+        :return: float | None Cycle duration in seconds, None if cycle was skipped.
+        """
+
+        if not self._running.acquire(blocking=False):
+            logging.warning('Previous cycle is still running, skipping tick.')
+            return None
+
+        start = time.monotonic()
+        try:
+            cycle()
+        except Exception:
+            logging.exception('Synchronization cycle failed.')
+        finally:
+            self._running.release()
+
+        elapsed = time.monotonic() - start
+        logging.info(f'Cycle took {elapsed:.3f}s ({elapsed / self.interval:.0%} of {self.interval}s interval).')
+        return elapsed
+
+    def run(
+            self,
+            cycle: typing.Callable[[], typing.Any],
+            idle: typing.Callable[[float], typing.Any] | None = None
+    ) -> None:
+        """
+        Run cycles until stopped, sleeping until next deadline in between.
+
+        Ticks missed by cycle longer than interval are skipped instead of being run back to back.
+
+        :param typing.Callable cycle: Synchronization cycle.
+        :param typing.Callable | None idle: Called with time left to next deadline instead of sleeping.
+        """
+
+        while not self.stopped.is_set():
+            timeout = self.next_run - time.monotonic()
+            if timeout > 0:
+                if idle is None:
+                    self.stopped.wait(timeout)
+                else:
+                    idle(timeout)
+                continue
+
+            start = time.monotonic()
+            elapsed = self.run_cycle(cycle) or 0
+            skipped = int(elapsed // self.interval)
+            if skipped:
+                logging.warning(
+                    f'Cycle took {elapsed:.3f}s which is longer than {self.interval}s interval, '
+                    f'skipping {skipped} tick(s).'
+                )
+            self.next_run = start + (skipped + 1) * self.interval
+
+        logging.info('Stopping synchronizer.')
+
+    def close(self) -> None:
+        """Close wakeup descriptors."""
+
+        os.close(self._wakeup_read)
+        os.close(self._wakeup_write)
@@ -0,0 +1,214 @@
+import logging
+import os
+import pathlib
+import time
+import typing
+
+from src.file import DirFile, Snapshot, TextFile
+from src.filters import FileFilter
+
+import src.settings as settings
+
+
+class _Listing(typing.NamedTuple):
+    """Children of directory listed by previous scan, with snapshots kept only when they are trusted."""
+
+    mtime_ns: int
+    children: list[tuple[str, bool, Snapshot | None]]
+
+
+class ScanCache:
+    """
+    Directory listings of previous scan, reused while modification time of the directory does not change.
+
+    Adding, removing or renaming an entry changes modification time of its directory, so children of unchanged
+    directory are only stat-ed instead of listed again. In trust mode snapshots of files are reused too and
+    only directories are stat-ed, so content changed in place is not noticed until the directory changes.
+    Directories modified shortly before they were listed are not cached, as a change made in the same
+    timestamp tick would not change the modification time.
+    """
+
+    def __init__(self, trust_files: bool = False) -> None:
+        """
+        Init ScanCache class.
+
+        :param bool trust_files: Reuse snapshots of files in unchanged directories instead of stat-ing them.
+        """
+
+        self.trust_files: bool = trust_files
+        self.listings: dict[pathlib.Path, _Listing] = {}
+        self.visited: set[pathlib.Path] = set()
+        self.reused: int = 0
+        self.listed: int = 0
+
+    def start(self) -> None:
+        """Start new scan of the whole tree."""
+
+        self.visited = set()
+        self.reused = self.listed = 0
+
+    def finish(self) -> None:
+        """Forget listings of directories which were not found by the finished scan."""
+
+        for path in self.listings.keys() - self.visited:
+            del self.listings[path]
+        self.visited = set()
+
+    def update_children(
+            self,
+            directory: DirFile,
+            file_filter: FileFilter | None = None
+    ) -> None:
+        """
+        Update children of directory from cached listing if the directory did not change, list it otherwise.
+
+        Cached listings hold children accepted by path rules of the filter, which are the same for every scan.
+
+        :param DirFile directory: Scanned directory with snapshot taken.
+        :param FileFilter | None file_filter: Rules excluding children by path.
+        """
+
+        self.visited.add(directory.path)
+        snapshot = directory.snapshot
+        listing = self.listings.get(directory.path)
+        if listing is not None and snapshot is not None and listing.mtime_ns == snapshot.mtime_ns:
+            try:
+                directory.children = [
+                    self.reuse_child(directory.path / name, is_dir, child_snapshot)
+                    for name, is_dir, child_snapshot in listing.children
+                ]
+                self.reused += 1
+                return
+            except FileNotFoundError:
+                logging.debug('%s changed during scan, listing it again.', directory.path)
+
+        listed_at = time.time_ns()
+        directory.update_children(file_filter)
+        self.listed += 1
+        if snapshot is not None and snapshot.mtime_ns < listed_at - settings.SCAN_CACHE_MIN_AGE_NS:
+            children = []
+            for child in directory.children:
+                is_dir = isinstance(child, DirFile)
+                children.append((child.path.name, is_dir, child.snapshot if self.trust_files and not is_dir else None))
+            self.listings[directory.path] = _Listing(snapshot.mtime_ns, children)
+        else:
+            self.listings.pop(directory.path, None)
+
+    def reuse_child(
+            self,
+            path: pathlib.Path,
+            is_dir: bool,
+            snapshot: Snapshot | None
+    ) -> DirFile | TextFile:
+        """
+        Create child of unchanged directory from cached listing.
+
+        :param pathlib.Path path: Child path.
+        :param bool is_dir: Child is directory.
+        :param Snapshot | None snapshot: Trusted snapshot of file child.
+        :return: DirFile | TextFile Child with snapshot.
+        """
+
+        child = DirFile(path) if is_dir else TextFile(path)
+        child.snapshot = snapshot if snapshot is not None else Snapshot.from_stat(os.stat(path))
+        return child
+
+
+def iter_scan(
+        root: DirFile | TextFile,
+        cache: ScanCache | None = None,
+        file_filter: FileFilter | None = None
+) -> typing.Iterator[list[DirFile | TextFile]]:
+    """
+    Walk tree iteratively, yielding root and then children of every listed directory.
+
+    Every yielded file has its snapshot taken during the walk and parents are yielded before their children.
+    Children lists are released once the directory is listed, so scanned files are not kept alive by their parents.
+    Directories excluded by the filter are never listed. Size and age limits of the filter are not applied,
+    so files not meeting them are not mistaken for deleted ones, synchronizer checks them before copying.
+
+    :param DirFile | TextFile root: Root of scanned tree.
+    :param ScanCache | None cache: Listings of previous scan of the same tree, updated by this scan.
+    :param FileFilter | None file_filter: Include/exclude rules of paths below the root.
+    :return: typing.Iterator[list[DirFile | TextFile]] Batches of files, one per listed directory.
+    """
+
+    root.get_snapshot()
+    yield [root]
+    stack = [root] if isinstance(root, DirFile) else []
+    if cache is not None:
+        cache.start()
+
+    while stack:
+        directory = stack.pop()
+        try:
+            if cache is not None:
+                cache.update_children(directory, file_filter)
+            else:
+                directory.update_children(file_filter)
+        except (FileNotFoundError, NotADirectoryError):
+            logging.debug('%s disappeared during scan.', directory.path)
+            directory.children = []
+            continue
+        except PermissionError:
+            logging.warning(f'Permission denied, skipping {directory.path}')
+            directory.children = []
+            continue
+
+        children = directory.children
+        directory.children = []
+        stack.extend(child for child in reversed(children) if isinstance(child, DirFile))
+        if children:
+            yield children
+
+    if cache is not None:
+        cache.finish()
+
+
+def scan(
+        root: DirFile | TextFile,
+        cache: ScanCache | None = None,
+        file_filter: FileFilter | None = None
+) -> list[DirFile | TextFile]:
+    """
+    Walk tree iteratively, listing every directory once.
+
+    :param DirFile | TextFile root: Root of scanned tree.
+    :param ScanCache | None cache: Listings of previous scan of the same tree, updated by this scan.
+    :param FileFilter | None file_filter: Include/exclude rules of paths below the root.
+    :return: list[DirFile | TextFile] All files of the tree including root, parents first.
+    """
+
+    return [file for files in iter_scan(root, cache, file_filter) for file in files]
+
+
+def scan_paths(
+        paths: typing.Iterable[pathlib.Path],
+        file_filter: FileFilter | None = None
+) -> tuple[list[DirFile | TextFile], list[pathlib.Path]]:
+    """
+    Scan changed paths, e.g. collected by the watcher, every existing one with its whole subtree.
+
+    Paths are scanned parents first, paths excluded by the filter are skipped, paths removed
+    before they are scanned are returned as missing.
+
+    :param typing.Iterable[pathlib.Path] paths: Changed paths.
+    :param FileFilter | None file_filter: Include/exclude rules of the paths and paths below them.
+    :return: tuple[list[DirFile | TextFile], list[pathlib.Path]] Scanned files, parents first, and missing paths.
+    """
+
+    files = []
+    missing = []
+    for path in sorted(set(paths), key=lambda path: len(path.parts)):
+        if not os.path.lexists(path):
+            missing.append(path)
+            continue
+        is_dir = path.is_dir()
+        if file_filter is not None and not file_filter.accepts_path(path, is_dir):
+            continue
+        try:
+            files.extend(scan(DirFile(path) if is_dir else TextFile(path), file_filter=file_filter))
+        except FileNotFoundError:
+            continue
+
+    return files, missing
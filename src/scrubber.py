@@ -0,0 +1,114 @@
+import logging
+import pathlib
+import time
+import typing
+
+from src.backend import LocalBackend, ReplicaBackend
+from src.index import IndexEntry, SyncIndex
+
+import src.settings as settings
+
+
+class ScrubResult(typing.NamedTuple):
+    """Files verified by single scrubber run."""
+
+    files: int
+    bytes: int
+    mismatches: list[str]
+
+
+class Scrubber:
+    """
+    Incremental verifier of replica content against digests of replicated content stored in the sync index.
+
+    Every run verifies next slice of replica files in path order, sized by time elapsed since the previous run,
+    so the whole replica is verified once per period with steady I/O. Position and time of the last run are
+    stored in the index, so verification continues where it stopped after restart.
+    """
+
+    def __init__(
+            self,
+            index: SyncIndex,
+            replica_dir: pathlib.Path,
+            period: float,
+            backend: ReplicaBackend | None = None
+    ) -> None:
+        """
+        Init Scrubber class.
+
+        :param SyncIndex index: Sync index of the replica.
+        :param pathlib.Path replica_dir: Replica directory.
+        :param float period: Time in seconds in which whole replica is verified.
+        :param ReplicaBackend | None backend: Storage of the replica tree, by default local filesystem.
+        """
+
+        self.index: SyncIndex = index
+        self.replica_dir: pathlib.Path = replica_dir
+        self.period: float = period
+        self.backend: ReplicaBackend = backend or LocalBackend()
+        self.credit: float = 0
+        self.total: int | None = None
+
+    def run(self) -> ScrubResult:
+        """
+        Verify next slice of replica files, every file is verified at most once per run.
+
+        Slice goes into debt when the last verified file is larger than what is left of it, next slice is smaller.
+
+        :return: ScrubResult Number of verified files and bytes and relative paths of mismatching replicas.
+        """
+
+        now = time.time()
+        last_run = float(self.index.get_state('scrub_time', now))
+        self.index.set_state('scrub_time', str(now))
+        if self.total is None:
+            self.total = self.index.files_size()
+        self.credit += self.total * min(max(now - last_run, 0), settings.SCRUB_MAX_ELAPSED) / self.period
+
+        cursor = start = self.index.get_state('scrub_cursor', '')
+        files = size = 0
+        mismatches = []
+        wrapped = False
+        while self.credit > 0:
+            entries = self.index.files_after(cursor, settings.SCRUB_BATCH_SIZE)
+            if not entries:
+                if not cursor or wrapped:
+                    self.credit = 0
+                    break
+                logging.info(f'Scrub pass of {self.replica_dir} finished.')
+                cursor = ''
+                wrapped = True
+                self.total = None
+                continue
+
+            for entry in entries:
+                if wrapped and entry.path > start:
+                    self.credit = min(self.credit, 0)
+                if self.credit <= 0:
+                    break
+                cursor = entry.path
+                files += 1
+                size += entry.size
+                self.credit -= entry.size
+                if not self.verify(entry):
+                    mismatches.append(entry.path)
+
+        self.index.set_state('scrub_cursor', cursor)
+        return ScrubResult(files, size, mismatches)
+
+    def verify(self, entry: IndexEntry) -> bool:
+        """
+        Check replica file against its index entry by size and content digest.
+
+        :param IndexEntry entry: Index entry of the replica file.
+        :return: bool True if replica content matches.
+        """
+
+        path = self.replica_dir / entry.path
+        try:
+            if self.backend.stat(path).size != entry.size:
+                return False
+            return self.backend.digest(path) == entry.digest
+        except OSError as error:
+            logging.debug('Could not verify %s: %s', path, error)
+            return False
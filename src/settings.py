@@ -11,3 +11,99 @@ LOG_FILE = BASE_DIR / 'console.log'
 LOGGING_LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
 # Default logging log-level
 DEFAULT_LOG_LEVEL = 'INFO'
+# Format of log records
+LOG_FORMAT = '%(asctime)s - [ %(levelname)s ] - %(message)s'
+# Format of log record time
+LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+### SCHEDULING ###
+# Default synchronization interval in seconds
+DEFAULT_INTERVAL = 30
+
+### COPY ENGINE ###
+# Size of a single chunk used when streaming file content
+COPY_CHUNK_SIZE = 1024 * 1024
+# Size of content digest in bytes (blake2b)
+DIGEST_SIZE = 16
+# Minimal size of the file in bytes updated with block-level delta transfer
+DELTA_THRESHOLD = 64 * 1024 * 1024
+# Size of a single block compared by delta transfer
+DELTA_BLOCK_SIZE = 128 * 1024
+# Number of chunks of shared read queued for writer of single fan-out replica before it reads on its own,
+# also number of first chunks kept for replicas joining the read later
+SHARED_READ_CHUNKS = 32
+# Maximum number of recent shared reads kept for fan-out replicas which have not written the file yet
+SHARED_READS_KEPT = 16
+
+### SYNC INDEX ###
+# Suffix of persistent sync index stored next to the replica directory
+INDEX_SUFFIX = '.index.sqlite'
+# Number of index changes after which the index is committed in the middle of synchronization
+INDEX_COMMIT_ENTRIES = 1000
+# Longest time in seconds index changes stay uncommitted during synchronization
+INDEX_COMMIT_INTERVAL = 5.0
+
+### WATCH MODE ###
+# Time in seconds without new events after which collected changes are synchronized
+WATCH_DEBOUNCE = 0.2
+# Maximum time in seconds changes are collected before synchronization
+WATCH_MAX_DELAY = 2.0
+# Default interval in seconds of full rescan in watch mode
+DEFAULT_RESCAN_INTERVAL = 3600
+
+### SCANNING ###
+# Modes of pruned scanning: off lists every directory, stat reuses listings of directories with unchanged
+# modification time and stats their children, trust also reuses snapshots of their files
+PRUNE_SCAN_MODES = ['off', 'stat', 'trust']
+# Minimal age of directory modification time in nanoseconds for its listing to be reused by next scan
+SCAN_CACHE_MIN_AGE_NS = 1_000_000_000
+# Number of subtrees sharded scan splits the tree into per scan process
+SCAN_SHARDS_PER_WORKER = 4
+# Start method of scan processes, forkserver avoids forking process with running copy threads
+SCAN_MP_CONTEXT = 'forkserver'
+
+### STREAMING ENGINE ###
+# Maximum number of scanned directory listings waiting for the diff stage
+SCAN_QUEUE_SIZE = 64
+# Maximum number of copy tasks waiting for copy workers
+COPY_QUEUE_SIZE = 256
+
+### DAEMON ###
+# Default number of synchronization cycles run at once by multi-pair daemon
+DEFAULT_DAEMON_WORKERS = 4
+# Default number of file operations run at once across all pairs
+DEFAULT_IO_LIMIT = 8
+
+### THROTTLING ###
+# Burst of replication writes allowed above the configured limits, in seconds of the limit
+THROTTLE_BURST = 1.0
+
+### SCRUBBING ###
+# Longest time in seconds since previous scrub counted into the next slice, so long pause does not cause I/O spike
+SCRUB_MAX_ELAPSED = 600
+# Number of index entries read at once by the scrubber
+SCRUB_BATCH_SIZE = 256
+
+### REMOTE REPLICA ###
+# Version of the replica protocol, client and server have to use the same one
+REMOTE_PROTOCOL_VERSION = 2
+# Compression level of file payloads sent to remote replica, 1 favours speed over ratio
+REMOTE_COMPRESSION_LEVEL = 1
+# Maximal payload size in bytes of operations sent to remote replica in single batch
+REMOTE_BATCH_SIZE = 4 * 1024 * 1024
+# Maximal number of operations sent to remote replica in single batch, which bounds size of their headers
+REMOTE_BATCH_MESSAGES = 1024
+# Largest batch in bytes accepted by replica server from authenticated client, larger one closes the connection
+REMOTE_MAX_FRAME_SIZE = 4 * REMOTE_BATCH_SIZE
+# Largest batch in bytes accepted by replica server before the client presents the token
+REMOTE_HELLO_FRAME_SIZE = 64 * 1024
+# Maximum number of operations waiting to be sent to remote replica, each holds at most one chunk of file content
+REMOTE_QUEUE_SIZE = 32
+# Timeout in seconds of connecting to remote replica
+REMOTE_CONNECT_TIMEOUT = 10
+
+### DURABILITY ###
+# Flushing of replica writes to disk: left to the kernel, once per cycle (syncfs), or every file and its directory
+DURABILITY_MODES = ['none', 'batch', 'strict']
+# Default durability mode, favouring throughput over crash safety
+DEFAULT_DURABILITY = 'none'
@@ -0,0 +1,201 @@
+import array
+import concurrent.futures
+import logging
+import os
+import pathlib
+import typing
+
+from src.file import DirFile, Snapshot, TextFile
+from src.filters import FileFilter
+from src.transfer import hash_file
+
+import src.settings as settings
+
+# Kinds of packed entries
+_FILE, _DIR, _FILE_WITHOUT_DIGEST = 0, 1, 2
+# Number of snapshot fields packed per entry
+_SNAPSHOT_FIELDS = len(Snapshot._fields)
+
+
+class _Shard(typing.NamedTuple):
+    """Packed snapshot of single subtree scanned by worker process, entries are parents first."""
+
+    names: bytes
+    parents: bytes
+    snapshots: bytes
+    kinds: bytes
+    digests: bytes
+
+
+def _scan_shard(
+        root: str,
+        digests: bool,
+        file_filter: FileFilter | None = None
+) -> _Shard:
+    """
+    Scan subtree in worker process and pack it into flat arrays, which are much cheaper to send than file objects.
+
+    Directory entries are read the same way as DirFile.update_children reads them, parents are packed before children.
+    Entries which can not be stat-ed are skipped one by one, so they do not hide their siblings.
+
+    :param str root: Root directory of the shard, not included in the result.
+    :param bool digests: Compute content digest of every file.
+    :param FileFilter | None file_filter: Include/exclude rules of paths.
+    :return: _Shard Packed entries of the subtree.
+    """
+
+    names = []
+    parents = array.array('q')
+    snapshots = array.array('q')
+    kinds = bytearray()
+    packed_digests = bytearray()
+
+    stack = [(root, -1)]
+    while stack:
+        directory, parent = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    kind = _DIR if entry.is_dir() else _FILE
+                    if file_filter is not None and not file_filter.accepts_path(entry.path, kind == _DIR):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except (FileNotFoundError, NotADirectoryError):
+                        logging.debug('Skipping %s, it disappeared or is a dangling symlink.', entry.path)
+                        continue
+                    if kind == _DIR:
+                        stack.append((entry.path, len(names)))
+                    names.append(os.fsencode(entry.name))
+                    parents.append(parent)
+                    snapshots.extend((stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_ino, stat.st_nlink))
+                    if digests:
+                        digest = bytes(settings.DIGEST_SIZE)
+                        if kind == _FILE:
+                            try:
+                                digest = hash_file(pathlib.Path(entry.path))
+                            except OSError:
+                                kind = _FILE_WITHOUT_DIGEST
+                        packed_digests += digest
+                    kinds.append(kind)
+        except (FileNotFoundError, NotADirectoryError):
+            logging.debug('%s disappeared during scan.', directory)
+        except PermissionError:
+            logging.warning(f'Permission denied, skipping {directory}')
+
+    return _Shard(b'\0'.join(names), parents.tobytes(), snapshots.tobytes(), bytes(kinds), bytes(packed_digests))
+
+
+def _unpack_shard(
+        root: DirFile,
+        shard: _Shard
+) -> list[DirFile | TextFile]:
+    """
+    Build files of the subtree from packed shard, joining children paths to their parent paths.
+
+    :param DirFile root: Root directory of the shard.
+    :param _Shard shard: Packed entries of the subtree.
+    :return: list[DirFile | TextFile] Files of the subtree, parents first.
+    """
+
+    if not shard.kinds:
+        return []
+
+    parents = array.array('q')
+    parents.frombytes(shard.parents)
+    snapshots = array.array('q')
+    snapshots.frombytes(shard.snapshots)
+
+    files = []
+    for index, name in enumerate(shard.names.split(b'\0')):
+        parent = parents[index]
+        path = (root.path if parent < 0 else files[parent].path) / os.fsdecode(name)
+        kind = shard.kinds[index]
+        file = DirFile(path) if kind == _DIR else TextFile(path)
+        file.snapshot = Snapshot(*snapshots[index * _SNAPSHOT_FIELDS:(index + 1) * _SNAPSHOT_FIELDS])
+        if shard.digests and kind == _FILE:
+            file.digest = shard.digests[index * settings.DIGEST_SIZE:(index + 1) * settings.DIGEST_SIZE]
+        files.append(file)
+
+    return files
+
+
+def iter_sharded_scan(
+        root: DirFile | TextFile,
+        executor: concurrent.futures.Executor,
+        workers: int,
+        digests: bool = False,
+        file_filter: FileFilter | None = None
+) -> typing.Iterator[list[DirFile | TextFile]]:
+    """
+    Walk tree split by subtree across worker processes, yielding root, top levels and then whole subtrees.
+
+    Top levels of the tree are listed in this process until there are enough subtrees to keep all workers busy,
+    every subtree is then scanned (and hashed) by a worker. Parents are yielded before their children.
+
+    :param DirFile | TextFile root: Root of scanned tree.
+    :param concurrent.futures.Executor executor: Process pool scanning subtrees.
+    :param int workers: Number of worker processes.
+    :param bool digests: Compute content digest of every file, stored to TextFile.digest.
+    :param FileFilter | None file_filter: Include/exclude rules of paths below the root.
+    :return: typing.Iterator[list[DirFile | TextFile]] Batches of files, one per listed directory or subtree.
+    """
+
+    root.get_snapshot()
+    yield [root]
+    level = [root] if isinstance(root, DirFile) else []
+
+    while level and len(level) < workers * settings.SCAN_SHARDS_PER_WORKER:
+        next_level = []
+        for directory in level:
+            try:
+                directory.update_children(file_filter)
+            except (FileNotFoundError, NotADirectoryError):
+                logging.debug('%s disappeared during scan.', directory.path)
+                continue
+            except PermissionError:
+                logging.warning(f'Permission denied, skipping {directory.path}')
+                continue
+
+            children = directory.children
+            directory.children = []
+            for child in children:
+                if isinstance(child, DirFile):
+                    next_level.append(child)
+                elif digests:
+                    try:
+                        child.digest = hash_file(child.path)
+                    except OSError:
+                        child.digest = None
+            if children:
+                yield children
+        level = next_level
+
+    futures = {
+        executor.submit(_scan_shard, str(directory.path), digests, file_filter): directory for directory in level
+    }
+    for future in concurrent.futures.as_completed(futures):
+        files = _unpack_shard(futures[future], future.result())
+        if files:
+            yield files
+
+
+def sharded_scan(
+        root: DirFile | TextFile,
+        executor: concurrent.futures.Executor,
+        workers: int,
+        digests: bool = False,
+        file_filter: FileFilter | None = None
+) -> list[DirFile | TextFile]:
+    """
+    Walk tree split by subtree across worker processes.
+
+    :param DirFile | TextFile root: Root of scanned tree.
+    :param concurrent.futures.Executor executor: Process pool scanning subtrees.
+    :param int workers: Number of worker processes.
+    :param bool digests: Compute content digest of every file, stored to TextFile.digest.
+    :param FileFilter | None file_filter: Include/exclude rules of paths below the root.
+    :return: list[DirFile | TextFile] All files of the tree including root, parents first.
+    """
+
+    return [file for files in iter_sharded_scan(root, executor, workers, digests, file_filter) for file in files]
@@ -1,11 +1,30 @@
+import concurrent.futures
 import logging
+import multiprocessing
+import os
 import pathlib
-import shutil
+import time
 import typing
 
 from collections import defaultdict
 
-from src.file import DirFile, TextFile
+from src.backend import LocalBackend, ReplicaBackend
+from src.dedup import DedupStore
+from src.durability import Durability
+from src.file import DirFile, Snapshot, TextFile, TrackedFile
+from src.filters import FileFilter
+from src.index import IndexEntry, SyncIndex
+from src.logs import file_log
+from src.metrics import Metrics
+from src.plan import SyncPlan
+from src.pool import TaskPool
+from src.scanner import ScanCache, scan, scan_paths
+from src.scrubber import Scrubber
+from src.sharded_scanner import sharded_scan
+from src.throttle import Throttle
+from src.transfer import hash_file
+
+import src.settings as settings
 
 
 class Synchronizer:
@@ -14,74 +33,334 @@ class Synchronizer:
     def __init__(
             self,
             source_dir: pathlib.Path,
-            replica_dir: pathlib.Path
+            replica_dir: pathlib.Path,
+            checksum: bool = False,
+            index: SyncIndex | None = None,
+            workers: int = 1,
+            delta_threshold: int | None = None,
+            pool: TaskPool | None = None,
+            dedup: bool = False,
+            metrics: Metrics | None = None,
+            throttle: Throttle | None = None,
+            prune_scan: str = 'off',
+            scan_workers: int = 0,
+            file_filter: FileFilter | None = None,
+            scrub_period: float | None = None,
+            backend: ReplicaBackend | None = None,
+            durability: str = 'none'
     ) -> None:
         """
         Initializer Synchronizer class.
 
         :param pathlib.Path source_dir: Path to source directory.
         :param pathlib.Path replica_dir: Path to replica directory.
+        :param bool checksum: Compare content of every file on each sync, even if metadata is unchanged.
+        :param SyncIndex | None index: Persistent index used to skip already replicated files on startup.
+        :param int workers: Number of threads copying, moving and deleting files.
+        :param int | None delta_threshold: Minimal size of changed file updated in place block by block.
+        :param TaskPool | None pool: Pool running file operations, by default own pool with given number of workers.
+        :param bool dedup: Share data of replicas with identical content and keep source hardlinks as hardlinks.
+        :param Metrics | None metrics: Metrics collected during synchronization cycles, by default not exported.
+        :param Throttle | None throttle: Bandwidth and file operation limits of replica writes, by default unlimited.
+        :param str prune_scan: Reuse listings of unchanged directories, one of settings.PRUNE_SCAN_MODES.
+        :param int scan_workers: Number of processes scanning (and in checksum mode hashing) source subtrees,
+            sharded scan is used only with more than one.
+        :param FileFilter | None file_filter: Include/exclude rules and size and age limits of replicated source files.
+        :param float | None scrub_period: Time in seconds in which replica content is verified against the index
+            slice by slice after every sync, None disables it. Requires index.
+        :param ReplicaBackend | None backend: Storage of the replica tree, by default local filesystem.
+            Dedup requires local filesystem.
+        :param str durability: Flushing of replica writes to disk, one of settings.DURABILITY_MODES. Durability of
+            given backend is configured by the backend.
         """
 
         self.source: DirFile = source_dir
         self.replica: DirFile = replica_dir
-        self.tracked_files: dict[int, dict[str, TextFile | DirFile]] = defaultdict(dict)
+        self.checksum: bool = checksum
+        self.index: SyncIndex | None = index
+        self.indexed: dict[str, IndexEntry] = {}
+        self.index_changes: int = 0
+        self.index_committed: float = time.monotonic()
+        self.source_paths: dict[pathlib.Path, int] = {}
+        self.pool: TaskPool = pool or TaskPool(workers)
+        self.delta_threshold: int | None = delta_threshold
+        self.tracked_files: dict[int, TrackedFile] = {}
+        self.linked_files_ids: set[int] = set()
+        self.metrics: Metrics = metrics or Metrics(source_dir.path, replica_dir.path)
+        self.throttle: Throttle = throttle or Throttle()
+        self.scan_cache: ScanCache | None = ScanCache(trust_files=prune_scan == 'trust') if prune_scan != 'off' else None
+        self.scan_workers: int = scan_workers
+        self.file_filter: FileFilter | None = file_filter
+        if backend is not None and durability != 'none':
+            raise ValueError('Durability of given backend is configured by the backend.')
+        self.backend: ReplicaBackend = backend or LocalBackend(Durability(durability, replica_dir.path))
+        self.durability: Durability | None = self.backend.durability if isinstance(self.backend, LocalBackend) else None
+        if dedup and self.durability is None:
+            raise ValueError('Dedup requires replica on local filesystem.')
+        self.dedup: DedupStore | None = DedupStore(self.durability) if dedup else None
+        self.scrubber: Scrubber | None = None
+        if scrub_period and index is not None:
+            self.scrubber = Scrubber(index, self.replica.path, scrub_period, self.backend)
+        self.scan_executor: concurrent.futures.ProcessPoolExecutor | None = None
+        if scan_workers > 1:
+            self.scan_executor = concurrent.futures.ProcessPoolExecutor(
+                scan_workers, mp_context=multiprocessing.get_context(settings.SCAN_MP_CONTEXT)
+            )
 
         if not self.source.path.exists():
             logging.error(f'Source directory does not exist: {self.source.path}')
             raise Exception("Source directory does not exist.")
 
-        if self.replica.path.exists():
-            logging.warning('Replica directory exist and will be cleared.')
-            shutil.rmtree(self.replica.path)
+        if self.backend.exists(self.replica.path):
+            logging.warning('Replica directory exist and will be reconciled with source.')
 
     def initialize(self) -> None:
-        """Initialize synchronization."""
+        """Initialize synchronization, copying only files which differ from the replica."""
 
         logging.info('Initialization...')
-        self.run_function_recursive(
-            self.source,
-            lambda file: file.update_children() if isinstance(file, DirFile) else None,
-        )
-        self.run_function_recursive(self.source, self.save_tracked_file)
-        self.run_function_recursive(self.source, self.replicate_file)
+        with self.metrics.cycle('initialize'):
+            with self.metrics.phase('scan'):
+                files = self.scan_source()
+            self.initialize_files(files)
+
+    def scan_source(self) -> list[DirFile | TextFile]:
+        """
+        Scan whole source tree, sharded across scan processes or reusing listings of unchanged directories in pruned mode.
+        :return: list[DirFile | TextFile] All source files, parents first.
+        """
+
+        if self.scan_executor is not None:
+            return sharded_scan(
+                self.source, self.scan_executor, self.scan_workers, digests=self.checksum, file_filter=self.file_filter
+            )
+
+        files = scan(self.source, self.scan_cache, self.file_filter)
+        if self.scan_cache is not None:
+            self.metrics.count('dirs_listed', self.scan_cache.listed)
+            self.metrics.count('dirs_reused', self.scan_cache.reused)
+        return files
+
+    def initialize_files(self, files: list[DirFile | TextFile]) -> None:
+        """
+        Initialize synchronization from already scanned source files.
+
+        :param list[DirFile | TextFile] files: Scanned source files, parents first.
+        """
+
+        with self.metrics.phase('diff'):
+            plan = self.plan_initialize(files)
+        self.execute_plan(plan)
+        self.indexed = {}
+
+    def plan_initialize(self, files: list[DirFile | TextFile]) -> SyncPlan:
+        """
+        Track scanned source files and plan initial synchronization without touching the replica.
+
+        Untracked replica files are deleted, files are kept when the loaded index shows their replica
+        is up to date, verified when only their metadata differs and copied otherwise. Files which
+        do not meet size and age limits are deferred.
+
+        :param list[DirFile | TextFile] files: Scanned source files, parents first.
+        :return: SyncPlan Plan of initial synchronization.
+        """
+
+        for file in files:
+            self.save_tracked_file(file)
+        self.metrics.count('files_scanned', len(files))
+
+        if self.index is not None:
+            self.indexed = self.index.load()
+
+        plan = SyncPlan(self.replica.path)
+        for replica_file in self.untracked_replica_files():
+            plan.add('delete', replica_file.path, file=replica_file)
+
+        for file in files:
+            tracked = self.tracked_files.get(file.get_id())
+            if tracked is None or tracked.links and file.path in tracked.links:
+                continue
+
+            relative_path = file.path.relative_to(self.source.path)
+            replica_path = self.replica.path / relative_path
+            snapshot = file.snapshot or file.get_snapshot()
+            if isinstance(file, DirFile):
+                kind = self.replica_state(relative_path, snapshot, DirFile(replica_path))
+                plan.add('mkdir' if kind == 'copy' else kind, replica_path, file=file)
+                continue
+
+            kind = self.replica_state(relative_path, snapshot, TextFile(replica_path))
+            if kind != 'keep' and not self.accepts_content(file):
+                self.defer_file(file)
+                continue
+            if kind == 'copy':
+                kind = self.write_kind(replica_path, snapshot.size)
+            plan.add(
+                kind, replica_path, 0 if kind == 'keep' else snapshot.size, file.path, snapshot.inode, file
+            )
+
+        plan.order()
+        return plan
+
+    def execute_plan(self, plan: SyncPlan) -> None:
+        """
+        Run synchronization plan: renames, deletes, directories parents first, then writes in plan order.
+
+        :param SyncPlan plan: Plan of this synchronization.
+        """
+
+        self.metrics.count('bytes_planned', plan.bytes)
+        with self.metrics.phase('move'):
+            relocations = _Relocations()
+            renames = plan.of_kind('rename')
+            for operation in renames:
+                self.move_replica(operation.file, relocations)
+            for operation in renames:
+                for descendant in operation.descendants:
+                    self.move_replica(descendant, relocations)
+
+        with self.metrics.phase('delete'):
+            self.remove_replicas((operation.file for operation in plan.of_kind('delete')), relocations)
+            self.remove_aside(relocations)
+            self.pool.wait()
+
+        with self.metrics.phase('copy'):
+            for operation in plan.of_kind('mkdir', 'copy', 'delta', 'verify', 'keep'):
+                if operation.task is not None:
+                    self.submit_copy(*operation.task)
+                else:
+                    self.replicate_file(operation.file)
+            self.pool.wait()
+
+            self.update_links()
+
+        with self.metrics.phase('commit'):
+            self.commit_index()
+
+    def close(self) -> None:
+        """Finish pending file operations and close index."""
+
+        self.pool.close()
+        self.backend.close()
+        if self.scan_executor is not None:
+            self.scan_executor.shutdown()
+        if self.index is not None:
+            self.index.close()
+
+    def untracked_replica_files(self) -> typing.Iterator[DirFile | TextFile]:
+        """
+        Find files of existing replica which are not present in source, contents of untracked dirs are skipped.
+        :return: typing.Iterator[DirFile | TextFile] Untracked replica files.
+        """
+
+        if not self.backend.is_dir(self.replica.path):
+            return
+
+        expected = {
+            file.source.path.relative_to(self.source.path): isinstance(file.source, DirFile)
+            for file in self.tracked_files.values()
+        }
+        for file_id in self.linked_files_ids:
+            expected.update((path.relative_to(self.source.path), False) for path in self.tracked_files[file_id].links)
+
+        for root_path, dirs, files in self.backend.walk(self.replica.path):
+            relative_root = root_path.relative_to(self.replica.path)
+
+            for name in files:
+                if expected.get(relative_root / name) is not False:
+                    file_log.info('Untracked replica file %s', root_path / name)
+                    yield TextFile(root_path / name)
+
+            for name in list(dirs):
+                if expected.get(relative_root / name) is not True:
+                    file_log.info('Untracked replica dir %s', root_path / name)
+                    yield DirFile(root_path / name)
+                    dirs.remove(name)
 
     def save_tracked_file(
             self,
             file: DirFile | TextFile
     ) -> None:
-        """Save tracked files."""
+        """Save tracked files, in dedup mode other hardlinks of tracked file are saved as its links."""
 
         file_id = file.get_id()
-        if not self.tracked_files.get(file_id):
-            logging.info(f'Started tracking {file.path}')
-
-        self.tracked_files[file_id].update({
-            'source': file,
-        })
+        tracked = self.tracked_files.get(file_id)
+        if tracked is None:
+            file_log.info('Started tracking %s', file.path)
+            self.tracked_files[file_id] = TrackedFile(file)
+        elif self.is_link(tracked, file):
+            if tracked.links is None:
+                tracked.links = set()
+            tracked.links.add(file.path)
+            self.linked_files_ids.add(file_id)
+        else:
+            tracked.source = file
+        self.source_paths[file.path] = file_id
 
-    def run_function_recursive(
+    def is_link(
             self,
-            file: DirFile | TextFile,
-            function: typing.Callable,
-            *args,
-            **kwargs
-    ) -> None:
+            tracked: TrackedFile,
+            file: DirFile | TextFile
+    ) -> bool:
+        """
+        Check if source file is another hardlink of tracked file, which source is still in place.
+
+        :param TrackedFile tracked: Tracked entry with the same inode.
+        :param DirFile | TextFile file: Source file.
+        :return: bool True if file has to be replicated as a hardlink.
+        """
+
+        return (
+            self.dedup is not None
+            and isinstance(file, TextFile)
+            and file.snapshot is not None
+            and file.snapshot.nlink > 1
+            and tracked.source.path != file.path
+            and self.source_paths.get(tracked.source.path) == file.snapshot.inode
+            and os.path.lexists(tracked.source.path)
+        )
+
+    def reset_links(self) -> set[pathlib.Path]:
         """
-        Save recursive files.
+        Forget hardlinks of tracked files before they are found again by the scan.
 
-        :param pathlib.Path file: File.
-        :param typing.Callable function: callable that will be call on each file object.
+        :return: set[pathlib.Path] Source paths of forgotten hardlinks.
         """
 
-        function(file, *args, **kwargs)
-        if isinstance(file, TextFile):
-            logging.debug(f'Saving content of {file.path} to {file}')
-            file.content = file.path.read_text()
+        links = set()
+        for file_id in self.linked_files_ids:
+            tracked = self.tracked_files.get(file_id)
+            if tracked is not None and tracked.links:
+                links.update(tracked.links)
+                tracked.links = None
+        self.linked_files_ids = set()
+
+        return links
+
+    def update_links(self) -> None:
+        """Hardlink replica paths of other source hardlinks to the replica of tracked file."""
+
+        if self.dedup is None:
             return
 
-        for child in file.children:
-            self.run_function_recursive(child, function)
+        for file_id in self.linked_files_ids:
+            tracked = self.tracked_files.get(file_id)
+            if tracked is None or tracked.replica is None or not tracked.links:
+                continue
+            for path in tracked.links:
+                self.dedup.link_path(tracked.replica.path, self.replica.path / path.relative_to(self.source.path))
+        self.metrics.count('bytes_deduplicated', self.dedup.bytes_saved)
+        self.dedup.report()
+
+    def remove_links(self, paths: typing.Iterable[pathlib.Path]) -> None:
+        """
+        Remove replicas of source hardlinks which are gone, unless the path is used by another tracked file.
+
+        :param typing.Iterable[pathlib.Path] paths: Source paths of removed hardlinks.
+        """
+
+        for path in paths:
+            if path not in self.source_paths:
+                self.pool.submit(self.delete_replica_file, TextFile(self.replica.path / path.relative_to(self.source.path)))
 
     def replicate_file(
             self,
@@ -90,73 +369,1052 @@ class Synchronizer:
         """
         Create replica of given file.
 
+        Directories are created immediately, so they exist before their children,
+        files are copied by worker threads.
+
         :param DirFile | TextFile file: File to replicate.
         """
 
-        replica_path = self.replica.path / file.path.relative_to(self.source.path)
+        function, args, callback = self.replica_task(file)
+        if isinstance(file, DirFile):
+            callback(function(*args))
+        else:
+            self.submit_copy(function, args, callback)
+
+    def replica_task(
+            self,
+            file: DirFile | TextFile
+    ) -> tuple[typing.Callable, tuple, typing.Callable]:
+        """
+        Prepare task creating replica of given file, which starts tracking the replica once it is created.
+
+        :param DirFile | TextFile file: File to replicate.
+        :return: tuple Task function, its arguments and callback run with its result.
+        """
+
+        relative_path = file.path.relative_to(self.source.path)
+        snapshot = file.snapshot or file.get_snapshot()
+        replica_file = self.new_replica_file(file)
+        tracked = self.tracked_files[snapshot.inode]
+
+        return (
+            self.create_replica, (relative_path, snapshot, replica_file),
+            lambda created: created and self.save_replica(tracked, snapshot, replica_file)
+        )
+
+    def new_replica_file(
+            self,
+            file: DirFile | TextFile
+    ) -> DirFile | TextFile:
+        """
+        Get replica file of given source file.
 
+        :param DirFile | TextFile file: Source file.
+        :return: DirFile | TextFile Replica file, with origin set for text files.
+        """
+
+        replica_path = self.replica.path / file.path.relative_to(self.source.path)
         if isinstance(file, DirFile):
-            replica_file = DirFile(replica_path)
+            return DirFile(replica_path)
+
+        replica_file = TextFile(replica_path)
+        replica_file.origin = file.path
+        replica_file.compute_digest = self.index is not None
+        replica_file.delta_threshold = self.delta_threshold
+        replica_file.throttle = self.throttle
+        replica_file.durability = self.durability
+        return replica_file
+
+    def save_replica(
+            self,
+            file: TrackedFile,
+            snapshot: Snapshot,
+            replica_file: DirFile | TextFile
+    ) -> None:
+        """
+        Start tracking created replica of the file together with replicated snapshot.
+
+        :param TrackedFile file: Tracked file entry.
+        :param Snapshot snapshot: Snapshot of the source file.
+        :param DirFile | TextFile replica_file: Replica file.
+        """
+
+        file.replica = replica_file
+        file.snapshot = snapshot
+        self.save_index_entry(snapshot, replica_file)
+
+    def create_replica(
+            self,
+            relative_path: pathlib.Path,
+            snapshot: Snapshot,
+            replica_file: DirFile | TextFile
+    ) -> bool:
+        """
+        Create replica file unless it is already up to date.
+
+        :param pathlib.Path relative_path: Path of the file relative to the source directory.
+        :param Snapshot snapshot: Current snapshot of the source file.
+        :param DirFile | TextFile replica_file: Replica file.
+        :return: bool True if replica is in place, False if creating it failed.
+        """
+
+        try:
+            if self.is_replicated(relative_path, snapshot, replica_file):
+                file_log.debug('Replica of %s is up to date.', replica_file.path)
+                if self.dedup is not None and isinstance(replica_file, TextFile):
+                    self.dedup.add(replica_file.digest, replica_file.path)
+            elif isinstance(replica_file, TextFile):
+                self.write_content(replica_file)
+            else:
+                self.throttle.operation()
+                self.backend.mkdir(replica_file.path)
+        except OSError as error:
+            self.replication_failed(replica_file.path, error)
+            return False
+
+        return True
+
+    def replication_failed(
+            self,
+            replica_path: pathlib.Path,
+            error: OSError
+    ) -> None:
+        """
+        Log and count failed replication of single file, so the rest of the cycle goes on.
+
+        Tracked snapshot of the file is not updated, so the next sync replicates it again.
+
+        :param pathlib.Path replica_path: Replica file.
+        :param OSError error: Error reading the source or writing the replica.
+        """
+
+        logging.error(f'Replication of {replica_path} failed: {error}')
+        self.metrics.count('errors')
+
+    def is_replicated(
+            self,
+            relative_path: pathlib.Path,
+            snapshot: Snapshot,
+            replica_file: DirFile | TextFile
+    ) -> bool:
+        """
+        Check against loaded index if replica of the file is up to date.
+
+        When source metadata differs from indexed one, content hash decides. In dedup mode hardlinked
+        replica is rewritten rather than given the new modification time, which its other links would share.
+
+        :param pathlib.Path relative_path: Path of the file relative to the source directory.
+        :param Snapshot snapshot: Current snapshot of the source file.
+        :param DirFile | TextFile replica_file: Replica file.
+        :return: bool True if replica does not have to be copied.
+        """
+
+        state = self.replica_state(relative_path, snapshot, replica_file)
+        if state == 'copy':
+            return False
+        if isinstance(replica_file, DirFile):
+            return True
+
+        entry = self.indexed[str(relative_path)]
+        if state == 'verify':
+            if hash_file(replica_file.origin) != entry.digest:
+                return False
+            if self.dedup is not None and not self.backend.is_single_link(replica_file.path):
+                return False
+            self.backend.set_mtime(replica_file.path, snapshot.mtime_ns)
+
+        replica_file.digest = entry.digest
+        return True
+
+    def replica_state(
+            self,
+            relative_path: pathlib.Path,
+            snapshot: Snapshot,
+            replica_file: DirFile | TextFile
+    ) -> str:
+        """
+        Check against loaded index, without reading file content, if replica of the file is up to date.
+
+        :param pathlib.Path relative_path: Path of the file relative to the source directory.
+        :param Snapshot snapshot: Current snapshot of the source file.
+        :param DirFile | TextFile replica_file: Replica file.
+        :return: str keep if replica is up to date, verify if only source metadata differs from indexed one,
+            so content hash decides, copy otherwise.
+        """
+
+        entry = self.indexed.get(str(relative_path))
+        if entry is None:
+            return 'copy'
+
+        if isinstance(replica_file, DirFile):
+            return 'keep' if entry.is_dir and self.backend.is_dir(replica_file.path) else 'copy'
+
+        try:
+            replica_stat = self.backend.stat(replica_file.path)
+        except FileNotFoundError:
+            return 'copy'
+
+        if entry.is_dir or (replica_stat.size, replica_stat.mtime_ns) != (entry.size, entry.mtime_ns):
+            return 'copy'
+
+        if (entry.inode, entry.size, entry.mtime_ns) != (snapshot.inode, snapshot.size, snapshot.mtime_ns):
+            return 'verify' if entry.size == snapshot.size else 'copy'
+
+        return 'keep'
+
+    def write_kind(
+            self,
+            replica_path: pathlib.Path,
+            size: int
+    ) -> str:
+        """
+        Get kind of operation writing the replica, the same way TextFile decides it.
+
+        :param pathlib.Path replica_path: Replica file.
+        :param int size: Size of the source file.
+        :return: str delta if existing replica is updated in place block by block, copy otherwise.
+        """
+
+        if self.delta_threshold is None or size < self.delta_threshold:
+            return 'copy'
+
+        return 'delta' if self.backend.is_single_link(replica_path) else 'copy'
+
+    def save_index_entry(
+            self,
+            snapshot: Snapshot,
+            replica_file: DirFile | TextFile
+    ) -> None:
+        """
+        Save replicated file to the index.
+
+        :param Snapshot snapshot: Snapshot of the source file.
+        :param DirFile | TextFile replica_file: Replica file.
+        """
+
+        if self.index is None:
+            return
+
+        self.index.put(IndexEntry(
+            str(replica_file.path.relative_to(self.replica.path)),
+            snapshot.inode,
+            snapshot.size,
+            snapshot.mtime_ns,
+            getattr(replica_file, 'digest', None),
+            isinstance(replica_file, DirFile),
+        ))
+        self.index_changes += 1
+        if self.index_changes >= settings.INDEX_COMMIT_ENTRIES or \
+                time.monotonic() - self.index_committed >= settings.INDEX_COMMIT_INTERVAL:
+            self.commit_index()
+
+    def remove_index_entry(
+            self,
+            replica_file: DirFile | TextFile
+    ) -> None:
+        """
+        Remove replicated file from the index.
+
+        :param DirFile | TextFile replica_file: Replica file.
+        """
+
+        if self.index is not None:
+            self.index.delete(str(replica_file.path.relative_to(self.replica.path)))
+
+    def commit_index(self) -> None:
+        """
+        Flush replica changes made during synchronization, as durability requires, then persist index changes.
+
+        Besides the end of every cycle it is called whenever enough replicated files are saved to the index,
+        so interrupted long synchronization keeps its progress.
+        """
+
+        syncs = self.backend.flush()
+        if syncs:
+            self.metrics.count('fsyncs', syncs)
+        if self.index is not None:
+            self.index.commit()
+        self.index_changes = 0
+        self.index_committed = time.monotonic()
+
+    def update_content(
+            self,
+            file: TrackedFile,
+            moved: bool = False
+    ) -> None:
+        """
+        Update replica content if source file has been changed.
+
+        :param TrackedFile file: Tracked file entry.
+        :param bool moved: File has been moved, so change of its ctime alone is not a content change.
+        """
+
+        task = self.content_task(file, moved)
+        if task is not None:
+            self.submit_copy(*task)
+
+    def submit_copy(
+            self,
+            function: typing.Callable,
+            args: tuple,
+            callback: typing.Callable
+    ) -> None:
+        """
+        Submit task writing replica content to the pool.
+
+        :param typing.Callable function: Task function.
+        :param tuple args: Task arguments.
+        :param typing.Callable callback: Called with task result in the submitting thread.
+        """
+
+        self.metrics.queue_depth('pool', len(self.pool.pending))
+        self.pool.submit(function, *args, callback=callback)
+
+    def write_content(self, replica_file: TextFile) -> None:
+        """
+        Write content of origin file to the replica.
+
+        :param TextFile replica_file: Replica file with origin set.
+        """
+
+        self.throttle.operation()
+        if self.dedup is not None:
+            written = self.dedup.write(replica_file)
         else:
-            replica_file = TextFile(replica_path)
-            replica_file.content = file.content
+            written = self.backend.write(replica_file)
+        self.metrics.count('files_copied')
+        self.metrics.count('bytes_written', written or 0)
+
+    def content_task(
+            self,
+            file: TrackedFile,
+            moved: bool = False
+    ) -> tuple[typing.Callable, tuple, typing.Callable] | None:
+        """
+        Prepare task updating replica content, if it may differ from the source.
+
+        Content is copied only when file metadata snapshot differs from the tracked one and the file meets
+        size and age limits, otherwise the replica is kept as it is until it does.
+        Equal snapshot taken by the scan replaces the tracked one, so only one copy is kept alive.
+        In checksum mode unchanged files are additionally compared with the replica.
+
+        :param TrackedFile file: Tracked file entry.
+        :param bool moved: File has been moved, so change of its ctime alone is not a content change.
+        :return: tuple | None Task function, its arguments and callback run with its result, None if up to date.
+        """
+
+        source_file = file.source
+        replica_file = file.replica
+
+        snapshot = source_file.snapshot or source_file.get_snapshot()
+        tracked_snapshot = file.snapshot
+        if moved and tracked_snapshot is not None and snapshot._replace(ctime_ns=tracked_snapshot.ctime_ns) == tracked_snapshot:
+            file.snapshot = snapshot
+
+        changed = snapshot != file.snapshot
+        if not changed:
+            file.snapshot = snapshot
+        if not changed and not self.checksum:
+            return None
+        if changed and not self.accepts_content(source_file):
+            file_log.info('Change of %s is deferred until it meets size and age limits.', source_file.path)
+            return None
+
+        return (
+            self.copy_content, (source_file, replica_file, changed),
+            lambda copied: copied and self.save_content_snapshot(file, snapshot)
+        )
+
+    def copy_content(
+            self,
+            source_file: TextFile,
+            replica_file: TextFile,
+            changed: bool
+    ) -> bool:
+        """
+        Copy content of source file to the replica if it was changed or replica differs.
+
+        :param TextFile source_file: Source file.
+        :param TextFile replica_file: Replica file.
+        :param bool changed: Source file metadata has been changed.
+        :return: bool True if replica content is up to date, False if copying it failed.
+        """
+
+        try:
+            if changed or not self.same_content(source_file, replica_file):
+                file_log.info('Content of %s has been changed.', source_file.path)
+
+                replica_file.origin = source_file.path
+                self.write_content(replica_file)
+        except OSError as error:
+            self.replication_failed(replica_file.path, error)
+            return False
+
+        return True
+
+    def same_content(
+            self,
+            source_file: TextFile,
+            replica_file: TextFile
+    ) -> bool:
+        """
+        Compare content of source file with the replica, by digests if both are known.
+
+        Source digests are computed by sharded scan in checksum mode, replica digests when the replica is written.
+
+        :param TextFile source_file: Source file.
+        :param TextFile replica_file: Replica file.
+        :return: bool True if contents are equal.
+        """
+
+        if source_file.digest is not None and replica_file.digest is not None:
+            return source_file.digest == replica_file.digest
+        return self.backend.content_equal(replica_file.path, source_file.path)
+
+    def save_content_snapshot(
+            self,
+            file: TrackedFile,
+            snapshot: Snapshot
+    ) -> None:
+        """
+        Save snapshot of the source file which content is replicated.
+
+        :param TrackedFile file: Tracked file entry.
+        :param Snapshot snapshot: Snapshot of the source file.
+        """
 
-        replica_file.create()
-        self.tracked_files.get(file.get_id()).update({'replica': replica_file})
+        file.snapshot = snapshot
+        self.save_index_entry(snapshot, file.replica)
+
+    def remove_replica(
+            self,
+            replica_file: DirFile | TextFile
+    ) -> None:
+        """
+        Remove replica file together with its index entry.
+
+        :param DirFile | TextFile replica_file: Replica file.
+        """
+
+        self.remove_index_entry(replica_file)
+        self.pool.submit(self.delete_replica_file, replica_file)
+
+    def delete_replica_file(
+            self,
+            replica_file: DirFile | TextFile
+    ) -> None:
+        """
+        Delete replica file from disk.
+
+        :param DirFile | TextFile replica_file: Replica file.
+        """
+
+        try:
+            file_log.info('Trying to remove replica of %s', replica_file.path)
+            self.throttle.operation()
+            self.backend.delete(replica_file.path, isinstance(replica_file, DirFile))
+        except FileNotFoundError:
+            file_log.info('%s was deleted before.', replica_file.path)
+        else:
+            file_log.info('File removed')
+            self.metrics.count('files_removed')
+
+    def remove_replicas(
+            self,
+            replica_files: typing.Iterable[DirFile | TextFile],
+            relocations: '_Relocations | None' = None
+    ) -> None:
+        """
+        Remove replicas of deleted files.
+
+        Replicas already reused by tracked file of the same type (e.g. file replaced or moved
+        into place of deleted one) are kept, descendants of removed dirs are skipped.
+
+        :param typing.Iterable[DirFile | TextFile] replica_files: Replicas of deleted files.
+        :param _Relocations | None relocations: Renames made in the replica during this synchronization.
+        """
+
+        replica_files = list(replica_files)
+        if relocations is not None:
+            for replica_file in replica_files:
+                replica_file.path = relocations.locate(replica_file.path)
+
+        expected = {
+            file.source.path.relative_to(self.source.path): isinstance(file.source, DirFile)
+            for file in self.tracked_files.values()
+        }
+        removed_dirs = set()
+
+        for replica_file in sorted(replica_files, key=lambda replica: len(replica.path.parts)):
+            relative_path = replica_file.path.relative_to(self.replica.path)
+            if any(parent in removed_dirs for parent in relative_path.parents):
+                continue
+            if expected.get(relative_path) == isinstance(replica_file, DirFile):
+                file_log.debug('Replica %s is reused by another file.', replica_file.path)
+                continue
+
+            self.remove_replica(replica_file)
+            if isinstance(replica_file, DirFile):
+                removed_dirs.add(relative_path)
+
+    def is_moved(
+            self,
+            file: TrackedFile
+    ) -> bool:
+        """
+        Check if replica is not at the current location of source file.
+
+        :param TrackedFile file: Tracked file entry.
+        :return: bool True if file has been moved or renamed, False if it has no replica yet.
+        """
+
+        return file.replica is not None and (
+            file.replica.path.parts[len(self.replica.path.parts):] != file.source.path.parts[len(self.source.path.parts):]
+        )
+
+    def move_replicas(
+            self,
+            files: typing.Iterable[TrackedFile]
+    ) -> '_Relocations':
+        """
+        Move replicas of moved files, parents first.
+
+        Replica of renamed directory is moved with a single rename, so its descendants
+        moved together with it only get their paths updated.
+
+        :param typing.Iterable[TrackedFile] files: Tracked entries of moved files.
+        :return: _Relocations Renames made in the replica.
+        """
+
+        relocations = _Relocations()
+        for file in sorted(files, key=lambda file: len(file.source.path.parts)):
+            self.move_replica(file, relocations)
+
+        return relocations
+
+    def move_replica(
+            self,
+            file: TrackedFile,
+            relocations: '_Relocations'
+    ) -> None:
+        """
+        Move replica to the current location of source file.
+
+        :param TrackedFile file: Tracked entry of moved file.
+        :param _Relocations relocations: Renames already made in the replica.
+        """
+
+        source_file = file.source
+        replica_file = file.replica
+
+        new_path = self.replica.path / source_file.path.relative_to(self.source.path)
+        current_path = relocations.locate(replica_file.path)
+        replica_file.path = current_path
+        if current_path == new_path:
+            return
+
+        file_log.info('%s moved to %s', current_path, new_path)
+        self.throttle.operation()
+        if isinstance(replica_file, TextFile):
+            replica_file.origin = source_file.path
+        self.move_aside(new_path, relocations)
+
+        try:
+            try:
+                self.backend.rename(current_path, new_path)
+            except (NotADirectoryError, FileExistsError):
+                self.move_aside_parent(new_path, relocations)
+                current_path = replica_file.path = relocations.locate(current_path)
+                self.backend.rename(current_path, new_path)
+        except FileNotFoundError:
+            replica_file.path = new_path
+            if isinstance(replica_file, DirFile):
+                self.backend.mkdir(new_path)
+            else:
+                self.backend.write(replica_file)
+            if file.snapshot is not None:
+                self.save_index_entry(file.snapshot, replica_file)
+            return
+
+        replica_file.path = new_path
+
+        self.move_index_entry(current_path, new_path)
+        relocations.add(current_path, new_path)
+        self.metrics.count('files_moved')
+
+    def move_aside(
+            self,
+            path: pathlib.Path,
+            relocations: '_Relocations'
+    ) -> None:
+        """
+        Rename replica file occupying the path, so another file can be moved there.
+
+        Replica moved aside is later moved to its own new location or removed.
+
+        :param pathlib.Path path: Path in replica.
+        :param _Relocations relocations: Renames already made in the replica.
+        """
+
+        if not self.backend.exists(path):
+            return
+
+        aside_path = self.replica.path / f'.sync-aside-{relocations.count}-{path.name}'
+        file_log.debug('Moving %s aside to %s', path, aside_path)
+        self.backend.rename(path, aside_path)
+        self.move_index_entry(path, aside_path)
+        relocations.add(path, aside_path)
+        relocations.aside.append(aside_path)
+
+    def move_aside_parent(
+            self,
+            path: pathlib.Path,
+            relocations: '_Relocations'
+    ) -> None:
+        """
+        Rename replica file occupying one of the parent directories of the path.
+
+        :param pathlib.Path path: Path in replica.
+        :param _Relocations relocations: Renames already made in the replica.
+        """
+
+        for parent in reversed(path.relative_to(self.replica.path).parents):
+            parent_path = self.replica.path / parent
+            if self.backend.exists(parent_path) and not self.backend.is_dir(parent_path):
+                self.move_aside(parent_path, relocations)
+                return
+
+    def remove_aside(
+            self,
+            relocations: '_Relocations'
+    ) -> None:
+        """
+        Remove replicas moved aside which were not moved to any new location.
+
+        :param _Relocations relocations: Renames made in the replica.
+        """
+
+        for aside_path in relocations.aside:
+            if self.backend.exists(aside_path):
+                replica_file = DirFile(aside_path) if self.backend.is_dir(aside_path) else TextFile(aside_path)
+                self.remove_replica(replica_file)
+
+    def move_index_entry(
+            self,
+            path: pathlib.Path,
+            new_path: pathlib.Path
+    ) -> None:
+        """
+        Move replicated file together with its descendants in the index.
+
+        :param pathlib.Path path: Replica path.
+        :param pathlib.Path new_path: New replica path.
+        """
+
+        if self.index is not None:
+            self.index.move(str(path.relative_to(self.replica.path)), str(new_path.relative_to(self.replica.path)))
 
     def sync(self):
-        """Run source and replica dir synchronization."""
+        """
+        Run source and replica dir synchronization.
 
-        logging.info(f'Synchronizing {self.source.path} with {self.replica.path}')
-        files = self.tracked_files.copy()
-        saved_files_ids = files.keys()
+        Changes are planned first, then replicas are moved, replicas of deleted files are removed,
+        new directories are created (parents first) and new or changed files are written in source inode order.
+        """
 
-        self.run_function_recursive(
-            self.source,
-            lambda file: file.update_children() if isinstance(file, DirFile) else None,
+        with self.metrics.cycle('sync'):
+            with self.metrics.phase('scan'):
+                files = self.scan_source()
+            self.sync_files(files)
+            self.scrub()
+
+    def scrub(self) -> None:
+        """Verify next slice of replica content against the index, copying mismatching replicas from the source again."""
+
+        if self.scrubber is None:
+            return
+
+        with self.metrics.phase('scrub'):
+            result = self.scrubber.run()
+            self.metrics.count('files_scrubbed', result.files)
+            self.metrics.count('bytes_scrubbed', result.bytes)
+            for relative_path in result.mismatches:
+                self.repair_replica(relative_path)
+            self.pool.wait()
+            self.commit_index()
+
+    def repair_replica(self, relative_path: str) -> None:
+        """
+        Copy source file again to the replica which content does not match the index.
+
+        Block hashes of the replica describe replicated content, not the damaged one, so they are dropped
+        and delta transfer compares source blocks with blocks read from the replica.
+
+        :param str relative_path: Path of the file relative to the replica directory.
+        """
+
+        file_id = self.source_paths.get(self.source.path / relative_path)
+        tracked = self.tracked_files.get(file_id) if file_id is not None else None
+        if tracked is None or not isinstance(tracked.replica, TextFile) or \
+                tracked.replica.path != self.replica.path / relative_path:
+            return
+
+        logging.warning(f'Replica {tracked.replica.path} does not match replicated content, copying it again.')
+        self.metrics.count('scrub_mismatches')
+        tracked.replica.blocks = None
+        tracked.replica.digest = None
+        snapshot = tracked.snapshot or tracked.source.get_snapshot()
+        self.submit_copy(
+            self.copy_content, (tracked.source, tracked.replica, True),
+            lambda copied: copied and self.save_content_snapshot(tracked, snapshot)
         )
-        self.run_function_recursive(self.source, self.save_tracked_file)
 
-        deleted_files_ids = []
+    def sync_files(self, files: typing.Iterable[DirFile | TextFile]) -> None:
+        """
+        Synchronize replica with already scanned source files.
+
+        :param typing.Iterable[DirFile | TextFile] files: Scanned source files, parents first.
+        """
+
+        logging.info(f'Synchronizing {self.source.path} with {self.replica.path}')
+        saved_files_ids = set(self.tracked_files.keys())
+        self.source_paths = {}
+        links = self.reset_links()
+
+        scanned_files_ids = set()
+        with self.metrics.phase('diff'):
+            for file in files:
+                self.save_tracked_file(file)
+                scanned_files_ids.add(file.get_id())
+            self.metrics.count('files_scanned', len(scanned_files_ids))
+
+        self.remove_links(links)
+        self.apply_changes(saved_files_ids, scanned_files_ids)
+
+    def apply_changes(
+            self,
+            saved_files_ids: set[int],
+            scanned_files_ids: set[int],
+            handled_files_ids: typing.Collection[int] = ()
+    ) -> None:
+        """
+        Apply changes found by the scan to the replica.
+
+        :param set[int] saved_files_ids: Ids of files tracked before the scan.
+        :param set[int] scanned_files_ids: Ids of files found by the scan.
+        :param typing.Collection[int] handled_files_ids: Ids of files already replicated or updated during the scan.
+        """
+
+        with self.metrics.phase('diff'):
+            plan = self.plan_changes(saved_files_ids, scanned_files_ids, handled_files_ids)
+        self.execute_plan(plan)
+
+    def plan_changes(
+            self,
+            saved_files_ids: set[int],
+            scanned_files_ids: set[int],
+            handled_files_ids: typing.Collection[int] = ()
+    ) -> SyncPlan:
+        """
+        Plan changes found by the scan, stopping tracking of deleted files.
+
+        Plan has to be executed before the next scan, as snapshots of unchanged files are already refreshed.
+        Files moved together with renamed directory are carried by its rename, not planned one by one.
+        Tracked files which were never replicated, e.g. their copy failed, are planned as new files.
+
+        :param set[int] saved_files_ids: Ids of files tracked before the scan.
+        :param set[int] scanned_files_ids: Ids of files found by the scan.
+        :param typing.Collection[int] handled_files_ids: Ids of files already replicated or updated during the scan.
+        :return: SyncPlan Plan of this synchronization.
+        """
+
+        deleted_replicas = []
+        retyped_files_ids = set()
         for file_id in saved_files_ids:
-            source_file = self.tracked_files[file_id].get('source')
-            file_exists = source_file.path.exists()
-            if not file_exists or file_exists and source_file.path.stat().st_ino != file_id:
+            tracked = self.tracked_files[file_id]
+            if file_id not in scanned_files_ids:
                 del self.tracked_files[file_id]
-                deleted_files_ids.append(file_id)
+                if tracked.replica is not None:
+                    deleted_replicas.append(tracked.replica)
+            elif tracked.replica is None:
+                retyped_files_ids.add(file_id)
+            elif type(tracked.source) is not type(tracked.replica):
+                deleted_replicas.append(tracked.replica)
+                retyped_files_ids.add(file_id)
 
-        new_files = set(self.tracked_files.keys()) - set(saved_files_ids)
+        new_files = set(self.tracked_files.keys()) - saved_files_ids | retyped_files_ids
+        new_files.difference_update(handled_files_ids)
+        moved_files_ids = {
+            file_id for file_id, file in self.tracked_files.items()
+            if file_id not in new_files and file_id not in handled_files_ids and self.is_moved(file)
+        }
 
-        for deleted_file_id in deleted_files_ids:
-            replica_file = files.get(deleted_file_id)['replica']
-            try:
-                logging.info(f'Trying to remove replica of {replica_file.path}')
-                replica_file.remove()
-            except FileNotFoundError:
-                logging.info(f'{files.get(deleted_file_id)['replica'].path} was deleted before.')
+        plan = SyncPlan(self.replica.path)
+        relocations = _Relocations()
+        renames = {}
+        for file_id in sorted(moved_files_ids, key=lambda file_id: len(self.tracked_files[file_id].source.path.parts)):
+            file = self.tracked_files[file_id]
+            new_path = self.replica.path / file.source.path.relative_to(self.source.path)
+            current_path = relocations.locate(file.replica.path)
+            if current_path == new_path:
+                renames[next(path for path in new_path.parents if path in renames)][1].append(file)
+                continue
+            renames[new_path] = (file, [])
+            relocations.add(current_path, new_path)
+        for new_path, (file, descendants) in renames.items():
+            plan.add('rename', new_path, source=file.replica.path, file=file, descendants=tuple(descendants))
+
+        for replica_file in deleted_replicas:
+            plan.add('delete', replica_file.path, file=replica_file)
+
+        for new_file_id in sorted(new_files, key=lambda file_id: len(self.tracked_files[file_id].source.path.parts)):
+            source_file = self.tracked_files[new_file_id].source
+            replica_path = self.replica.path / source_file.path.relative_to(self.source.path)
+            if isinstance(source_file, DirFile):
+                plan.add('mkdir', replica_path, file=source_file)
+            elif not self.accepts_content(source_file):
+                self.defer_file(source_file)
             else:
-                logging.info('File removed')
-
-        for new_file_id in new_files:
-            self.replicate_file(self.tracked_files[new_file_id]['source'])
-
-        for file in self.tracked_files.values():
-            source_file = file['source']
-            replica_file = file['replica']
-
-            if replica_file.path.relative_to(self.replica.path) != source_file.path.relative_to(self.source.path):
-                new_path = self.replica.path / source_file.path.relative_to(self.source.path)
-                logging.info(f'{replica_file.path} moved to {new_path}')
-                try:
-                    replica_file.move(new_path)
-                except FileNotFoundError:
-                    replica_file.path = new_path
-                    replica_file.create()
-
-            if hasattr(source_file, 'content'):
-                if replica_file.content != source_file.content:
-                    logging.info(f'Content of {source_file.path} is has been changed.')
-                    logging.debug(f'Content of {replica_file.path} is now {source_file.content}.')
-
-                    replica_file.content = source_file.content
-                    replica_file.create()
+                snapshot = source_file.snapshot or source_file.get_snapshot()
+                plan.add(
+                    self.write_kind(replica_path, snapshot.size), replica_path, snapshot.size,
+                    source_file.path, snapshot.inode, source_file
+                )
+
+        for file_id, file in self.tracked_files.items():
+            if file_id in new_files or file_id in handled_files_ids or not isinstance(file.source, TextFile):
+                continue
+            task = self.content_task(file, moved=file_id in moved_files_ids)
+            if task is None:
+                continue
+
+            _, (source_file, replica_file, changed), _ = task
+            snapshot = source_file.snapshot or source_file.get_snapshot()
+            kind = self.write_kind(replica_file.path, snapshot.size) if changed else 'verify'
+            plan.add(kind, replica_file.path, snapshot.size, source_file.path, file_id, file, task)
+
+        plan.order()
+        return plan
+
+    def sync_paths(
+            self,
+            paths: typing.Iterable[pathlib.Path]
+    ) -> None:
+        """
+        Synchronize only given source paths, e.g. collected by the watcher.
+
+        Existing paths are processed parents first (new or moved directories with whole subtree),
+        missing paths are removed from the replica afterwards, so moves are not seen as deletions.
+
+        :param typing.Iterable[pathlib.Path] paths: Changed source paths.
+        """
+
+        paths = set(paths)
+        logging.info(f'Synchronizing {len(paths)} changed paths of {self.source.path}')
+
+        with self.metrics.cycle('sync_paths'):
+            with self.metrics.phase('scan'):
+                files, missing = scan_paths(paths, self.file_filter)
+            self.sync_scanned_paths(files, missing)
+
+    def sync_scanned_paths(
+            self,
+            files: list[DirFile | TextFile],
+            missing: list[pathlib.Path]
+    ) -> None:
+        """
+        Synchronize already scanned changed paths within cycle opened by the caller.
+
+        :param list[DirFile | TextFile] files: Files scanned from existing changed paths, parents first.
+        :param list[pathlib.Path] missing: Changed paths missing from the source.
+        """
+
+        with self.metrics.phase('scan'):
+            updated = [self.sync_source_file(file) for file in files]
+            self.pool.wait()
+
+        with self.metrics.phase('move'):
+            updated = [file for file in updated if file is not None]
+            moved = [file for file in updated if self.is_moved(file)]
+            relocations = self.move_replicas(moved)
+
+        with self.metrics.phase('delete'):
+            for path in missing:
+                self.remove_source_path(path, relocations)
+            self.pool.wait()
+
+        with self.metrics.phase('copy'):
+            for file in updated:
+                if isinstance(file.source, TextFile):
+                    self.update_content(file, moved=any(file is moved_file for moved_file in moved))
+            self.pool.wait()
+
+            self.update_links()
+
+        with self.metrics.phase('commit'):
+            self.commit_index()
+
+    def accepts_content(self, file: TextFile) -> bool:
+        """
+        Check source file against size and age limits, which decide only if new or changed content is copied.
+
+        :param TextFile file: Source file.
+        :return: bool True if content of the file can be replicated now.
+        """
+
+        if self.file_filter is None or not self.file_filter.limits_files:
+            return True
+        snapshot = file.snapshot or file.get_snapshot()
+        return self.file_filter.accepts_file(snapshot.size, snapshot.mtime_ns)
+
+    def defer_file(self, file: TextFile) -> None:
+        """
+        Postpone replication of new file which does not meet size and age limits yet.
+
+        Existing replica at its path is kept and tracked with unknown content, so it is not removed as untracked
+        and is copied once the file meets the limits. Otherwise the file stops being tracked and is found
+        as new by the next sync.
+
+        :param TextFile file: Source file.
+        """
+
+        file_log.info('Replication of %s is deferred until it meets size and age limits.', file.path)
+        file_id = file.get_id()
+        if self.backend.exists(self.replica.path / file.path.relative_to(self.source.path)):
+            tracked = self.tracked_files[file_id]
+            tracked.replica = self.new_replica_file(file)
+            tracked.snapshot = None
+        else:
+            del self.tracked_files[file_id]
+            self.source_paths.pop(file.path, None)
+
+    def sync_source_file(
+            self,
+            file: DirFile | TextFile
+    ) -> TrackedFile | None:
+        """
+        Start tracking new source file or update source of already tracked one.
+
+        :param DirFile | TextFile file: Source file.
+        :return: TrackedFile | None Tracked entry which replica has to be moved or updated, None for new files.
+        """
+
+        try:
+            file_id = file.get_id()
+        except FileNotFoundError:
+            return None
+
+        replaced_id = self.source_paths.get(file.path)
+        replaced = self.tracked_files.get(replaced_id) if replaced_id != file_id else None
+        if replaced is not None and replaced.source.path == file.path:
+            if type(replaced.source) is type(file):
+                del self.tracked_files[replaced_id]
+            else:
+                self.remove_source_path(file.path)
+                self.pool.wait()
+
+        tracked = self.tracked_files.get(file_id)
+        if tracked is not None and type(tracked.source) is not type(file):
+            self.remove_source_path(tracked.source.path)
+            self.pool.wait()
+            tracked = None
+
+        self.save_tracked_file(file)
+        if tracked is None or tracked.replica is None:
+            if isinstance(file, TextFile) and not self.accepts_content(file):
+                self.defer_file(file)
+            else:
+                self.replicate_file(file)
+            return None
+
+        return self.tracked_files[file_id]
+
+    def remove_source_path(
+            self,
+            path: pathlib.Path,
+            relocations: '_Relocations | None' = None
+    ) -> None:
+        """
+        Remove replica of deleted source path and stop tracking it (with descendants for dirs).
+
+        :param pathlib.Path path: Deleted source path.
+        :param _Relocations | None relocations: Renames made in the replica during this synchronization,
+            replica of deleted file may have been moved together with its renamed parent.
+        """
+
+        file_id = self.source_paths.pop(path, None)
+        tracked = self.tracked_files.get(file_id)
+        if tracked is not None and tracked.links and path in tracked.links:
+            tracked.links.discard(path)
+            self.remove_links([path])
+            return
+        if tracked is None or tracked.source.path != path:
+            return
+
+        if tracked.links:
+            tracked.source = TextFile(tracked.links.pop())
+            if tracked.replica is not None:
+                self.remove_aside(self.move_replicas([tracked]))
+            return
+
+        del self.tracked_files[file_id]
+        if tracked.replica is not None:
+            if relocations is not None:
+                tracked.replica.path = relocations.locate(tracked.replica.path)
+            self.remove_replica(tracked.replica)
+
+        if isinstance(tracked.source, DirFile):
+            descendants = [
+                descendant_id for descendant_id, descendant in self.tracked_files.items()
+                if descendant.source.path.is_relative_to(path)
+            ]
+            for descendant_id in descendants:
+                self.source_paths.pop(self.tracked_files.pop(descendant_id).source.path, None)
+
+
+class _Relocations:
+    """Renames made in the replica during single synchronization, in the order they were made."""
+
+    def __init__(self) -> None:
+        self.renames: dict[pathlib.Path, list[tuple[int, pathlib.Path]]] = defaultdict(list)
+        self.aside: list[pathlib.Path] = []
+        self.count: int = 0
+
+    def add(
+            self,
+            path: pathlib.Path,
+            new_path: pathlib.Path
+    ) -> None:
+        """
+        Record rename made in the replica.
+
+        :param pathlib.Path path: Renamed path.
+        :param pathlib.Path new_path: New path.
+        """
+
+        self.renames[path].append((self.count, new_path))
+        self.count += 1
+
+    def locate(self, path: pathlib.Path) -> pathlib.Path:
+        """
+        Get current location of the path, following renames of the path and its ancestors.
+
+        :param pathlib.Path path: Path before renames.
+        :return: pathlib.Path Current path.
+        """
+
+        applied = -1
+        while self.renames:
+            candidates = [
+                (sequence, ancestor, new_path)
+                for ancestor in (path, *path.parents)
+                for sequence, new_path in self.renames.get(ancestor, ())
+                if sequence > applied
+            ]
+            if not candidates:
+                break
+
+            applied, ancestor, new_path = min(candidates)
+            path = new_path / path.relative_to(ancestor)
+
+        return path
@@ -0,0 +1,139 @@
+import logging
+import signal
+import threading
+import time
+import typing
+
+import src.settings as settings
+
+
+class TokenBucket:
+    """Token bucket limiting rate of consumed units, e.g. bytes or file operations per second."""
+
+    def __init__(self, rate: float | None = None) -> None:
+        """
+        Init TokenBucket class.
+
+        :param float | None rate: Units per second, None disables the limit.
+        """
+
+        self.lock: threading.Lock = threading.Lock()
+        self.rate: float | None = None
+        self.burst: float = 0
+        self.tokens: float = 0
+        self.updated: float = time.monotonic()
+        self.configure(rate)
+
+    def configure(self, rate: float | None) -> None:
+        """
+        Change rate of the bucket, consumers already waiting finish their wait.
+
+        :param float | None rate: Units per second, None disables the limit.
+        """
+
+        with self.lock:
+            self.rate = rate or None
+            self.burst = (rate or 0) * settings.THROTTLE_BURST
+            self.tokens = min(self.tokens, self.burst)
+            self.updated = time.monotonic()
+
+    def consume(self, amount: float = 1) -> float:
+        """
+        Take units from the bucket, sleeping until they are refilled.
+
+        Amount larger than the bucket is allowed, the bucket goes into debt which later consumers wait out,
+        so the rate holds for chunks of any size.
+
+        :param float amount: Number of consumed units.
+        :return: float Time spent waiting in seconds.
+        """
+
+        if self.rate is None:
+            return 0
+
+        with self.lock:
+            if self.rate is None:
+                return 0
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate) - amount
+            self.updated = now
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+class Throttle:
+    """Bandwidth and file operation limits of replication writes, shared by all synchronizers of the process."""
+
+    def __init__(
+            self,
+            bandwidth: int | None = None,
+            iops: int | None = None
+    ) -> None:
+        """
+        Init Throttle class.
+
+        :param int | None bandwidth: Bytes written to replicas per second, None for unlimited.
+        :param int | None iops: File operations (writes, directory creations, moves, deletions) per second, None for unlimited.
+        """
+
+        self.bytes: TokenBucket = TokenBucket(bandwidth)
+        self.operations: TokenBucket = TokenBucket(iops)
+
+    def configure(
+            self,
+            bandwidth: int | None,
+            iops: int | None
+    ) -> None:
+        """
+        Change limits at runtime.
+
+        :param int | None bandwidth: Bytes written to replicas per second, None for unlimited.
+        :param int | None iops: File operations per second, None for unlimited.
+        """
+
+        self.bytes.configure(bandwidth)
+        self.operations.configure(iops)
+        logging.info(
+            f'Replication limited to {bandwidth or "unlimited"} bytes/s and {iops or "unlimited"} file operations/s.'
+        )
+
+    def transfer(self, size: int) -> None:
+        """
+        Wait until given number of bytes may be written.
+
+        :param int size: Number of bytes.
+        """
+
+        self.bytes.consume(size)
+
+    def operation(self, count: int = 1) -> None:
+        """
+        Wait until next file operations may run.
+
+        :param int count: Number of file operations.
+        """
+
+        self.operations.consume(count)
+
+    def install_reload_handler(self, load: typing.Callable[[], tuple[int | None, int | None]]) -> None:
+        """
+        Reload limits on SIGHUP.
+
+        Limits are loaded on separate thread, so reload is not blocked by copy running in the main thread.
+
+        :param typing.Callable load: Function returning new bandwidth and file operation limits.
+        """
+
+        def reload():
+            try:
+                self.configure(*load())
+            except (OSError, ValueError) as error:
+                logging.error(f'Could not reload replication limits: {error}')
+
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(
+                signal.SIGHUP, lambda signum, frame: threading.Thread(target=reload, name='sync-reload', daemon=True).start()
+            )
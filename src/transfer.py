@@ -0,0 +1,589 @@
+import collections
+import concurrent.futures
+import ctypes
+import errno
+import hashlib
+import logging
+import os
+import pathlib
+import stat
+import tempfile
+import threading
+import typing
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from src.throttle import Throttle
+
+import src.settings as settings
+
+# Errors which mean that kernel copy is not supported for given pair of files
+_UNSUPPORTED_ERRORS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP}
+# ioctl request cloning file data blocks (reflink), missing from fcntl module before Python 3.12
+_FICLONE = getattr(fcntl, 'FICLONE', 0x40049409)
+
+try:
+    _syncfs = ctypes.CDLL(None, use_errno=True).syncfs
+except (AttributeError, OSError):
+    _syncfs = None
+
+
+def _copy_file_range(source_fd: int, destination_fd: int, chunk_size: int, throttle: Throttle | None = None) -> int:
+    """Copy file with copy_file_range syscall."""
+
+    copied = 0
+    while sent := os.copy_file_range(source_fd, destination_fd, chunk_size):
+        copied += sent
+        if throttle is not None:
+            throttle.transfer(sent)
+
+    return copied
+
+
+def _sendfile(source_fd: int, destination_fd: int, chunk_size: int, throttle: Throttle | None = None) -> int:
+    """Copy file with sendfile syscall."""
+
+    copied = 0
+    while sent := os.sendfile(destination_fd, source_fd, None, chunk_size):
+        copied += sent
+        if throttle is not None:
+            throttle.transfer(sent)
+
+    return copied
+
+
+def _read_write(
+        source_fd: int,
+        destination_fd: int,
+        chunk_size: int,
+        digest=None,
+        throttle: Throttle | None = None
+) -> int:
+    """Copy file with userspace buffer of fixed size, updating digest if given."""
+
+    copied = 0
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(source_fd, 'rb', buffering=0, closefd=False) as source:
+        while read := source.readinto(buffer):
+            if digest is not None:
+                digest.update(view[:read])
+            written = 0
+            while written < read:
+                written += os.write(destination_fd, view[written:read])
+            copied += read
+            if throttle is not None:
+                throttle.transfer(read)
+
+    return copied
+
+
+_COPY_METHODS = [
+    method for method, available in (
+        (_copy_file_range, hasattr(os, 'copy_file_range')),
+        (_sendfile, hasattr(os, 'sendfile')),
+    ) if available
+]
+
+
+def new_digest():
+    """
+    Create content hash object used for tracked files.
+    :return: hashlib.blake2b Hash object.
+    """
+
+    return hashlib.blake2b(digest_size=settings.DIGEST_SIZE)
+
+
+def hash_file(path: pathlib.Path, chunk_size: int = settings.COPY_CHUNK_SIZE) -> bytes:
+    """
+    Compute content hash of the file reading it in chunks.
+
+    :param pathlib.Path path: Path to file.
+    :param int chunk_size: Size of a single chunk in bytes.
+    :return: bytes File content digest.
+    """
+
+    digest = new_digest()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as file:
+        while read := file.readinto(buffer):
+            digest.update(view[:read])
+
+    return digest.digest()
+
+
+def stream_copy(
+        source_fd: int,
+        destination_fd: int,
+        chunk_size: int = settings.COPY_CHUNK_SIZE,
+        digest=None,
+        throttle: Throttle | None = None
+) -> int:
+    """
+    Copy content between file descriptors in chunks.
+
+    Kernel side copy is used where supported, userspace buffer otherwise.
+    Content passes through userspace buffer when digest has to be computed.
+
+    :param int source_fd: Source file descriptor.
+    :param int destination_fd: Destination file descriptor.
+    :param int chunk_size: Size of a single chunk in bytes.
+    :param digest: Optional hash object updated with copied content.
+    :param Throttle | None throttle: Bandwidth limit waited on after every chunk.
+    :return: int Number of copied bytes.
+    """
+
+    if digest is not None:
+        return _read_write(source_fd, destination_fd, chunk_size, digest, throttle)
+
+    for method in _COPY_METHODS:
+        try:
+            return method(source_fd, destination_fd, chunk_size, throttle)
+        except OSError as error:
+            if error.errno not in _UNSUPPORTED_ERRORS or os.lseek(destination_fd, 0, os.SEEK_CUR):
+                raise
+            logging.debug('%s is not supported, falling back.', method.__name__)
+
+    return _read_write(source_fd, destination_fd, chunk_size, throttle=throttle)
+
+
+def copy_file(
+        source: pathlib.Path,
+        destination: pathlib.Path,
+        chunk_size: int = settings.COPY_CHUNK_SIZE,
+        digest=None,
+        throttle: Throttle | None = None,
+        fsync: bool = False
+) -> int:
+    """
+    Copy file to destination through temporary file and atomic rename.
+
+    Permissions and modification time of the source are preserved.
+
+    :param pathlib.Path source: Path to source file.
+    :param pathlib.Path destination: Path to destination file.
+    :param int chunk_size: Size of a single chunk in bytes.
+    :param digest: Optional hash object updated with copied content.
+    :param Throttle | None throttle: Bandwidth limit waited on after every chunk.
+    :param bool fsync: Flush content of the temporary file to disk before it is renamed.
+    :return: int Number of copied bytes.
+    """
+
+    with open(source, 'rb') as source_file:
+        fd, temp_path = tempfile.mkstemp(prefix=f'.{destination.name}.', suffix='.tmp', dir=destination.parent)
+        try:
+            with open(fd, 'wb') as destination_file:
+                copied = stream_copy(source_file.fileno(), destination_file.fileno(), chunk_size, digest, throttle)
+                source_stat = os.fstat(source_file.fileno())
+                os.fchmod(destination_file.fileno(), stat.S_IMODE(source_stat.st_mode))
+                os.utime(destination_file.fileno(), ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+                if fsync:
+                    os.fsync(destination_file.fileno())
+            os.replace(temp_path, destination)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    return copied
+
+
+class ReadFeed:
+    """Chunks of shared read queued for single writer, starting at given source offset."""
+
+    __slots__ = ('offset', 'chunks', 'detached')
+
+    def __init__(self, offset: int, chunks: typing.Iterable[bytes] = ()) -> None:
+        self.offset: int = offset
+        self.chunks: collections.deque[bytes] = collections.deque(chunks)
+        self.detached: bool = False
+
+
+class SharedRead:
+    """
+    Source file read once and fed to writers of many destinations, each draining its own queue of chunks.
+
+    Read is paced by the fastest writer. Writer which falls behind it by settings.SHARED_READ_CHUNKS chunks
+    is detached and reads the rest of the source on its own, so slow or failing destination does not stall
+    the others. First chunks are kept for writers joining later, writer joining after them reads the skipped
+    beginning on its own. Small files are kept whole even after the read has ended.
+    """
+
+    def __init__(
+            self,
+            source: pathlib.Path,
+            chunk_size: int = settings.COPY_CHUNK_SIZE,
+            queue_size: int = settings.SHARED_READ_CHUNKS
+    ) -> None:
+        """
+        Init SharedRead class.
+
+        :param pathlib.Path source: Path to source file.
+        :param int chunk_size: Size of a single chunk in bytes.
+        :param int queue_size: Number of chunks queued for writer before it is detached and number of first chunks
+            kept for writers joining later, quarter of it once the read has ended.
+        """
+
+        self.source: pathlib.Path = source
+        self.chunk_size: int = chunk_size
+        self.queue_size: int = queue_size
+        self.condition: threading.Condition = threading.Condition()
+        self.feeds: list[ReadFeed] = []
+        self.history: list[bytes] | None = []
+        self.offset: int = 0
+        self.state: str = 'new'
+
+    def join(self, executor: concurrent.futures.Executor) -> ReadFeed | None:
+        """
+        Add writer of single destination, the first one starts the read on the executor.
+
+        :param concurrent.futures.Executor executor: Executor running the read.
+        :return: ReadFeed | None Chunks fed to the writer, None if the read has ended and its beginning is not kept.
+        """
+
+        with self.condition:
+            if self.history is not None:
+                feed = ReadFeed(0, self.history)
+            elif self.state != 'done':
+                feed = ReadFeed(self.offset)
+            else:
+                return None
+            feed.detached = self.state == 'done'
+            self.feeds.append(feed)
+            if self.state == 'new':
+                self.state = 'reading'
+                executor.submit(self.read)
+            return feed
+
+    def read(self) -> None:
+        """Read the source chunk by chunk, feeding attached writers, until it ends or no writer is attached."""
+
+        try:
+            with open(self.source, 'rb', buffering=0) as source_file:
+                while True:
+                    with self.condition:
+                        self.condition.wait_for(self._may_read)
+                        if not self._attached():
+                            self.history = None
+                            break
+                    chunk = source_file.read(self.chunk_size)
+                    with self.condition:
+                        for feed in self._attached():
+                            if len(feed.chunks) >= self.queue_size:
+                                feed.detached = True
+                            else:
+                                feed.chunks.append(chunk)
+                        self.offset += len(chunk)
+                        if self.history is not None:
+                            self.history.append(chunk)
+                            if self.offset > self.chunk_size * self.queue_size:
+                                self.history = None
+                        self.condition.notify_all()
+                    if not chunk:
+                        break
+        except OSError as error:
+            logging.debug('Shared read of %s failed, writers read it on their own: %s', self.source, error)
+            with self.condition:
+                self.history = None
+        finally:
+            with self.condition:
+                self.state = 'done'
+                if self.offset > self.chunk_size * (self.queue_size // 4):
+                    self.history = None
+                for feed in self._attached():
+                    feed.detached = True
+                self.condition.notify_all()
+
+    def _attached(self) -> list[ReadFeed]:
+        return [feed for feed in self.feeds if not feed.detached]
+
+    def _may_read(self) -> bool:
+        """Reading ahead is useful unless every attached writer has half of its queue full."""
+
+        attached = self._attached()
+        return not attached or any(len(feed.chunks) < self.queue_size // 2 for feed in attached)
+
+    def _next_chunk(
+            self,
+            feed: ReadFeed,
+            source_fd: int,
+            position: int
+    ) -> bytes:
+        """Take next chunk fed to the writer, or read it from the source when the writer is not fed at this position."""
+
+        size = self.chunk_size
+        if position < feed.offset:
+            size = min(size, feed.offset - position)
+        else:
+            with self.condition:
+                self.condition.wait_for(lambda: feed.chunks or feed.detached)
+                if feed.chunks:
+                    chunk = feed.chunks.popleft()
+                    self.condition.notify_all()
+                    return chunk
+
+        return os.pread(source_fd, size, position)
+
+    def write(
+            self,
+            feed: ReadFeed,
+            destination: pathlib.Path,
+            digest=None,
+            throttle: Throttle | None = None,
+            fsync: bool = False
+    ) -> int:
+        """
+        Write source content fed to the writer to destination through temporary file and atomic rename.
+
+        Permissions and modification time of the source are preserved.
+
+        :param ReadFeed feed: Feed of the writer.
+        :param pathlib.Path destination: Path to destination file.
+        :param digest: Optional hash object updated with copied content.
+        :param Throttle | None throttle: Bandwidth limit waited on after every chunk.
+        :param bool fsync: Flush content of the temporary file to disk before it is renamed.
+        :return: int Number of copied bytes.
+        """
+
+        try:
+            with open(self.source, 'rb', buffering=0) as source_file:
+                fd, temp_path = tempfile.mkstemp(prefix=f'.{destination.name}.', suffix='.tmp', dir=destination.parent)
+                try:
+                    with open(fd, 'wb') as destination_file:
+                        copied = 0
+                        while chunk := self._next_chunk(feed, source_file.fileno(), copied):
+                            if digest is not None:
+                                digest.update(chunk)
+                            view = memoryview(chunk)
+                            written = 0
+                            while written < len(chunk):
+                                written += os.write(destination_file.fileno(), view[written:])
+                            copied += len(chunk)
+                            if throttle is not None:
+                                throttle.transfer(len(chunk))
+                        source_stat = os.fstat(source_file.fileno())
+                        os.fchmod(destination_file.fileno(), stat.S_IMODE(source_stat.st_mode))
+                        os.utime(destination_file.fileno(), ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+                        if fsync:
+                            os.fsync(destination_file.fileno())
+                    os.replace(temp_path, destination)
+                except BaseException:
+                    os.unlink(temp_path)
+                    raise
+        finally:
+            with self.condition:
+                feed.detached = True
+                feed.chunks.clear()
+                self.condition.notify_all()
+
+        return copied
+
+
+def clone_file(
+        source: pathlib.Path,
+        destination: pathlib.Path,
+        origin: pathlib.Path | None = None
+) -> None:
+    """
+    Clone file to destination sharing its data blocks (reflink), through temporary file and atomic rename.
+
+    Clone is copy-on-write, so changes of one file do not affect the other.
+
+    :param pathlib.Path source: Path to source file.
+    :param pathlib.Path destination: Path to destination file.
+    :param pathlib.Path | None origin: File which permissions and modification time are given to destination, source by default.
+    :raises OSError: Filesystem does not support cloning.
+    """
+
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, 'Cloning is not supported on this platform.')
+
+    metadata = os.stat(origin or source)
+    with open(source, 'rb') as source_file:
+        fd, temp_path = tempfile.mkstemp(prefix=f'.{destination.name}.', suffix='.tmp', dir=destination.parent)
+        try:
+            with open(fd, 'wb') as destination_file:
+                fcntl.ioctl(destination_file.fileno(), _FICLONE, source_file.fileno())
+                os.fchmod(destination_file.fileno(), stat.S_IMODE(metadata.st_mode))
+                os.utime(destination_file.fileno(), ns=(metadata.st_atime_ns, metadata.st_mtime_ns))
+            os.replace(temp_path, destination)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+def link_file(
+        source: pathlib.Path,
+        destination: pathlib.Path
+) -> None:
+    """
+    Hardlink destination to the source file, replacing existing destination atomically.
+
+    Hardlinked files share content together with permissions and modification time.
+
+    :param pathlib.Path source: Path to source file.
+    :param pathlib.Path destination: Path to destination file.
+    """
+
+    temp_path = destination.parent / f'.{destination.name}.{os.urandom(4).hex()}.tmp'
+    os.link(source, temp_path)
+    try:
+        os.replace(temp_path, destination)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def fsync_path(path: pathlib.Path) -> None:
+    """
+    Flush file or directory to disk, for directory its entries, so renames and removals in it survive a crash.
+
+    :param pathlib.Path path: Path to file or directory.
+    """
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_filesystem(path: pathlib.Path) -> bool:
+    """
+    Flush all pending writes of the filesystem holding given path with single syncfs call.
+
+    :param pathlib.Path path: Path on the filesystem.
+    :return: bool False if syncfs is not supported on this platform.
+    """
+
+    if _syncfs is None:
+        return False
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if _syncfs(fd) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), str(path))
+    finally:
+        os.close(fd)
+    return True
+
+
+class DeltaResult(typing.NamedTuple):
+    """Outcome of block-level delta transfer."""
+
+    written: int
+    size: int
+    blocks: list[bytes]
+
+
+def block_hash(block) -> bytes:
+    """
+    Compute hash of a single block of file content.
+
+    :param block: Bytes-like block content.
+    :return: bytes Block digest.
+    """
+
+    return hashlib.blake2b(block, digest_size=settings.DIGEST_SIZE).digest()
+
+
+def delta_copy(
+        source: pathlib.Path,
+        destination: pathlib.Path,
+        blocks: list[bytes] | None = None,
+        block_size: int = settings.DELTA_BLOCK_SIZE,
+        digest=None,
+        throttle: Throttle | None = None,
+        fsync: bool = False
+) -> DeltaResult:
+    """
+    Update destination in place, writing only blocks which differ from the source.
+
+    Source blocks are compared with block hashes of the previous transfer, or with blocks
+    read from the destination when hashes are not known. Destination is then truncated or
+    extended to the source size. Update is not atomic, interrupted transfer is repaired
+    by the next one.
+
+    :param pathlib.Path source: Path to source file.
+    :param pathlib.Path destination: Path to existing destination file.
+    :param list[bytes] | None blocks: Block hashes of the destination content.
+    :param int block_size: Size of a single block in bytes.
+    :param digest: Optional hash object updated with source content.
+    :param Throttle | None throttle: Bandwidth limit waited on after every written block.
+    :param bool fsync: Flush updated content to disk before returning.
+    :return: DeltaResult Bytes written, file size and block hashes of the new content.
+    """
+
+    hashes = []
+    written = 0
+    offset = 0
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    with open(source, 'rb', buffering=0) as source_file, open(destination, 'r+b', buffering=0) as destination_file:
+        destination_fd = destination_file.fileno()
+        destination_size = os.fstat(destination_fd).st_size
+
+        while read := source_file.readinto(buffer):
+            block = view[:read]
+            if digest is not None:
+                digest.update(block)
+
+            current = block_hash(block)
+            if blocks is not None and len(hashes) < len(blocks):
+                previous = blocks[len(hashes)]
+            elif offset + read <= destination_size:
+                previous = block_hash(os.pread(destination_fd, read, offset))
+            else:
+                previous = None
+
+            if current != previous:
+                block_written = 0
+                while block_written < read:
+                    block_written += os.pwrite(destination_fd, block[block_written:], offset + block_written)
+                written += block_written
+                if throttle is not None:
+                    throttle.transfer(block_written)
+
+            hashes.append(current)
+            offset += read
+
+        os.ftruncate(destination_fd, offset)
+        source_stat = os.fstat(source_file.fileno())
+        os.fchmod(destination_fd, stat.S_IMODE(source_stat.st_mode))
+        os.utime(destination_fd, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+        if fsync:
+            os.fsync(destination_fd)
+
+    return DeltaResult(written, offset, hashes)
+
+
+def files_equal(
+        first: pathlib.Path,
+        second: pathlib.Path,
+        chunk_size: int = settings.COPY_CHUNK_SIZE
+) -> bool:
+    """
+    Compare content of two files chunk by chunk.
+
+    :param pathlib.Path first: Path to first file.
+    :param pathlib.Path second: Path to second file.
+    :param int chunk_size: Size of a single chunk in bytes.
+    :return: bool True if files have the same content.
+    """
+
+    try:
+        if first.stat().st_size != second.stat().st_size:
+            return False
+
+        with open(first, 'rb') as first_file, open(second, 'rb') as second_file:
+            while first_chunk := first_file.read(chunk_size):
+                if first_chunk != second_file.read(chunk_size):
+                    return False
+            return not second_file.read(1)
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,225 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import pathlib
+import select
+import struct
+import time
+import typing
+
+from src.filters import FileFilter
+
+import src.settings as settings
+
+# inotify event flags, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+)
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class Event(typing.NamedTuple):
+    """Single inotify event."""
+
+    wd: int
+    mask: int
+    cookie: int
+    name: str
+
+
+class InotifyWatcher:
+    """Collect changed paths of directory tree with Linux inotify."""
+
+    def __init__(
+            self,
+            root: pathlib.Path,
+            debounce: float = settings.WATCH_DEBOUNCE,
+            max_delay: float = settings.WATCH_MAX_DELAY,
+            file_filter: FileFilter | None = None
+    ) -> None:
+        """
+        Init watcher and watch every directory of the tree.
+
+        :param pathlib.Path root: Root directory of watched tree.
+        :param float debounce: Time without new events after which changes are returned.
+        :param float max_delay: Maximum time changes are collected before they are returned.
+        :param FileFilter | None file_filter: Rules of excluded paths, excluded directories are not watched.
+        """
+
+        self.root: pathlib.Path = root
+        self.debounce: float = debounce
+        self.max_delay: float = max_delay
+        self.watches: dict[int, pathlib.Path] = {}
+        self.file_filter: FileFilter | None = file_filter
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd: int = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f'inotify_init1 failed: {os.strerror(error)}')
+
+        self.add_watch_recursive(root)
+
+    def add_watch(self, path: pathlib.Path) -> None:
+        """
+        Watch single directory.
+
+        :param pathlib.Path path: Path to directory.
+        """
+
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return
+            if error == errno.ENOSPC:
+                logging.error('inotify watch limit reached, raise fs.inotify.max_user_watches.')
+            raise OSError(error, f'inotify_add_watch failed for {path}: {os.strerror(error)}')
+
+        self.watches[wd] = path
+
+    def add_watch_recursive(self, path: pathlib.Path) -> None:
+        """
+        Watch directory with all its subdirectories.
+
+        :param pathlib.Path path: Path to directory.
+        """
+
+        self.add_watch(path)
+        for root, dirs, _ in os.walk(path):
+            if self.file_filter is not None:
+                dirs[:] = [name for name in dirs if self.file_filter.accepts_path(os.path.join(root, name), True)]
+            for name in dirs:
+                self.add_watch(pathlib.Path(root) / name)
+
+    def remove_watch_recursive(self, path: pathlib.Path) -> None:
+        """
+        Stop watching directory with all its subdirectories.
+
+        :param pathlib.Path path: Path to directory.
+        """
+
+        for wd, watched_path in list(self.watches.items()):
+            if watched_path.is_relative_to(path):
+                self._libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+
+    def read_events(self) -> list[Event]:
+        """
+        Read pending events.
+        :return: list[Event] Events read from inotify descriptor.
+        """
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append(Event(wd, mask, cookie, name))
+
+        return events
+
+    def handle_event(
+            self,
+            event: Event,
+            dirty: set[pathlib.Path]
+    ) -> bool:
+        """
+        Add path changed by event to dirty paths and keep watches up to date.
+
+        :param Event event: Inotify event.
+        :param set[pathlib.Path] dirty: Collected dirty paths.
+        :return: bool True if event queue overflowed and changes were lost.
+        """
+
+        if event.mask & IN_Q_OVERFLOW:
+            logging.warning('inotify event queue overflowed.')
+            return True
+
+        if event.mask & IN_IGNORED:
+            self.watches.pop(event.wd, None)
+            return False
+
+        directory = self.watches.get(event.wd)
+        if directory is None or not event.name:
+            return False
+
+        path = directory / event.name
+        if self.file_filter is not None and not self.file_filter.accepts_path(path, bool(event.mask & IN_ISDIR)):
+            return False
+        if event.mask & IN_ISDIR:
+            if event.mask & (IN_MOVED_FROM | IN_DELETE):
+                self.remove_watch_recursive(path)
+                dirty.add(path)
+            elif event.mask & (IN_MOVED_TO | IN_CREATE):
+                self.add_watch_recursive(path)
+                dirty.add(path)
+            return False
+
+        dirty.add(path)
+        return False
+
+    def collect(
+            self,
+            timeout: float | None = None,
+            wakeup_fd: int | None = None
+    ) -> tuple[set[pathlib.Path], bool]:
+        """
+        Wait for changes and collect them until no event comes within debounce window.
+
+        :param float | None timeout: Maximum time in seconds to wait for first event, None waits forever.
+        :param int | None wakeup_fd: Descriptor which interrupts waiting when it becomes readable.
+        :return: tuple[set[pathlib.Path], bool] Dirty paths and flag if full rescan is required.
+        """
+
+        dirty = set()
+        overflow = False
+        descriptors = [self.fd] if wakeup_fd is None else [self.fd, wakeup_fd]
+        ready, _, _ = select.select(descriptors, [], [], timeout)
+        deadline = time.monotonic() + self.max_delay
+
+        while self.fd in ready:
+            for event in self.read_events():
+                overflow |= self.handle_event(event, dirty)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or wakeup_fd in ready:
+                break
+            ready, _, _ = select.select(descriptors, [], [], min(self.debounce, remaining))
+
+        if overflow:
+            self.add_watch_recursive(self.root)
+
+        return dirty, overflow
+
+    def close(self) -> None:
+        """Close inotify descriptor."""
+
+        os.close(self.fd)
+        self.watches = {}
@@ -0,0 +1,74 @@
+import pathlib
+import time
+import unittest.mock
+
+from src.async_synchronizer import AsyncSynchronizer
+from src.file import DirFile
+from src.index import SyncIndex
+from src.scanner import iter_scan
+
+
+class TestAsyncSynchronizer:
+    def test_sync(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        (source / 'dir').mkdir(parents=True)
+        (source / 'dir' / 'file.txt').write_text('content')
+        (source / 'moved').mkdir()
+        (source / 'moved' / 'file.txt').write_text('moved content')
+        (source / 'deleted.txt').write_text('content')
+        (source / 'replaced.txt').write_text('content')
+        synchronizer = AsyncSynchronizer(
+            DirFile(source), DirFile(replica), index=SyncIndex(tmp_path / 'index.sqlite'), workers=2
+        )
+        synchronizer.initialize()
+
+        (source / 'dir' / 'file.txt').write_text('new content')
+        (source / 'dir' / 'new.txt').write_text('new')
+        (source / 'moved').rename(source / 'renamed')
+        (source / 'renamed' / 'new.txt').write_text('new in renamed')
+        (source / 'deleted.txt').unlink()
+        (source / 'replaced.txt').unlink()
+        (source / 'replaced.txt').mkdir()
+        (source / 'replaced.txt' / 'file.txt').write_text('content')
+
+        synchronizer.sync()
+
+        assert (replica / 'dir' / 'file.txt').read_text() == 'new content'
+        assert (replica / 'dir' / 'new.txt').read_text() == 'new'
+        assert (replica / 'renamed' / 'file.txt').read_text() == 'moved content'
+        assert (replica / 'renamed' / 'new.txt').read_text() == 'new in renamed'
+        assert (replica / 'replaced.txt' / 'file.txt').read_text() == 'content'
+        assert not (replica / 'moved').exists()
+        assert not (replica / 'deleted.txt').exists()
+        assert set(synchronizer.index.load()) == {
+            '.', 'dir', 'dir/file.txt', 'dir/new.txt', 'renamed', 'renamed/file.txt', 'renamed/new.txt',
+            'replaced.txt', 'replaced.txt/file.txt'
+        }
+        synchronizer.close()
+
+    def test_sync_copies_during_scan(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        for name in ('a', 'b', 'c'):
+            (source / name).mkdir(parents=True)
+            (source / name / 'file.txt').write_text('content')
+        synchronizer = AsyncSynchronizer(DirFile(source), DirFile(replica))
+        synchronizer.initialize()
+        (source / 'a' / 'file.txt').write_text('new content')
+        copied_during_scan = []
+
+        def slow_iter_scan(root, cache=None, file_filter=None):
+            for files in iter_scan(root, cache, file_filter):
+                yield files
+                if any(file.path == source / 'a' / 'file.txt' for file in files):
+                    deadline = time.monotonic() + 5
+                    while (replica / 'a' / 'file.txt').read_text() != 'new content' and time.monotonic() < deadline:
+                        time.sleep(0.01)
+                    copied_during_scan.append((replica / 'a' / 'file.txt').read_text() == 'new content')
+
+        with unittest.mock.patch('src.async_synchronizer.iter_scan', slow_iter_scan):
+            synchronizer.sync()
+
+        assert copied_during_scan == [True]
+        synchronizer.close()
@@ -0,0 +1,118 @@
+import pathlib
+
+import pytest
+
+import src.settings as settings
+from src.config import PairConfig, load_config, load_limits
+
+
+class TestConfig:
+    def test_load_config(self, tmp_path: pathlib.Path):
+        config_path = tmp_path / 'config.toml'
+        config_path.write_text(
+            'workers = 2\n'
+            'io_limit = 3\n'
+            'metrics_file = "metrics.prom"\n'
+            'metrics_port = 9100\n'
+            'bandwidth_limit = 1048576\n'
+            '[[pair]]\n'
+            'source_dir = "source"\n'
+            'replica_dir = "/backup/replica"\n'
+            '[[pair]]\n'
+            'source_dir = "other"\n'
+            'replica_dir = "other_replica"\n'
+            'interval = 0.5\n'
+            'checksum = true\n'
+            'delta_threshold = 0\n'
+            'streaming = true\n'
+            'dedup = true\n'
+            'prune_scan = "trust"\n'
+        )
+
+        config = load_config(config_path)
+
+        assert config.workers == 2
+        assert config.io_limit == 3
+        assert (config.metrics_file, config.metrics_log, config.metrics_port) == (tmp_path / 'metrics.prom', None, 9100)
+        assert config.pairs == [
+            PairConfig(tmp_path / 'source', pathlib.Path('/backup/replica')),
+            PairConfig(tmp_path / 'other', tmp_path / 'other_replica', 0.5, True, None, True, True, 'trust'),
+        ]
+        assert config.pairs[0].interval == settings.DEFAULT_INTERVAL
+        assert (config.bandwidth_limit, config.iops_limit) == (1048576, None)
+        assert load_limits(config_path) == (1048576, None)
+
+    def test_load_filters(self, tmp_path: pathlib.Path):
+        (tmp_path / 'syncignore').write_text('build/\n')
+        config_path = tmp_path / 'config.toml'
+        config_path.write_text(
+            '[[pair]]\n'
+            'source_dir = "source"\n'
+            'replica_dir = "replica"\n'
+            'filter_file = "syncignore"\n'
+            'exclude = ["*.log"]\n'
+            'include = ["important.log"]\n'
+            'max_size = 1048576\n'
+            'min_age = 2.5\n'
+        )
+
+        pair = load_config(config_path).pairs[0]
+
+        assert pair.filter_rules == ('build/', '*.log', '!important.log')
+        assert (pair.min_size, pair.max_size, pair.min_age, pair.max_age) == (None, 1048576, 2.5, None)
+
+    def test_load_scrub_period(self, tmp_path: pathlib.Path):
+        config_path = tmp_path / 'config.toml'
+        config_path.write_text('[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nscrub_period = 12\n')
+
+        assert load_config(config_path).pairs[0].scrub_period == 12 * 3600
+
+    def test_load_durability(self, tmp_path: pathlib.Path):
+        config_path = tmp_path / 'config.toml'
+        config_path.write_text('[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\ndurability = "batch"\n')
+
+        assert load_config(config_path).pairs[0].durability == 'batch'
+
+    def test_load_remote(self, tmp_path: pathlib.Path):
+        (tmp_path / 'token').write_text('secret\n')
+        config_path = tmp_path / 'config.toml'
+        config_path.write_text(
+            '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\n'
+            'remote = "tcp://backup.local:9000"\nremote_token_file = "token"\n'
+        )
+
+        pair = load_config(config_path).pairs[0]
+
+        assert (pair.remote, pair.remote_token) == ('tcp://backup.local:9000', 'secret')
+
+    @pytest.mark.parametrize('content', [
+        'workers = 2\n',
+        '[[pair]]\nsource_dir = "source"\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nunknown = 1\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\ninterval = 0\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\n[[pair]]\nsource_dir = "c"\nreplica_dir = "b"\n',
+        'io_limit = 0\n[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\n',
+        'pair = [\n',
+        'metrics_port = "9100"\n[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\n',
+        'iops_limit = -1\n[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nprune_scan = "always"\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nscan_workers = -1\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nexclude = "*.log"\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nfilter_file = "missing"\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nmax_size = 1.5\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nscrub_period = -1\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nfilter_rules = ["*.log"]\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nscan_workers = 4\nprune_scan = "stat"\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nremote = "backup.local:9000"\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nremote = "tcp://backup.local:9000"\ndedup = true\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nremote_token_file = "token"\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nremote_token = "secret"\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\ndurability = "always"\n',
+        '[[pair]]\nsource_dir = "a"\nreplica_dir = "b"\nremote = "tcp://backup.local:9000"\ndurability = "strict"\n',
+    ])
+    def test_load_invalid_config(self, tmp_path: pathlib.Path, content: str):
+        config_path = tmp_path / 'config.toml'
+        config_path.write_text(content)
+
+        with pytest.raises(ValueError):
+            load_config(config_path)
@@ -0,0 +1,101 @@
+import pathlib
+import threading
+import time
+import unittest.mock
+
+from src.config import DaemonConfig, PairConfig
+from src.daemon import Daemon
+
+
+class TestDaemon:
+    def test_run(self, tmp_path: pathlib.Path):
+        pairs = []
+        for index in range(3):
+            source = tmp_path / f'source_{index}'
+            source.mkdir()
+            (source / 'file.txt').write_text(f'content {index}')
+            pairs.append(PairConfig(source, tmp_path / f'replica_{index}', interval=0.05, streaming=index == 2))
+        daemon = Daemon(DaemonConfig(pairs, workers=2, io_limit=2))
+        daemon.initialize()
+
+        for index, pair in enumerate(pairs):
+            assert (pair.replica_dir / 'file.txt').read_text() == f'content {index}'
+            (pair.source_dir / 'new.txt').write_text(f'new {index}')
+
+        thread = threading.Thread(target=daemon.run)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not all((pair.replica_dir / 'new.txt').exists() for pair in pairs):
+            time.sleep(0.01)
+        daemon.stop()
+        thread.join()
+        daemon.close()
+
+        for index, pair in enumerate(pairs):
+            assert (pair.replica_dir / 'new.txt').read_text() == f'new {index}'
+        assert {thread.name.split('_')[0] for thread in threading.enumerate()} & {'sync-io', 'sync-cycle'} == set()
+
+    def test_initialize_failed_pair(self, tmp_path: pathlib.Path):
+        pairs = []
+        for index in range(2):
+            source = tmp_path / f'source_{index}'
+            source.mkdir()
+            (source / 'file.txt').write_text(f'content {index}')
+            pairs.append(PairConfig(source, tmp_path / f'replica_{index}', interval=10))
+        daemon = Daemon(DaemonConfig(pairs))
+        failed = daemon.jobs[0]
+
+        with unittest.mock.patch.object(failed.synchronizer, 'initialize', side_effect=OSError('unavailable')):
+            daemon.initialize()
+
+        assert not (pairs[0].replica_dir / 'file.txt').exists()
+        assert (pairs[1].replica_dir / 'file.txt').read_text() == 'content 1'
+
+        with unittest.mock.patch.object(daemon.jobs[1].synchronizer, 'sync') as sync_mock:
+            for job in daemon.jobs:
+                daemon.dispatch(job, job.runtime.next_run)
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and not (sync_mock.called and failed.synchronizer in daemon.initialized):
+                time.sleep(0.01)
+            daemon.close()
+
+        sync_mock.assert_called_once()
+        assert (pairs[0].replica_dir / 'file.txt').read_text() == 'content 0'
+
+    def test_dispatch_skips_missed_ticks(self, tmp_path: pathlib.Path):
+        (tmp_path / 'source').mkdir()
+        daemon = Daemon(DaemonConfig([PairConfig(tmp_path / 'source', tmp_path / 'replica', interval=10)]))
+        job = daemon.jobs[0]
+        job.runtime.next_run = 100
+
+        daemon.dispatch(job, 135)
+
+        assert job.runtime.next_run == 140
+        daemon.close()
+
+    def test_pending_limit(self, tmp_path: pathlib.Path):
+        (tmp_path / 'source').mkdir()
+        daemon = Daemon(DaemonConfig([PairConfig(tmp_path / 'source', tmp_path / 'replica')], io_limit=2))
+        pool = daemon.jobs[0].synchronizer.pool
+        released = threading.Event()
+        pending = []
+
+        def submit():
+            for _ in range(5):
+                pool.submit(released.wait)
+                pending.append(len(pool.pending))
+            pool.wait()
+
+        thread = threading.Thread(target=submit)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and len(pending) < 2:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        blocked = list(pending)
+        released.set()
+        thread.join()
+        daemon.close()
+
+        assert blocked == [1, 2]
+        assert max(pending) == 2
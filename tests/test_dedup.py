@@ -0,0 +1,157 @@
+import os
+import pathlib
+import unittest.mock
+
+from src.dedup import DedupStore
+from src.file import DirFile, TextFile
+from src.index import SyncIndex
+from src.synchronizer import Synchronizer
+
+
+class TestDedupStore:
+    def get_synchronizer(self, tmp_path: pathlib.Path) -> Synchronizer:
+        source = tmp_path / 'source'
+        (source / 'dir').mkdir(parents=True)
+        (source / 'first.txt').write_text('duplicate')
+        (source / 'dir' / 'second.txt').write_text('duplicate')
+        (source / 'unique.txt').write_text('unique')
+        (source / 'linked.txt').write_text('linked')
+        os.link(source / 'linked.txt', source / 'dir' / 'link.txt')
+        mtime_ns = (source / 'first.txt').stat().st_mtime_ns
+        os.utime(source / 'dir' / 'second.txt', ns=(mtime_ns, mtime_ns))
+
+        return Synchronizer(DirFile(source), DirFile(tmp_path / 'replica'), dedup=True)
+
+    @unittest.mock.patch('src.dedup.clone_file', side_effect=OSError)
+    def test_initialize(
+            self,
+            clone_file_mock: unittest.mock.MagicMock,
+            tmp_path: pathlib.Path
+    ):
+        synchronizer = self.get_synchronizer(tmp_path)
+        replica = synchronizer.replica.path
+
+        with unittest.mock.patch('logging.info') as info_mock:
+            synchronizer.initialize()
+
+        clone_file_mock.assert_called_once()
+        assert os.path.samefile(replica / 'first.txt', replica / 'dir' / 'second.txt')
+        assert os.path.samefile(replica / 'linked.txt', replica / 'dir' / 'link.txt')
+        assert not os.path.samefile(replica / 'first.txt', replica / 'unique.txt')
+        assert (replica / 'dir' / 'second.txt').read_text() == 'duplicate'
+        assert (replica / 'dir' / 'link.txt').read_text() == 'linked'
+        assert len(synchronizer.tracked_files) == 6
+        info_mock.assert_any_call('Deduplication saved 15 bytes (0 reflinks, 2 hardlinks), 15 bytes in total')
+        synchronizer.close()
+
+    def test_sync_links(self, tmp_path: pathlib.Path):
+        synchronizer = self.get_synchronizer(tmp_path)
+        source = synchronizer.source.path
+        replica = synchronizer.replica.path
+        synchronizer.initialize()
+
+        os.link(source / 'linked.txt', source / 'new_link.txt')
+        (source / 'dir' / 'link.txt').unlink()
+        synchronizer.sync()
+
+        assert os.path.samefile(replica / 'linked.txt', replica / 'new_link.txt')
+        assert not (replica / 'dir' / 'link.txt').exists()
+
+        (source / 'linked.txt').unlink()
+        synchronizer.sync_paths([source / 'linked.txt'])
+
+        assert not (replica / 'linked.txt').exists()
+        assert (replica / 'new_link.txt').read_text() == 'linked'
+        synchronizer.close()
+
+    def test_write_changed_copy(self, tmp_path: pathlib.Path):
+        synchronizer = self.get_synchronizer(tmp_path)
+        source = synchronizer.source.path
+        replica = synchronizer.replica.path
+        synchronizer.initialize()
+
+        (replica / 'first.txt').unlink()
+        (replica / 'first.txt').write_text('changed')
+        (source / 'new.txt').write_text('duplicate')
+        synchronizer.sync()
+
+        assert (replica / 'new.txt').read_text() == 'duplicate'
+        assert not os.path.samefile(replica / 'first.txt', replica / 'new.txt')
+        synchronizer.close()
+
+    def test_delta_skips_hardlinked_replica(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        source.mkdir()
+        (source / 'first.bin').write_bytes(b'a' * 4096)
+        (source / 'second.bin').write_bytes(b'a' * 4096)
+        synchronizer = Synchronizer(DirFile(source), DirFile(tmp_path / 'replica'), delta_threshold=1024, dedup=True)
+        with unittest.mock.patch('src.dedup.clone_file', side_effect=OSError):
+            synchronizer.initialize()
+
+        (source / 'first.bin').write_bytes(b'b' * 4096)
+        synchronizer.sync()
+
+        assert (synchronizer.replica.path / 'first.bin').read_bytes() == b'b' * 4096
+        assert (synchronizer.replica.path / 'second.bin').read_bytes() == b'a' * 4096
+        synchronizer.close()
+
+    @unittest.mock.patch('src.dedup.clone_file', side_effect=OSError)
+    def test_write(
+            self,
+            clone_file_mock: unittest.mock.MagicMock,
+            tmp_path: pathlib.Path
+    ):
+        (tmp_path / 'source').mkdir()
+        store = DedupStore()
+        replicas = []
+        for name, mtime_ns in [('first.txt', 10 ** 18), ('second.txt', 2 * 10 ** 18), ('third.txt', 10 ** 18)]:
+            origin = tmp_path / 'source' / name
+            origin.write_text('duplicate')
+            os.utime(origin, ns=(mtime_ns, mtime_ns))
+            replica_file = TextFile(tmp_path / 'replica' / name)
+            replica_file.origin = origin
+            replicas.append(replica_file)
+
+        with unittest.mock.patch('src.dedup.hash_file') as hash_file_mock:
+            assert store.write(replicas[0]) == 9
+
+        hash_file_mock.assert_not_called()
+        assert replicas[0].digest in store.copies
+        assert store.write(replicas[2]) == 0
+        assert store.write(replicas[1]) == 9
+        assert not os.path.samefile(replicas[0].path, replicas[1].path)
+        assert os.path.samefile(replicas[0].path, replicas[2].path)
+        assert replicas[1].path.stat().st_mtime_ns == 2 * 10 ** 18
+        assert store.hardlinks == 1
+
+    @unittest.mock.patch('src.dedup.clone_file', side_effect=OSError)
+    def test_touch_hardlinked_replica(
+            self,
+            clone_file_mock: unittest.mock.MagicMock,
+            tmp_path: pathlib.Path
+    ):
+        synchronizer = self.get_synchronizer(tmp_path)
+        source = synchronizer.source.path
+        replica = synchronizer.replica.path
+        index = SyncIndex.for_replica(replica)
+        Synchronizer(DirFile(source), DirFile(replica), index=index, dedup=True).initialize()
+        mtime_ns = (replica / 'dir' / 'second.txt').stat().st_mtime_ns
+
+        os.utime(source / 'first.txt', ns=(10 ** 18, 10 ** 18))
+        Synchronizer(DirFile(source), DirFile(replica), index=index, dedup=True).initialize()
+
+        assert (replica / 'first.txt').stat().st_mtime_ns == 10 ** 18
+        assert (replica / 'dir' / 'second.txt').stat().st_mtime_ns == mtime_ns
+        assert not os.path.samefile(replica / 'first.txt', replica / 'dir' / 'second.txt')
+        synchronizer.close()
+
+    def test_report(self):
+        store = DedupStore()
+        store.hardlinks = 1
+        store.bytes_saved = 10
+
+        store.report()
+        store.report()
+
+        assert store.total_bytes_saved == 10
+        assert (store.hardlinks, store.bytes_saved) == (0, 0)
@@ -0,0 +1,88 @@
+import os
+import pathlib
+import unittest.mock
+
+import pytest
+
+from src.durability import Durability
+from src.file import DirFile
+from src.synchronizer import Synchronizer
+from src.transfer import fsync_path, sync_filesystem
+
+
+def make_source(source: pathlib.Path) -> None:
+    (source / 'dir').mkdir(parents=True)
+    for name in ('a.txt', 'b.txt'):
+        (source / 'dir' / name).write_text(name)
+    (source / 'c.txt').write_text('c')
+
+
+class TestDurability:
+    def test_strict(self, tmp_path: pathlib.Path):
+        make_source(tmp_path / 'source')
+        synchronizer = Synchronizer(DirFile(tmp_path / 'source'), DirFile(tmp_path / 'replica'), durability='strict')
+
+        with unittest.mock.patch('os.fsync', wraps=os.fsync) as fsync_mock:
+            synchronizer.initialize()
+
+        assert (tmp_path / 'replica' / 'dir' / 'a.txt').read_text() == 'a.txt'
+        assert fsync_mock.call_count == synchronizer.metrics.last['counters']['fsyncs']
+        assert fsync_mock.call_count >= 3 * 2
+
+        (tmp_path / 'source' / 'c.txt').rename(tmp_path / 'source' / 'dir' / 'c.txt')
+        with unittest.mock.patch('os.fsync', wraps=os.fsync) as fsync_mock:
+            synchronizer.sync()
+
+        assert fsync_mock.call_count == 2
+        synchronizer.close()
+
+    def test_batch(self, tmp_path: pathlib.Path):
+        make_source(tmp_path / 'source')
+        synchronizer = Synchronizer(DirFile(tmp_path / 'source'), DirFile(tmp_path / 'replica'), durability='batch')
+
+        with unittest.mock.patch('src.durability.sync_filesystem', wraps=sync_filesystem) as sync_mock, \
+                unittest.mock.patch('os.fsync', wraps=os.fsync) as fsync_mock:
+            synchronizer.initialize()
+            synchronizer.sync()
+
+        sync_mock.assert_called_once_with(tmp_path / 'replica')
+        fsync_mock.assert_not_called()
+        assert (tmp_path / 'replica' / 'c.txt').read_text() == 'c'
+        synchronizer.close()
+
+    def test_batch_without_syncfs(self, tmp_path: pathlib.Path):
+        (tmp_path / 'dir').mkdir()
+        (tmp_path / 'dir' / 'file.txt').write_text('content')
+        durability = Durability('batch', tmp_path)
+        durability.file_written(tmp_path / 'dir' / 'file.txt')
+        durability.file_written(tmp_path / 'removed.txt')
+        durability.dir_changed(tmp_path / 'dir')
+
+        with unittest.mock.patch('src.transfer._syncfs', None), \
+                unittest.mock.patch('src.durability.fsync_path', wraps=fsync_path) as fsync_mock:
+            assert durability.flush() == 3
+
+        assert fsync_mock.call_args_list == [
+            unittest.mock.call(tmp_path / 'dir' / 'file.txt'),
+            unittest.mock.call(tmp_path / 'removed.txt'),
+            unittest.mock.call(tmp_path),
+            unittest.mock.call(tmp_path / 'dir'),
+        ]
+        assert durability.flush() == 0
+
+    def test_none(self, tmp_path: pathlib.Path):
+        make_source(tmp_path / 'source')
+        synchronizer = Synchronizer(DirFile(tmp_path / 'source'), DirFile(tmp_path / 'replica'))
+
+        with unittest.mock.patch('os.fsync') as fsync_mock:
+            synchronizer.initialize()
+
+        fsync_mock.assert_not_called()
+        assert 'fsyncs' not in synchronizer.metrics.last['counters']
+        synchronizer.close()
+
+    def test_backend_durability(self, tmp_path: pathlib.Path):
+        backend = unittest.mock.MagicMock()
+
+        with pytest.raises(ValueError):
+            Synchronizer(DirFile(tmp_path), DirFile(tmp_path / 'replica'), backend=backend, durability='strict')
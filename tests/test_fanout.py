@@ -0,0 +1,130 @@
+import pathlib
+import threading
+import unittest.mock
+
+from src.fanout import FanOutSynchronizer
+from src.file import DirFile
+from src.index import SyncIndex
+from src.scanner import scan, scan_paths
+
+
+class TestFanOutSynchronizer:
+    def get_synchronizer(self, tmp_path: pathlib.Path) -> FanOutSynchronizer:
+        source = tmp_path / 'source'
+        (source / 'dir').mkdir(parents=True)
+        (source / 'dir' / 'file.txt').write_text('content')
+        (source / 'moved.txt').write_text('moved')
+        (source / 'deleted.txt').write_text('deleted')
+        replicas = [tmp_path / f'replica_{index}' for index in range(3)]
+
+        return FanOutSynchronizer(
+            DirFile(source),
+            [DirFile(replica) for replica in replicas],
+            indexes=[SyncIndex(tmp_path / f'index_{index}.sqlite') for index in range(3)],
+            workers=2
+        )
+
+    def test_sync(self, tmp_path: pathlib.Path):
+        synchronizer = self.get_synchronizer(tmp_path)
+        source = synchronizer.source.path
+        with unittest.mock.patch('src.fanout.scan', wraps=scan) as scan_mock:
+            synchronizer.initialize()
+
+        scan_mock.assert_called_once()
+        (source / 'dir' / 'file.txt').write_text('new content')
+        (source / 'moved.txt').rename(source / 'dir' / 'moved.txt')
+        (source / 'deleted.txt').unlink()
+        (source / 'new.txt').write_text('new')
+
+        synchronizer.sync()
+
+        assert synchronizer.metrics.last['counters']['files_copied'] == 2 * 3
+        for replica in synchronizer.replicas:
+            assert (replica.replica.path / 'dir' / 'file.txt').read_text() == 'new content'
+            assert (replica.replica.path / 'dir' / 'moved.txt').read_text() == 'moved'
+            assert (replica.replica.path / 'new.txt').read_text() == 'new'
+            assert not (replica.replica.path / 'deleted.txt').exists()
+            assert set(replica.index.load()) == {'.', 'dir', 'dir/file.txt', 'dir/moved.txt', 'new.txt'}
+            assert replica.index.load()['new.txt'].digest is not None
+        synchronizer.close()
+
+    def test_sync_failed_replica(self, tmp_path: pathlib.Path):
+        synchronizer = self.get_synchronizer(tmp_path)
+        synchronizer.initialize()
+        (synchronizer.source.path / 'new.txt').write_text('new')
+        failed = synchronizer.replicas[1]
+
+        with unittest.mock.patch.object(failed, 'sync_files', side_effect=OSError):
+            synchronizer.sync()
+
+        assert not (failed.replica.path / 'new.txt').exists()
+        for replica in (synchronizer.replicas[0], synchronizer.replicas[2]):
+            assert (replica.replica.path / 'new.txt').read_text() == 'new'
+
+        synchronizer.sync()
+
+        assert (failed.replica.path / 'new.txt').read_text() == 'new'
+        synchronizer.close()
+
+
+    def test_sync_paths_single_cycle(self, tmp_path: pathlib.Path):
+        synchronizer = self.get_synchronizer(tmp_path)
+        synchronizer.initialize()
+        (synchronizer.source.path / 'new.txt').write_text('new')
+        cycles = synchronizer.metrics.cycles
+
+        with unittest.mock.patch.object(synchronizer.metrics, 'finish', wraps=synchronizer.metrics.finish) as finish_mock:
+            synchronizer.sync_paths([synchronizer.source.path / 'new.txt'])
+
+        finish_mock.assert_called_once()
+        assert synchronizer.metrics.cycles == cycles + 1
+        assert synchronizer.metrics.last['kind'] == 'sync_paths'
+        assert synchronizer.metrics.last['counters']['files_copied'] == 3
+        for replica in synchronizer.replicas:
+            assert (replica.replica.path / 'new.txt').read_text() == 'new'
+        synchronizer.close()
+
+    def test_sync_independent_replicas(self, tmp_path: pathlib.Path):
+        synchronizer = self.get_synchronizer(tmp_path)
+        synchronizer.initialize()
+        (synchronizer.source.path / 'new.txt').write_text('new')
+        slow = synchronizer.replicas[1]
+        others_written = threading.Event()
+        sync_files = slow.sync_files
+
+        def slow_sync_files(files):
+            others_written.wait(5)
+            sync_files(files)
+
+        def commit_index(commit):
+            commit()
+            if all((other.replica.path / 'new.txt').exists() for other in synchronizer.replicas if other is not slow):
+                others_written.set()
+
+        for replica in synchronizer.replicas:
+            if replica is not slow:
+                replica.commit_index = lambda commit=replica.commit_index: commit_index(commit)
+        with unittest.mock.patch.object(slow, 'sync_files', slow_sync_files):
+            synchronizer.sync()
+
+        assert others_written.is_set()
+        assert (slow.replica.path / 'new.txt').read_text() == 'new'
+        synchronizer.close()
+
+    def test_sync_paths_scanned_once(self, tmp_path: pathlib.Path):
+        synchronizer = self.get_synchronizer(tmp_path)
+        synchronizer.initialize()
+        source = synchronizer.source.path
+        (source / 'dir' / 'new.txt').write_text('new')
+        (source / 'deleted.txt').unlink()
+
+        with unittest.mock.patch('src.fanout.scan_paths', wraps=scan_paths) as scan_mock, \
+                unittest.mock.patch('src.synchronizer.scan_paths') as replica_scan_mock:
+            synchronizer.sync_paths([source / 'dir' / 'new.txt', source / 'deleted.txt'])
+
+        scan_mock.assert_called_once()
+        replica_scan_mock.assert_not_called()
+        for replica in synchronizer.replicas:
+            assert (replica.replica.path / 'dir' / 'new.txt').read_text() == 'new'
+            assert not (replica.replica.path / 'deleted.txt').exists()
+        synchronizer.close()
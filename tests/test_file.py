@@ -1,32 +1,29 @@
+import os
 import unittest.mock
 import pathlib
 
-from src.file import DirFile, TextFile
+import src.settings as settings
+from src.file import DirFile, Snapshot, TextFile
 
 
 class TestDirFile:
     def get_dir_file(self):
         return DirFile(pathlib.Path('./test').resolve())
 
-    @unittest.mock.patch('pathlib.Path.stat')
-    @unittest.mock.patch('pathlib.Path.is_dir')
-    @unittest.mock.patch('pathlib.Path.iterdir')
-    def test_update_children(
-            self,
-            iterdir_mock: unittest.mock.MagicMock,
-            is_dir_mock: unittest.mock.MagicMock,
-            stats_mock: unittest.mock.MagicMock
-    ):
-        is_dir_mock.return_value = True
-        iterdir_mock.return_value = [pathlib.Path('test/test')]
+    def test_update_children(self, tmp_path: pathlib.Path):
+        (tmp_path / 'test').mkdir()
+        (tmp_path / 'test.txt').write_text('content')
 
-        dir_file = self.get_dir_file()
+        dir_file = DirFile(tmp_path)
         dir_file.update_children()
         dir_file.update_children()
 
-        assert len(dir_file.children) == 1
-        assert str(dir_file.children[0].path) == 'test/test'
-        stats_mock.assert_called_once()
+        children = sorted(dir_file.children, key=lambda child: child.path)
+        assert len(children) == 2
+        assert isinstance(children[0], DirFile) and children[0].path == tmp_path / 'test'
+        assert isinstance(children[1], TextFile) and children[1].path == tmp_path / 'test.txt'
+        assert children[1].snapshot == Snapshot.from_stat((tmp_path / 'test.txt').stat())
+        assert children[1].get_id() == (tmp_path / 'test.txt').stat().st_ino
 
     @unittest.mock.patch('pathlib.Path.mkdir')
     def test_create(
@@ -53,15 +50,43 @@ class TestTextFile:
     def get_text_file(self):
         return TextFile(pathlib.Path('../test_replica/dsdddd').resolve())
 
-    @unittest.mock.patch('pathlib.Path.write_text')
+    @unittest.mock.patch('pathlib.Path.touch')
+    @unittest.mock.patch('src.file.copy_file')
     def test_create(
             self,
-            write_text_mock: unittest.mock.MagicMock
+            copy_file_mock: unittest.mock.MagicMock,
+            touch_mock: unittest.mock.MagicMock
     ):
         text_file = self.get_text_file()
         text_file.create()
 
-        write_text_mock.assert_called_once_with(text_file.content)
+        touch_mock.assert_called_once()
+        copy_file_mock.assert_not_called()
+
+        text_file.origin = pathlib.Path('source.txt')
+        text_file.create()
+
+        copy_file_mock.assert_called_once_with(text_file.origin, text_file.path, digest=None, throttle=None, fsync=False)
+        assert text_file.digest is None
+
+        copy_file_mock.reset_mock()
+        text_file.compute_digest = True
+        text_file.create()
+
+        copy_file_mock.assert_called_once_with(text_file.origin, text_file.path, digest=unittest.mock.ANY, throttle=None, fsync=False)
+        assert text_file.digest is not None
+
+    @unittest.mock.patch('pathlib.Path.stat')
+    def test_get_snapshot(
+            self,
+            stats_mock: unittest.mock.MagicMock
+    ):
+        stats_mock.return_value = unittest.mock.MagicMock(st_size=5, st_mtime_ns=2, st_ctime_ns=3, st_ino=4, st_nlink=2)
+
+        text_file = self.get_text_file()
+
+        assert text_file.get_snapshot() == Snapshot(5, 2, 3, 4, 2)
+        assert text_file.snapshot == Snapshot(5, 2, 3, 4, 2)
 
     @unittest.mock.patch('pathlib.Path.unlink')
     def test_remove(
@@ -72,3 +97,34 @@ class TestTextFile:
         text_file.remove()
 
         unlink_mock.assert_called_once()
+
+    def test_move(self, tmp_path: pathlib.Path):
+        (tmp_path / 'file.txt').write_text('content')
+        inode = (tmp_path / 'file.txt').stat().st_ino
+        text_file = TextFile(tmp_path / 'file.txt')
+
+        text_file.move(tmp_path / 'dir' / 'moved.txt')
+
+        assert text_file.path == tmp_path / 'dir' / 'moved.txt'
+        assert text_file.path.stat().st_ino == inode
+        assert not (tmp_path / 'file.txt').exists()
+
+    def test_create_delta(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source.bin'
+        content = bytearray(os.urandom(4 * 1024 * 1024))
+        source.write_bytes(content)
+        text_file = TextFile(tmp_path / 'replica.bin')
+        text_file.origin = source
+        text_file.delta_threshold = 1024
+        text_file.create()
+
+        assert text_file.blocks is None
+
+        content[0] ^= 0xff
+        source.write_bytes(content)
+        with unittest.mock.patch('src.file.copy_file') as copy_file_mock:
+            text_file.create()
+
+        copy_file_mock.assert_not_called()
+        assert len(text_file.blocks) == len(content) // settings.DELTA_BLOCK_SIZE
+        assert text_file.path.read_bytes() == content
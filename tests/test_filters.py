@@ -0,0 +1,126 @@
+import os
+import pathlib
+import time
+import unittest.mock
+
+import pytest
+
+from src.file import DirFile
+from src.filters import FileFilter, collect_rules
+from src.scanner import scan
+from src.synchronizer import Synchronizer
+
+
+class TestFileFilter:
+    @pytest.mark.parametrize('rules, path, is_dir, accepted', [
+        (['node_modules/'], 'node_modules', True, False),
+        (['node_modules/'], 'app/node_modules', True, False),
+        (['node_modules/'], 'node_modules', False, True),
+        (['*.tmp'], 'a/b/file.tmp', False, False),
+        (['*.tmp'], 'a/b/file.tmpx', False, True),
+        (['/build'], 'build', True, False),
+        (['/build'], 'src/build', True, True),
+        (['docs/*.md'], 'docs/index.md', False, False),
+        (['docs/*.md'], 'docs/api/index.md', False, True),
+        (['**/cache/**'], 'a/cache/b/c.txt', False, False),
+        (['a/**/z'], 'a/z', False, False),
+        (['a/**/z'], 'a/b/c/z', False, False),
+        (['file?.[ch]'], 'file1.c', False, False),
+        (['file[!0-9].c'], 'file1.c', False, True),
+        (['*.log', '!keep.log'], 'keep.log', False, True),
+        (['!keep.log', '*.log'], 'keep.log', False, False),
+        (['\\#notes', '# comment'], '#notes', False, False),
+    ])
+    def test_accepts_path(self, rules: list[str], path: str, is_dir: bool, accepted: bool):
+        root = pathlib.Path('/source')
+        file_filter = FileFilter(root, rules)
+
+        assert file_filter.accepts_path(root / path, is_dir) is accepted
+
+    def test_accepts_file(self):
+        now = time.time_ns()
+        file_filter = FileFilter(pathlib.Path('/source'), min_size=10, max_size=100, min_age=60, max_age=3600)
+
+        assert file_filter.accepts_file(50, now - 120 * 10 ** 9)
+        assert not file_filter.accepts_file(5, now - 120 * 10 ** 9)
+        assert not file_filter.accepts_file(500, now - 120 * 10 ** 9)
+        assert not file_filter.accepts_file(50, now)
+        assert not file_filter.accepts_file(50, now - 7200 * 10 ** 9)
+        assert FileFilter.create(pathlib.Path('/source')) is None
+
+    def test_collect_rules(self, tmp_path: pathlib.Path):
+        (tmp_path / '.syncignore').write_text('# build output\n\nbuild/\n*.o\n')
+
+        assert collect_rules(tmp_path / '.syncignore', ['*.tmp'], ['main.o']) == ['build/', '*.o', '*.tmp', '!main.o']
+
+    def test_scan(self, tmp_path: pathlib.Path):
+        (tmp_path / 'node_modules' / 'lib').mkdir(parents=True)
+        (tmp_path / 'node_modules' / 'lib' / 'index.js').write_text('content')
+        (tmp_path / 'src').mkdir()
+        (tmp_path / 'src' / 'main.py').write_text('content')
+        (tmp_path / 'src' / 'main.pyc').write_text('content')
+        (tmp_path / 'large.bin').write_bytes(b'x' * 1000)
+        file_filter = FileFilter(tmp_path, ['node_modules/', '*.pyc'], max_size=100)
+        listed = []
+        scandir = os.scandir
+
+        def listing_scandir(path):
+            listed.append(pathlib.Path(path))
+            return scandir(path)
+
+        with unittest.mock.patch('os.scandir', listing_scandir):
+            files = scan(DirFile(tmp_path), file_filter=file_filter)
+
+        assert sorted(file.path for file in files) == [
+            tmp_path, tmp_path / 'large.bin', tmp_path / 'src', tmp_path / 'src' / 'main.py'
+        ]
+        assert tmp_path / 'node_modules' not in listed
+
+    def test_synchronizer(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        (source / '.git').mkdir(parents=True)
+        (source / '.git' / 'HEAD').write_text('ref')
+        (source / 'file.txt').write_text('content')
+        (source / 'file.tmp').write_text('content')
+        file_filter = FileFilter(source, ['.git/', '*.tmp'])
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica), file_filter=file_filter)
+        synchronizer.initialize()
+
+        assert sorted(path.name for path in replica.iterdir()) == ['file.txt']
+
+        (source / 'other.tmp').write_text('content')
+        (source / 'other.txt').write_text('content')
+        synchronizer.sync_paths([source / 'other.tmp', source / 'other.txt'])
+        synchronizer.close()
+
+        assert sorted(path.name for path in replica.iterdir()) == ['file.txt', 'other.txt']
+
+    def test_synchronizer_limits(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        source.mkdir()
+        (source / 'file.txt').write_text('content')
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica))
+        synchronizer.initialize()
+        synchronizer.close()
+
+        old = time.time() - 3600
+        os.utime(source / 'file.txt', (old, old))
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica), file_filter=FileFilter(source, min_age=60))
+        synchronizer.initialize()
+        (source / 'file.txt').write_text('changed')
+        (source / 'new.txt').write_text('new')
+        synchronizer.sync()
+        synchronizer.sync_paths([source / 'file.txt', source / 'new.txt'])
+
+        assert sorted(path.name for path in replica.iterdir()) == ['file.txt']
+        assert (replica / 'file.txt').read_text() == 'content'
+
+        for name in ('file.txt', 'new.txt'):
+            os.utime(source / name, (old, old))
+        synchronizer.sync()
+        synchronizer.close()
+
+        assert (replica / 'file.txt').read_text() == 'changed'
+        assert (replica / 'new.txt').read_text() == 'new'
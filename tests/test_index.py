@@ -0,0 +1,64 @@
+import pathlib
+
+from src.index import IndexEntry, SyncIndex
+
+
+class TestSyncIndex:
+    def test_for_replica(self, tmp_path: pathlib.Path):
+        index = SyncIndex.for_replica(tmp_path / 'replica')
+
+        assert index.path == tmp_path / '.replica.index.sqlite'
+        assert index.path.exists()
+        index.close()
+
+    def test_put_load(self, tmp_path: pathlib.Path):
+        index = SyncIndex(tmp_path / 'index.sqlite')
+        entry = IndexEntry('dir/file.txt', 2, 10, 100, b'digest', False)
+        index.put(IndexEntry('dir', 1, 0, 100, None, True))
+        index.put(entry)
+        index.close()
+
+        index = SyncIndex(tmp_path / 'index.sqlite')
+        entries = index.load()
+
+        assert entries == {
+            'dir': IndexEntry('dir', 1, 0, 100, None, True),
+            'dir/file.txt': entry,
+        }
+
+        index.put(entry._replace(size=20))
+        assert index.load()['dir/file.txt'].size == 20
+        index.close()
+
+    def test_read_only(self, tmp_path: pathlib.Path):
+        index = SyncIndex(tmp_path / 'index.sqlite')
+        index.put(IndexEntry('file.txt', 1, 10, 100, None, False))
+        index.close()
+
+        index = SyncIndex(tmp_path / 'index.sqlite', read_only=True)
+
+        assert set(index.load()) == {'file.txt'}
+        index.close()
+        assert [path.name for path in tmp_path.iterdir()] == ['index.sqlite']
+
+    def test_delete(self, tmp_path: pathlib.Path):
+        index = SyncIndex(tmp_path / 'index.sqlite')
+        for path in ('dir', 'dir/file.txt', 'dir/sub/file.txt', 'dir0', 'dir.txt', 'other'):
+            index.put(IndexEntry(path, 1, 0, 0, None, False))
+
+        index.delete('dir')
+
+        assert set(index.load()) == {'dir0', 'dir.txt', 'other'}
+        index.close()
+
+    def test_move(self, tmp_path: pathlib.Path):
+        index = SyncIndex(tmp_path / 'index.sqlite')
+        for path in ('dir', 'dir/file.txt', 'dir/sub/file.txt', 'dir0', 'new'):
+            index.put(IndexEntry(path, 1, 0, 0, None, False))
+
+        index.move('dir', 'new')
+
+        entries = index.load()
+        assert set(entries) == {'new', 'new/file.txt', 'new/sub/file.txt', 'dir0'}
+        assert entries['new/sub/file.txt'].path == 'new/sub/file.txt'
+        index.close()
@@ -0,0 +1,49 @@
+import logging
+import pathlib
+import threading
+
+import pytest
+
+from src.logs import file_log, setup_logging
+
+
+class TestLogs:
+    @pytest.fixture(autouse=True)
+    def restore_root_logger(self):
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+        yield
+        root.handlers = handlers
+        root.setLevel(level)
+        file_log.setLevel(logging.NOTSET)
+
+    @pytest.mark.parametrize('summary', [False, True])
+    def test_setup_logging(self, tmp_path: pathlib.Path, summary: bool):
+        log_file = tmp_path / 'console.log'
+        listener = setup_logging('INFO', log_file, summary=summary)
+        writer = threading.Thread(target=lambda: file_log.info('Creating file from path: %s', tmp_path / 'file.txt'))
+        writer.start()
+        writer.join()
+        logging.info('Finished sync')
+        logging.debug('Hidden %s', 'message')
+        listener.stop()
+
+        content = log_file.read_text()
+        assert '[ INFO ] - Finished sync' in content
+        assert ('Creating file from path' in content) is not summary
+        assert 'Hidden' not in content
+
+    def test_lazy_formatting(self, tmp_path: pathlib.Path):
+        listener = setup_logging('INFO', tmp_path / 'console.log', summary=True)
+
+        class Path:
+            formatted = False
+
+            def __str__(self):
+                Path.formatted = True
+                return 'path'
+
+        file_log.info('Creating file from path: %s', Path())
+        listener.stop()
+
+        assert not Path.formatted
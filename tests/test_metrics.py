@@ -0,0 +1,79 @@
+import json
+import pathlib
+import urllib.request
+
+import pytest
+
+from src.file import DirFile
+from src.metrics import Metrics, MetricsExporter, MetricsServer
+from src.synchronizer import Synchronizer
+
+
+class TestMetrics:
+    def test_cycle(self, tmp_path: pathlib.Path):
+        metrics = Metrics(pathlib.Path('/source'), pathlib.Path('/replica'), interval=30)
+        exporter = MetricsExporter(tmp_path / 'metrics.prom', tmp_path / 'metrics.jsonl')
+        exporter.register(metrics)
+
+        with metrics.cycle('sync'):
+            with metrics.phase('scan'):
+                metrics.count('files_scanned', 3)
+            metrics.queue_depth('pool', 4)
+            metrics.queue_depth('pool', 2)
+        with pytest.raises(OSError):
+            with metrics.cycle('sync'):
+                metrics.count('files_scanned', 2)
+                raise OSError
+
+        summaries = [json.loads(line) for line in (tmp_path / 'metrics.jsonl').read_text().splitlines()]
+        assert [summary['failed'] for summary in summaries] == [False, True]
+        assert summaries[0]['counters'] == {'files_scanned': 3}
+        assert summaries[0]['queues'] == {'pool': 4}
+        assert set(summaries[0]['phases']) == {'scan'}
+        assert summaries[1]['counters'] == {'files_scanned': 2, 'errors': 1}
+        assert summaries[1]['interval'] == 30
+
+        text = (tmp_path / 'metrics.prom').read_text()
+        assert 'sync_cycles_total{source="/source",replica="/replica"} 2' in text
+        assert 'sync_files_scanned_total{source="/source",replica="/replica"} 5' in text
+        assert 'sync_errors_total{source="/source",replica="/replica"} 1' in text
+        assert 'sync_interval_seconds{source="/source",replica="/replica"} 30' in text
+        assert '# TYPE sync_last_cycle_seconds gauge' in text
+
+    def test_render_escapes_labels(self):
+        metrics = Metrics(pathlib.Path('/source "a"'), 'C:\\replica')
+        exporter = MetricsExporter()
+        exporter.register(metrics)
+
+        assert 'sync_cycles_total{source="/source \\"a\\"",replica="C:\\\\replica"} 0' in exporter.render()
+
+    def test_synchronizer_metrics(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        (source / 'dir').mkdir(parents=True)
+        (source / 'dir' / 'file.txt').write_text('content')
+        (source / 'moved.txt').write_text('moved')
+        synchronizer = Synchronizer(DirFile(source), DirFile(tmp_path / 'replica'))
+        synchronizer.initialize()
+
+        assert synchronizer.metrics.last['counters']['bytes_written'] == 12
+        assert synchronizer.metrics.last['counters']['bytes_planned'] == 12
+        (source / 'moved.txt').rename(source / 'dir' / 'moved.txt')
+        (source / 'dir' / 'file.txt').unlink()
+        synchronizer.sync()
+
+        summary = synchronizer.metrics.last
+        assert summary['kind'] == 'sync'
+        assert summary['counters'] == {'files_scanned': 3, 'bytes_planned': 0, 'files_moved': 1, 'files_removed': 1}
+        assert set(summary['phases']) == {'scan', 'diff', 'move', 'delete', 'copy', 'commit'}
+        synchronizer.close()
+
+    def test_server(self):
+        metrics = Metrics(pathlib.Path('/source'), pathlib.Path('/replica'))
+        exporter = MetricsExporter()
+        exporter.register(metrics)
+        server = MetricsServer(exporter, 0)
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{server.port}/metrics') as response:
+                assert 'sync_cycles_total' in response.read().decode()
+        finally:
+            server.close()
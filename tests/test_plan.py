@@ -0,0 +1,136 @@
+import pathlib
+
+from src.file import DirFile
+from src.index import SyncIndex
+from src.plan import SyncPlan
+from src.scanner import scan
+from src.synchronizer import Synchronizer
+
+
+class TestSyncPlan:
+    def test_order(self):
+        replica = pathlib.Path('/replica')
+        plan = SyncPlan(replica)
+        plan.add('copy', replica / 'b.txt', 10, inode=9)
+        plan.add('mkdir', replica / 'dir')
+        plan.add('copy', replica / 'a.txt', 5, inode=3)
+        plan.add('delete', replica / 'old.txt')
+        plan.add('mkdir', replica / 'dir' / 'sub')
+        plan.add('rename', replica / 'new', source=replica / 'old')
+        plan.add('keep', replica / 'kept.txt', inode=5)
+
+        plan.order()
+
+        assert [operation.path.name for operation in plan.operations] == [
+            'new', 'old.txt', 'dir', 'sub', 'a.txt', 'kept.txt', 'b.txt'
+        ]
+        assert plan.bytes == 15
+        assert len(plan.changes) == 6
+        assert plan.summary() == {'rename': 1, 'delete': 1, 'mkdir': 2, 'copy': 2, 'keep': 1}
+
+        lines = plan.format().splitlines()
+        assert lines[0].split() == ['rename', 'old', '->', 'new']
+        assert lines[-1] == (
+            'Plan for /replica: 6 changes (rename 1, delete 1, mkdir 2, copy 2), 15 bytes, 1 files up to date'
+        )
+
+    def test_plan_initialize(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        (source / 'dir').mkdir(parents=True)
+        (source / 'dir' / 'file.txt').write_text('content')
+        (source / 'changed.txt').write_text('content')
+
+        index = SyncIndex.for_replica(replica)
+        Synchronizer(DirFile(source), DirFile(replica), index=index).initialize()
+
+        (source / 'changed.txt').write_text('new content')
+        (source / 'new.txt').write_text('new')
+        (replica / 'untracked.txt').write_text('content')
+
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica), index=index)
+        plan = synchronizer.plan_initialize(scan(synchronizer.source))
+
+        assert sorted((operation.kind, operation.path.name, operation.size) for operation in plan.changes) == [
+            ('copy', 'changed.txt', 11), ('copy', 'new.txt', 3), ('delete', 'untracked.txt', 0)
+        ]
+        assert (replica / 'untracked.txt').exists()
+        assert not (replica / 'new.txt').exists()
+
+        synchronizer.execute_plan(plan)
+
+        assert sorted(path.name for path in replica.iterdir()) == ['changed.txt', 'dir', 'new.txt']
+        assert (replica / 'changed.txt').read_text() == 'new content'
+        synchronizer.close()
+
+    def test_plan_changes(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        (source / 'dir').mkdir(parents=True)
+        (source / 'dir' / 'file.txt').write_text('content')
+        (source / 'deleted.txt').write_text('content')
+        (source / 'changed.txt').write_text('content')
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica))
+        synchronizer.initialize()
+
+        (source / 'dir').rename(source / 'moved')
+        (source / 'deleted.txt').unlink()
+        (source / 'changed.txt').write_text('new content')
+        (source / 'new').mkdir()
+
+        saved_files_ids = set(synchronizer.tracked_files)
+        files = scan(synchronizer.source)
+        for file in files:
+            synchronizer.save_tracked_file(file)
+        plan = synchronizer.plan_changes(saved_files_ids, {file.get_id() for file in files})
+
+        assert [(operation.kind, operation.path.name) for operation in plan.changes] == [
+            ('rename', 'moved'), ('delete', 'deleted.txt'), ('mkdir', 'new'), ('copy', 'changed.txt')
+        ]
+        assert [file.source.path for file in plan.changes[0].descendants] == [source / 'moved' / 'file.txt']
+        assert plan.bytes == 11
+        assert (replica / 'dir' / 'file.txt').exists()
+
+        synchronizer.execute_plan(plan)
+
+        assert sorted(str(path.relative_to(replica)) for path in replica.rglob('*')) == [
+            'changed.txt', 'moved', 'moved/file.txt', 'new'
+        ]
+        assert (replica / 'changed.txt').read_text() == 'new content'
+
+    def test_plan_changes_nested_renames(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        (source / 'dir' / 'sub').mkdir(parents=True)
+        for name in ('a.txt', 'b.txt', 'sub/c.txt', 'sub/d.txt'):
+            (source / 'dir' / name).write_text(name)
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica))
+        synchronizer.initialize()
+
+        (source / 'dir').rename(source / 'moved')
+        (source / 'moved' / 'sub').rename(source / 'moved' / 'renamed')
+        (source / 'moved' / 'b.txt').rename(source / 'b.txt')
+
+        saved_files_ids = set(synchronizer.tracked_files)
+        files = scan(synchronizer.source)
+        for file in files:
+            synchronizer.save_tracked_file(file)
+        plan = synchronizer.plan_changes(saved_files_ids, {file.get_id() for file in files})
+
+        renames = {operation.source.name: operation for operation in plan.of_kind('rename')}
+        assert {name: operation.path.name for name, operation in renames.items()} == {
+            'b.txt': 'b.txt', 'dir': 'moved', 'sub': 'renamed'
+        }
+        assert [file.source.path.name for file in renames['dir'].descendants] == ['a.txt']
+        assert sorted(file.source.path.name for file in renames['sub'].descendants) == ['c.txt', 'd.txt']
+        assert 'rename dir/sub -> moved/renamed (with 2 files below)'.split() in [
+            line.split() for line in plan.format().splitlines()
+        ]
+
+        synchronizer.execute_plan(plan)
+
+        assert sorted(str(path.relative_to(replica)) for path in replica.rglob('*')) == [
+            'b.txt', 'moved', 'moved/a.txt', 'moved/renamed', 'moved/renamed/c.txt', 'moved/renamed/d.txt'
+        ]
+        assert all(file.replica.path.exists() for file in synchronizer.tracked_files.values())
+        synchronizer.close()
@@ -0,0 +1,73 @@
+import concurrent.futures
+import threading
+import unittest.mock
+
+import pytest
+
+from src.pool import TaskPool
+
+
+class TestTaskPool:
+    def test_submit_inline(self):
+        pool = TaskPool(1)
+        callback = unittest.mock.MagicMock()
+
+        pool.submit(lambda value: value * 2, 2, callback=callback)
+
+        callback.assert_called_once_with(4)
+        assert pool.executor is None
+        pool.close()
+
+    def test_submit_threads(self):
+        pool = TaskPool(4, max_pending=2)
+        threads = set()
+        results = []
+
+        def task(value):
+            threads.add(threading.current_thread().name)
+            return value
+
+        for value in range(20):
+            pool.submit(task, value, callback=results.append)
+            assert len(pool.pending) <= 2
+        pool.wait()
+
+        assert sorted(results) == list(range(20))
+        assert all(name.startswith('sync-worker') for name in threads)
+        pool.close()
+
+    def test_callback_runs_in_submitting_thread(self):
+        pool = TaskPool(2)
+        callback_threads = []
+
+        pool.submit(lambda: None, callback=lambda _: callback_threads.append(threading.current_thread()))
+        pool.wait()
+
+        assert callback_threads == [threading.current_thread()]
+        pool.close()
+
+    def test_failure(self):
+        pool = TaskPool(2)
+
+        pool.submit(lambda: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            pool.wait()
+
+        assert pool.pending == {}
+        pool.close()
+
+    def test_shared_executor(self):
+        executor = concurrent.futures.ThreadPoolExecutor(2)
+        first = TaskPool(2, executor=executor)
+        second = TaskPool(2, executor=executor)
+        results = []
+
+        first.submit(lambda: 1, callback=results.append)
+        second.submit(lambda: 2, callback=results.append)
+        first.close()
+        second.wait()
+
+        assert sorted(results) == [1, 2]
+        assert executor.submit(lambda: 3).result() == 3
+        second.close()
+        executor.shutdown()
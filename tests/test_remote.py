@@ -0,0 +1,187 @@
+import os
+import pathlib
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+import unittest.mock
+
+import pytest
+
+from src.file import DirFile, TextFile
+from src.remote import RemoteBackend, ReplicaServer, parse_address
+from src.synchronizer import Synchronizer
+from src.transfer import hash_file
+
+import src.settings as settings
+
+
+@pytest.fixture
+def server(tmp_path: pathlib.Path):
+    server = ReplicaServer(tmp_path / 'served', f'unix://{tmp_path / "replica.sock"}', token='secret')
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.close()
+    thread.join()
+
+
+def connect(server: ReplicaServer, tmp_path: pathlib.Path) -> RemoteBackend:
+    return RemoteBackend(server.address, tmp_path / 'replica', token='secret')
+
+
+class TestRemoteBackend:
+    def test_operations(self, server: ReplicaServer, tmp_path: pathlib.Path):
+        origin = tmp_path / 'origin.txt'
+        origin.write_bytes(b'content' * 1000)
+        os.chmod(origin, 0o640)
+        os.utime(origin, ns=(1, 2_000_000_000))
+        backend = connect(server, tmp_path)
+        replica = tmp_path / 'replica'
+        served = tmp_path / 'served'
+
+        backend.mkdir(replica / 'dir')
+        replica_file = TextFile(replica / 'dir' / 'file.txt')
+        replica_file.origin = origin
+        replica_file.compute_digest = True
+
+        assert backend.write(replica_file) == 7000
+        assert replica_file.digest == hash_file(origin)
+        assert (served / 'dir' / 'file.txt').read_bytes() == origin.read_bytes()
+        replica_stat = backend.stat(replica / 'dir' / 'file.txt')
+        assert replica_stat == (os.stat(served / 'dir' / 'file.txt').st_mode, 7000, 2_000_000_000, 1)
+        assert replica_stat.mode & 0o777 == 0o640
+        assert [name for name, _ in backend.listdir(replica / 'dir')] == ['file.txt']
+        assert backend.digest(replica / 'dir' / 'file.txt') == hash_file(origin)
+        assert backend.content_equal(replica / 'dir' / 'file.txt', origin)
+
+        backend.rename(replica / 'dir' / 'file.txt', replica / 'new' / 'file.txt')
+        backend.set_mtime(replica / 'new' / 'file.txt', 3_000_000_000)
+        assert backend.stat(replica / 'new' / 'file.txt').mtime_ns == 3_000_000_000
+        assert sorted((root, sorted(dirs), files) for root, dirs, files in backend.walk(replica)) == [
+            (replica, ['dir', 'new'], []), (replica / 'dir', [], []), (replica / 'new', [], ['file.txt'])
+        ]
+
+        backend.delete(replica / 'new', is_dir=True)
+        assert not backend.exists(replica / 'new')
+        with pytest.raises(FileNotFoundError):
+            backend.stat(replica / 'new' / 'file.txt')
+        with pytest.raises(PermissionError):
+            backend.stat(replica / '..' / 'origin.txt')
+        backend.close()
+
+        assert sorted(os.listdir(served)) == ['dir']
+
+    def test_delta_write(self, server: ReplicaServer, tmp_path: pathlib.Path):
+        origin = tmp_path / 'origin.bin'
+        origin.write_bytes(os.urandom(settings.DELTA_BLOCK_SIZE * 4))
+        backend = connect(server, tmp_path)
+        replica_file = TextFile(tmp_path / 'replica' / 'file.bin')
+        replica_file.origin = origin
+        replica_file.delta_threshold = 0
+        backend.write(replica_file)
+        assert replica_file.blocks is None
+
+        with open(origin, 'r+b') as file:
+            file.seek(settings.DELTA_BLOCK_SIZE * 2)
+            file.write(b'changed')
+            file.truncate(settings.DELTA_BLOCK_SIZE * 3 + 10)
+
+        assert backend.write(replica_file) == settings.DELTA_BLOCK_SIZE + 10
+        assert len(replica_file.blocks) == 4
+        assert (tmp_path / 'served' / 'file.bin').read_bytes() == origin.read_bytes()
+
+        origin.write_bytes(origin.read_bytes()[:-10] + b'0123456789')
+        assert backend.write(replica_file) == 10
+        assert (tmp_path / 'served' / 'file.bin').read_bytes() == origin.read_bytes()
+        backend.close()
+
+    def test_flush(self, tmp_path: pathlib.Path):
+        origin = tmp_path / 'origin.txt'
+        origin.write_text('content')
+        server = ReplicaServer(tmp_path / 'served', f'unix://{tmp_path / "replica.sock"}', durability='batch')
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        backend = RemoteBackend(server.address, tmp_path / 'replica')
+        replica_file = TextFile(tmp_path / 'replica' / 'dir' / 'file.txt')
+        replica_file.origin = origin
+
+        assert backend.flush() == 0
+        backend.write(replica_file)
+        assert backend.flush() == 1
+        assert backend.flush() == 0
+        backend.close()
+        server.close()
+        thread.join()
+
+        assert (tmp_path / 'served' / 'dir' / 'file.txt').read_text() == 'content'
+
+    def test_invalid_token(self, server: ReplicaServer, tmp_path: pathlib.Path):
+        with pytest.raises(PermissionError):
+            RemoteBackend(server.address, tmp_path / 'replica', token='wrong')
+
+    def test_oversized_batch(self, server: ReplicaServer, tmp_path: pathlib.Path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(str(tmp_path / 'replica.sock'))
+            connection.settimeout(5)
+            connection.sendall(struct.pack('!II', 1, settings.REMOTE_HELLO_FRAME_SIZE + 1))
+
+            assert connection.recv(1) == b''
+
+        backend = connect(server, tmp_path)
+        backend.mkdir(tmp_path / 'replica' / 'dir')
+        backend.close()
+
+        assert (tmp_path / 'served' / 'dir').is_dir()
+
+    def test_plaintext_warning(self, tmp_path: pathlib.Path):
+        for address, warned in [('tcp://127.0.0.1:0', False), ('tcp://0.0.0.0:0', True)]:
+            with unittest.mock.patch('logging.warning') as warning_mock:
+                server = ReplicaServer(tmp_path / 'served', address, token='secret')
+            server.close()
+
+            assert warning_mock.called == warned
+
+    def test_parse_address(self):
+        assert parse_address('tcp://127.0.0.1:9000')[1] == ('127.0.0.1', 9000)
+        assert parse_address('tcp://[::1]:9000')[1] == ('::1', 9000)
+        assert parse_address('unix:///run/replica.sock')[1] == '/run/replica.sock'
+        with pytest.raises(ValueError):
+            parse_address('replica:9000')
+
+    def test_synchronize(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        for index in range(20):
+            (source / f'dir_{index}').mkdir(parents=True)
+            (source / f'dir_{index}' / 'file.txt').write_text(f'file {index}')
+        served = tmp_path / 'served'
+        (served / 'stale').mkdir(parents=True)
+        address = f'unix://{tmp_path / "replica.sock"}'
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'src.remote', '--root', str(served), '--listen', address],
+            cwd=settings.BASE_DIR
+        )
+        try:
+            while not (tmp_path / 'replica.sock').exists():
+                assert process.poll() is None
+                time.sleep(0.05)
+
+            backend = RemoteBackend(address, tmp_path / 'replica')
+            synchronizer = Synchronizer(DirFile(source), DirFile(tmp_path / 'replica'), workers=4, backend=backend)
+            synchronizer.initialize()
+            (source / 'dir_0' / 'file.txt').rename(source / 'dir_1' / 'moved.txt')
+            (source / 'dir_2' / 'file.txt').write_text('changed content')
+            synchronizer.sync()
+            synchronizer.close()
+        finally:
+            process.terminate()
+            process.wait()
+
+        assert not (served / 'stale').exists()
+        assert not (served / 'dir_0' / 'file.txt').exists()
+        assert (served / 'dir_1' / 'moved.txt').read_text() == 'file 0'
+        assert (served / 'dir_2' / 'file.txt').read_text() == 'changed content'
+        assert (served / 'dir_19' / 'file.txt').read_text() == 'file 19'
+        assert backend.batches < backend.messages
@@ -0,0 +1,69 @@
+import select
+import signal
+import unittest.mock
+
+from src.runtime import Runtime
+
+
+class TestRuntime:
+    def test_run_cycle(self):
+        runtime = Runtime(10)
+        cycle = unittest.mock.MagicMock()
+
+        assert runtime.run_cycle(cycle) is not None
+        cycle.assert_called_once()
+
+        cycle.reset_mock()
+        with runtime._running:
+            assert runtime.run_cycle(cycle) is None
+        cycle.assert_not_called()
+
+        cycle.side_effect = ValueError
+        assert runtime.run_cycle(cycle) is not None
+        runtime.close()
+
+    def test_run(self):
+        runtime = Runtime(0.01)
+        cycles = []
+
+        def cycle():
+            cycles.append(1)
+            if len(cycles) == 3:
+                runtime.stop()
+
+        runtime.run(cycle)
+
+        assert len(cycles) == 3
+        runtime.close()
+
+    @unittest.mock.patch('time.monotonic')
+    def test_run_skips_missed_ticks(self, monotonic_mock: unittest.mock.MagicMock):
+        monotonic_mock.side_effect = [0, 10, 10]
+        runtime = Runtime(10)
+        runtime.run_cycle = unittest.mock.MagicMock(side_effect=lambda cycle: runtime.stop() or 35)
+
+        runtime.run(unittest.mock.MagicMock())
+
+        assert runtime.next_run == 10 + 4 * 10
+        runtime.close()
+
+    def test_run_idle(self):
+        runtime = Runtime(60)
+        idle = unittest.mock.MagicMock(side_effect=lambda timeout: runtime.stop())
+        cycle = unittest.mock.MagicMock()
+
+        runtime.run(cycle, idle=idle)
+
+        idle.assert_called_once()
+        assert 0 < idle.call_args.args[0] <= 60
+        cycle.assert_not_called()
+        runtime.close()
+
+    def test_stop(self):
+        runtime = Runtime(60)
+
+        runtime.stop(signal.SIGTERM)
+
+        assert runtime.stopped.is_set()
+        assert select.select([runtime.wakeup_fd], [], [], 0)[0] == [runtime.wakeup_fd]
+        runtime.close()
@@ -0,0 +1,122 @@
+import os
+import pathlib
+import unittest.mock
+
+from src.file import DirFile, TextFile
+from src.scanner import ScanCache, scan
+
+
+class TestScanner:
+    def test_scan(self, tmp_path: pathlib.Path):
+        (tmp_path / 'a' / 'b').mkdir(parents=True)
+        (tmp_path / 'a' / 'b' / 'file.txt').write_text('content')
+        (tmp_path / 'file.txt').write_text('content')
+
+        files = scan(DirFile(tmp_path))
+        paths = [file.path for file in files]
+
+        assert sorted(paths) == sorted([
+            tmp_path, tmp_path / 'a', tmp_path / 'a' / 'b', tmp_path / 'a' / 'b' / 'file.txt', tmp_path / 'file.txt'
+        ])
+        assert paths.index(tmp_path / 'a') < paths.index(tmp_path / 'a' / 'b')
+        assert paths.index(tmp_path / 'a' / 'b') < paths.index(tmp_path / 'a' / 'b' / 'file.txt')
+        assert all(file.snapshot is not None for file in files)
+        assert all(file.children == [] for file in files if isinstance(file, DirFile))
+
+    def test_scan_text_file(self, tmp_path: pathlib.Path):
+        (tmp_path / 'file.txt').write_text('content')
+
+        files = scan(TextFile(tmp_path / 'file.txt'))
+
+        assert [file.path for file in files] == [tmp_path / 'file.txt']
+        assert files[0].snapshot.size == 7
+
+    def test_scan_deep_tree(self, tmp_path: pathlib.Path):
+        root = DirFile(tmp_path)
+        depth = 5000
+
+        def update_children(self, file_filter=None):
+            self.children = [] if len(self.path.parts) > depth else [DirFile(self.path / 'deep')]
+
+        with unittest.mock.patch('src.file.DirFile.update_children', update_children):
+            with unittest.mock.patch('src.file._File.get_snapshot'):
+                files = scan(root)
+
+        assert len(files) > depth - len(tmp_path.parts)
+
+    @unittest.mock.patch('src.file._File.get_snapshot')
+    @unittest.mock.patch('src.file.DirFile.update_children')
+    def test_scan_disappeared_dir(
+            self,
+            update_children_mock: unittest.mock.MagicMock,
+            get_snapshot_mock: unittest.mock.MagicMock
+    ):
+        update_children_mock.side_effect = FileNotFoundError
+        root = DirFile(pathlib.Path('missing'))
+
+        assert scan(root) == [root]
+        assert root.children == []
+
+    def test_scan_dangling_symlink(self, tmp_path: pathlib.Path):
+        (tmp_path / 'dir').mkdir()
+        for name in ('a.txt', 'b.txt'):
+            (tmp_path / 'dir' / name).write_text(name)
+        (tmp_path / 'dir' / 'dangling').symlink_to(tmp_path / 'missing')
+
+        files = scan(DirFile(tmp_path))
+
+        assert sorted(file.path for file in files) == [
+            tmp_path, tmp_path / 'dir', tmp_path / 'dir' / 'a.txt', tmp_path / 'dir' / 'b.txt'
+        ]
+
+    def test_scan_cache(self, tmp_path: pathlib.Path):
+        (tmp_path / 'a' / 'b').mkdir(parents=True)
+        (tmp_path / 'a' / 'b' / 'file.txt').write_text('content')
+        (tmp_path / 'a' / 'file.txt').write_text('content')
+        for path in (tmp_path, tmp_path / 'a', tmp_path / 'a' / 'b'):
+            os.utime(path, ns=(0, 10 ** 9))
+        cache = ScanCache()
+
+        first = scan(DirFile(tmp_path), cache)
+        assert (cache.listed, cache.reused) == (3, 0)
+
+        (tmp_path / 'a' / 'file.txt').write_text('new content')
+        (tmp_path / 'a' / 'b' / 'new.txt').write_text('content')
+        listed = []
+        update_children = DirFile.update_children
+
+        def listing_update_children(self, file_filter=None):
+            listed.append(self.path)
+            update_children(self, file_filter)
+
+        with unittest.mock.patch('src.file.DirFile.update_children', listing_update_children):
+            second = scan(DirFile(tmp_path), cache)
+
+        assert listed == [tmp_path / 'a' / 'b']
+        assert (cache.listed, cache.reused) == (1, 2)
+        assert sorted(file.path for file in second) == sorted([file.path for file in first] + [tmp_path / 'a' / 'b' / 'new.txt'])
+        assert next(file for file in second if file.path == tmp_path / 'a' / 'file.txt').snapshot.size == 11
+        assert tmp_path / 'a' / 'b' not in cache.listings
+
+    def test_scan_cache_trust_files(self, tmp_path: pathlib.Path):
+        (tmp_path / 'file.txt').write_text('content')
+        (tmp_path / 'sub').mkdir()
+        for path in (tmp_path, tmp_path / 'sub'):
+            os.utime(path, ns=(0, 10 ** 9))
+        cache = ScanCache(trust_files=True)
+        scan(DirFile(tmp_path), cache)
+
+        (tmp_path / 'file.txt').write_text('new content')
+        (tmp_path / 'sub' / 'new.txt').write_text('content')
+        files = scan(DirFile(tmp_path), cache)
+
+        assert next(file for file in files if file.path == tmp_path / 'file.txt').snapshot.size == 7
+        assert files[-1].path == tmp_path / 'sub' / 'new.txt'
+        assert (cache.listed, cache.reused) == (1, 1)
+
+        (tmp_path / 'dir').mkdir()
+        (tmp_path / 'dir').rmdir()
+        os.utime(tmp_path, ns=(0, 2 * 10 ** 9))
+        files = scan(DirFile(tmp_path), cache)
+
+        assert next(file for file in files if file.path == tmp_path / 'file.txt').snapshot.size == 11
@@ -0,0 +1,96 @@
+import os
+import pathlib
+import time
+
+from src.file import DirFile
+from src.index import IndexEntry, SyncIndex
+from src.scrubber import Scrubber
+from src.synchronizer import Synchronizer
+from src.transfer import hash_file
+
+import src.settings as settings
+
+
+class TestScrubber:
+    def test_run(self, tmp_path: pathlib.Path):
+        replica = tmp_path / 'replica'
+        replica.mkdir()
+        index = SyncIndex(tmp_path / 'index.sqlite')
+        for name in ('a', 'b', 'c', 'd'):
+            (replica / name).write_text('0123456789')
+            index.put(IndexEntry(name, 0, 10, 0, hash_file(replica / name), False))
+        (replica / 'c').write_text('corrupted!')
+
+        index.set_state('scrub_time', str(time.time() - 600))
+        result = Scrubber(index, replica, 1200).run()
+
+        assert (result.files, result.bytes, result.mismatches) == (2, 20, [])
+        assert index.get_state('scrub_cursor') == 'b'
+
+        index.set_state('scrub_time', str(time.time() - 600))
+        result = Scrubber(index, replica, 1200).run()
+
+        assert (result.files, result.mismatches) == (2, ['c'])
+
+        index.set_state('scrub_time', str(time.time() - 600))
+        result = Scrubber(index, replica, 600).run()
+
+        assert result.files == 4
+        assert index.get_state('scrub_cursor') == 'd'
+
+        index.set_state('scrub_time', str(time.time() - 600))
+        result = Scrubber(index, replica, 100).run()
+
+        assert result.files == 4
+        assert index.get_state('scrub_cursor') == 'd'
+        index.close()
+
+    def test_repair(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        (source / 'dir').mkdir(parents=True)
+        (source / 'dir' / 'file.txt').write_text('content')
+        (source / 'other.txt').write_text('other')
+        index = SyncIndex(tmp_path / 'index.sqlite')
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica), index=index, scrub_period=600)
+        synchronizer.initialize()
+
+        replica_stat = (replica / 'dir' / 'file.txt').stat()
+        (replica / 'dir' / 'file.txt').write_text('CONTENT')
+        os.utime(replica / 'dir' / 'file.txt', ns=(replica_stat.st_atime_ns, replica_stat.st_mtime_ns))
+        index.set_state('scrub_time', str(time.time() - 600))
+        synchronizer.sync()
+
+        assert (replica / 'dir' / 'file.txt').read_text() == 'content'
+        counters = synchronizer.metrics.last['counters']
+        assert (counters['files_scrubbed'], counters['scrub_mismatches']) == (2, 1)
+        synchronizer.close()
+
+    def test_repair_delta(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        source.mkdir()
+        content = os.urandom(settings.DELTA_BLOCK_SIZE * 3)
+        (source / 'large.bin').write_bytes(bytes(len(content)))
+        index = SyncIndex(tmp_path / 'index.sqlite')
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica), index=index, delta_threshold=0, scrub_period=600)
+        synchronizer.initialize()
+        (source / 'large.bin').write_bytes(content)
+        synchronizer.sync()
+
+        replica_stat = (replica / 'large.bin').stat()
+        with open(replica / 'large.bin', 'r+b') as file:
+            file.seek(settings.DELTA_BLOCK_SIZE + 10)
+            file.write(b'corrupted')
+        os.utime(replica / 'large.bin', ns=(replica_stat.st_atime_ns, replica_stat.st_mtime_ns))
+        index.set_state('scrub_time', str(time.time() - 600))
+        synchronizer.sync()
+
+        assert (replica / 'large.bin').read_bytes() == content
+        assert synchronizer.metrics.last['counters']['scrub_mismatches'] == 1
+
+        index.set_state('scrub_time', str(time.time() - 600))
+        synchronizer.sync()
+
+        assert 'scrub_mismatches' not in synchronizer.metrics.last['counters']
+        synchronizer.close()
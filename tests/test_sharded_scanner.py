@@ -0,0 +1,102 @@
+import concurrent.futures
+import multiprocessing
+import pathlib
+
+import pytest
+
+from src.file import DirFile, TextFile
+from src.scanner import scan
+from src.sharded_scanner import _scan_shard, _unpack_shard, sharded_scan
+from src.synchronizer import Synchronizer
+from src.transfer import hash_file
+
+import src.settings as settings
+
+
+@pytest.fixture
+def executor():
+    with concurrent.futures.ProcessPoolExecutor(2, mp_context=multiprocessing.get_context(settings.SCAN_MP_CONTEXT)) as executor:
+        yield executor
+
+
+def make_tree(root: pathlib.Path) -> None:
+    for top in range(3):
+        for sub in range(3):
+            directory = root / f'top_{top}' / f'sub_{sub}' / 'leaf'
+            directory.mkdir(parents=True)
+            (directory / 'file.txt').write_text(f'{top} {sub}')
+            (directory.parent / 'file.txt').write_text(f'{sub}')
+    (root / 'file.txt').write_text('root')
+
+
+class TestShardedScanner:
+    def test_pack_shard(self, tmp_path: pathlib.Path):
+        make_tree(tmp_path)
+
+        shard = _scan_shard(str(tmp_path / 'top_1'), True)
+        files = _unpack_shard(DirFile(tmp_path / 'top_1'), shard)
+        scanned = {file.path: file for file in scan(DirFile(tmp_path / 'top_1'))[1:]}
+
+        assert len(files) == len(scanned) == 12
+        for file in files:
+            assert type(file) is type(scanned[file.path])
+            assert file.snapshot == scanned[file.path].snapshot
+            if isinstance(file, TextFile):
+                assert file.digest == hash_file(file.path)
+        paths = [file.path for file in files]
+        assert all(paths.index(path.parent) < paths.index(path) for path in paths if path.parent in paths)
+
+    def test_pack_shard_dangling_symlink(self, tmp_path: pathlib.Path):
+        make_tree(tmp_path)
+        (tmp_path / 'top_1' / 'sub_1' / 'dangling').symlink_to(tmp_path / 'missing')
+
+        files = _unpack_shard(DirFile(tmp_path / 'top_1'), _scan_shard(str(tmp_path / 'top_1'), True))
+
+        assert len(files) == 12
+        assert tmp_path / 'top_1' / 'sub_1' / 'file.txt' in [file.path for file in files]
+
+    def test_pack_missing_shard(self, tmp_path: pathlib.Path):
+        assert _unpack_shard(DirFile(tmp_path / 'missing'), _scan_shard(str(tmp_path / 'missing'), False)) == []
+
+    def test_sharded_scan(self, tmp_path: pathlib.Path, executor: concurrent.futures.Executor):
+        make_tree(tmp_path)
+
+        files = sharded_scan(DirFile(tmp_path), executor, 2, digests=True)
+        scanned = {file.path: file for file in scan(DirFile(tmp_path))}
+
+        paths = [file.path for file in files]
+        assert sorted(paths) == sorted(scanned)
+        assert paths[0] == tmp_path
+        assert all(paths.index(path.parent) < paths.index(path) for path in paths[1:])
+        assert all(file.snapshot == scanned[file.path].snapshot for file in files)
+        assert all(file.digest == hash_file(file.path) for file in files if isinstance(file, TextFile))
+
+    def test_synchronizer(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        make_tree(source)
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica), checksum=True, scan_workers=2)
+        synchronizer.initialize()
+
+        (source / 'top_2' / 'sub_0' / 'file.txt').write_text('changed')
+        (source / 'top_0').rename(source / 'moved')
+        synchronizer.sync()
+        synchronizer.close()
+
+        assert sorted(str(path.relative_to(source)) for path in source.rglob('*')) == \
+            sorted(str(path.relative_to(replica)) for path in replica.rglob('*'))
+        assert (replica / 'top_2' / 'sub_0' / 'file.txt').read_text() == 'changed'
+
+    def test_synchronizer_dangling_symlink(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        make_tree(source)
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica), scan_workers=2)
+        synchronizer.initialize()
+
+        (source / 'top_1' / 'sub_1' / 'dangling').symlink_to(tmp_path / 'missing')
+        synchronizer.sync()
+        synchronizer.close()
+
+        assert (replica / 'top_1' / 'sub_1' / 'file.txt').read_text() == '1'
+        assert (replica / 'top_1' / 'sub_1' / 'leaf' / 'file.txt').read_text() == '1 1'
@@ -1,8 +1,11 @@
+import errno
 import unittest.mock
 import pathlib
 import pytest
 
-from src.synchronizer import Synchronizer, TextFile, DirFile
+from src.index import SyncIndex
+from src.synchronizer import Synchronizer, Snapshot, TextFile, TrackedFile, DirFile
+from src.transfer import copy_file
 
 
 class TestSynchronizer:
@@ -38,7 +41,7 @@ class TestSynchronizer:
             DirFile(pathlib.Path('test/test_source').resolve()),
             DirFile(pathlib.Path('test/test_replica').resolve()),
         )
-        rmtree_mock.assert_called_once()
+        rmtree_mock.assert_not_called()
 
     @unittest.mock.patch('src.file._File.get_id')
     def test_save_tracked_file(
@@ -53,66 +56,41 @@ class TestSynchronizer:
         synchronizer.save_tracked_file(text_file)
 
         file_id_mock.assert_called()
-        assert synchronizer.tracked_files == {1: {'source': text_file}}
+        assert list(synchronizer.tracked_files) == [1]
+        assert synchronizer.tracked_files[1].source is text_file
+        assert synchronizer.tracked_files[1].replica is None
 
-    @unittest.mock.patch('src.synchronizer.Synchronizer.run_function_recursive')
+    @unittest.mock.patch('src.synchronizer.Synchronizer.replicate_file')
+    @unittest.mock.patch('src.synchronizer.scan')
     def test_initialize(
             self,
-            save_recursive_mock: unittest.mock.MagicMock,
+            scan_mock: unittest.mock.MagicMock,
+            replicate_file_mock: unittest.mock.MagicMock,
     ):
 
         synchronizer = self.get_synchronizer()
         assert synchronizer.tracked_files == {}
 
-        synchronizer.initialize()
-
-        update_children_call = unittest.mock.call(
-            synchronizer.source,
-            unittest.mock.ANY
-        )
-        save_tracked_file_call = unittest.mock.call(synchronizer.source, synchronizer.save_tracked_file)
-        replicate_file_call = unittest.mock.call(synchronizer.source, synchronizer.replicate_file)
-
-        save_recursive_mock.assert_has_calls([
-            update_children_call,
-            save_tracked_file_call,
-            replicate_file_call
-        ])
-
-    @unittest.mock.patch('pathlib.Path.read_text')
-    def test_run_function_recursive(
-            self,
-            read_text_mock: unittest.mock.MagicMock,
-    ):
-        read_text_mock.return_value = 'test_text'
-
-        synchronizer = self.get_synchronizer()
         text_file = TextFile(synchronizer.source.path / 'text_file.txt')
-        function = unittest.mock.MagicMock()
-
-        synchronizer.run_function_recursive(text_file, function, 1, test_kwarg=2)
+        synchronizer.source.snapshot = Snapshot(0, 1, 1, 1)
+        text_file.snapshot = Snapshot(9, 1, 1, 2)
+        scan_mock.return_value = [synchronizer.source, text_file]
 
-        function.assert_called_once_with(text_file, 1, test_kwarg=2)
-
-        dir_file = DirFile(synchronizer.source.path)
-        child_dir_file = DirFile(dir_file.path / 'child_dir/')
-        child_child_dir_file = DirFile(child_dir_file.path / '/child_dir/')
-
-        dir_file.children.extend([child_dir_file, text_file])
-        child_dir_file.children.extend([child_child_dir_file])
-
-        function.reset_mock()
-
-        synchronizer.run_function_recursive(dir_file, function, 1, test_kwarg=2)
+        synchronizer.initialize()
 
-        assert function.call_count == 4
+        scan_mock.assert_called_once_with(synchronizer.source, None, None)
+        assert {file_id: file.source for file_id, file in synchronizer.tracked_files.items()} == {
+            1: synchronizer.source, 2: text_file
+        }
+        replicate_file_mock.assert_has_calls([
+            unittest.mock.call(synchronizer.source),
+            unittest.mock.call(text_file),
+        ])
 
     @unittest.mock.patch('src.file.DirFile.create')
     @unittest.mock.patch('src.file.TextFile.create')
-    @unittest.mock.patch('src.file._File.get_id')
     def test_replicate_file(
             self,
-            file_get_id_mock: unittest.mock.MagicMock,
             text_file_create_mock: unittest.mock.MagicMock,
             dir_file_create_mock: unittest.mock.MagicMock
     ):
@@ -120,104 +98,397 @@ class TestSynchronizer:
         synchronizer = self.get_synchronizer()
         dir_file = DirFile(synchronizer.source.path / 'dir/')
         text_file = TextFile(synchronizer.source.path / 'text_file.txt')
-        text_file.content = 'test_text'
+        dir_file.snapshot = Snapshot(0, 1, 1, 1)
+        text_file.snapshot = Snapshot(9, 1, 1, 2)
 
-        file_get_id_mock.side_effect = [1, 2, 1, 2, 1, 2]
         synchronizer.save_tracked_file(dir_file)
         synchronizer.save_tracked_file(text_file)
 
-        assert synchronizer.tracked_files == {1: {'source': dir_file}, 2: {'source': text_file}}
+        assert {file_id: file.source for file_id, file in synchronizer.tracked_files.items()} == {1: dir_file, 2: text_file}
 
         synchronizer.replicate_file(dir_file)
         synchronizer.replicate_file(text_file)
 
-        assert isinstance(synchronizer.tracked_files.get(1)['replica'], DirFile)
-        assert isinstance(synchronizer.tracked_files.get(2)['replica'], TextFile)
+        assert isinstance(synchronizer.tracked_files.get(1).replica, DirFile)
+        assert isinstance(synchronizer.tracked_files.get(2).replica, TextFile)
         dir_file_create_mock.assert_called()
         text_file_create_mock.assert_called()
 
-        dir_file_replica = synchronizer.tracked_files.get(1)['replica']
+        dir_file_replica = synchronizer.tracked_files.get(1).replica
         assert isinstance(dir_file_replica, DirFile)
         assert dir_file_replica.path == synchronizer.replica.path / 'dir/'
 
-        text_file_replica = synchronizer.tracked_files.get(2)['replica']
+        text_file_replica = synchronizer.tracked_files.get(2).replica
         assert isinstance(text_file_replica, TextFile)
         assert text_file_replica.path == synchronizer.replica.path / 'text_file.txt'
-        assert text_file_replica.content == text_file.content
+        assert text_file_replica.origin == text_file.path
+        assert synchronizer.tracked_files.get(2).snapshot == Snapshot(9, 1, 1, 2)
 
         synchronizer.save_tracked_file(dir_file)
         synchronizer.save_tracked_file(text_file)
 
-        dir_file_replica = synchronizer.tracked_files.get(1)['replica']
+        dir_file_replica = synchronizer.tracked_files.get(1).replica
         assert isinstance(dir_file_replica, DirFile)
-        text_file_replica = synchronizer.tracked_files.get(2)['replica']
+        text_file_replica = synchronizer.tracked_files.get(2).replica
         assert isinstance(text_file_replica, TextFile)
 
-    @unittest.mock.patch('src.file.DirFile.update_children')
     @unittest.mock.patch('src.file.DirFile.create')
     @unittest.mock.patch('src.file.DirFile.remove')
     @unittest.mock.patch('src.file.TextFile.create')
     @unittest.mock.patch('src.file.TextFile.remove')
-    @unittest.mock.patch('pathlib.Path.exists')
-    @unittest.mock.patch('src.synchronizer.Synchronizer.save_tracked_file')
-    @unittest.mock.patch('pathlib.Path.stat')
+    @unittest.mock.patch('src.synchronizer.scan')
     def test_sync(
             self,
-            stats_mock: unittest.mock.MagicMock,
-            save_tracked_file_mock: unittest.mock.MagicMock,
-            exists_mock: unittest.mock.MagicMock,
+            scan_mock: unittest.mock.MagicMock,
             text_remove_mock: unittest.mock.MagicMock,
             text_create_mock: unittest.mock.MagicMock,
             dir_remove_mock: unittest.mock.MagicMock,
             dir_create_mock: unittest.mock.MagicMock,
-            update_children_mock: unittest.mock.MagicMock,
     ):
-        exists_mock.side_effect = [True, True, False]
         synchronizer = self.get_synchronizer()
 
-        synchronizer.tracked_files = {
-            1: {
-                'source': DirFile(synchronizer.source.path / 'dira/'),
-                'replica': DirFile(synchronizer.replica.path / 'dir/')
-            },
-            2: {
-                'source': TextFile(synchronizer.source.path / 'dira/text_file.txt'),
-                'replica': TextFile(synchronizer.replica.path / 'text_file.txt')
-            },
-            3: {
-                'source': TextFile(synchronizer.source.path / 'text_file_3.txt'),
-                'replica': TextFile(synchronizer.replica.path / 'dir/text_file_3.txt')
-            }
-        }
-        stats_mock.side_effect = [
-            unittest.mock.MagicMock(st_ino=1),
-            unittest.mock.MagicMock(st_ino=2),
-            unittest.mock.MagicMock(st_ino=4)
-        ]
-        synchronizer.tracked_files.get(2)['replica'].content = 'new content'
-
-        def add_new_file(*args, **kwargs):
-            synchronizer.tracked_files[4] = {
-                'source': TextFile(synchronizer.source.path / 'text_file_4.txt'),
-                'replica': TextFile(synchronizer.replica.path / 'text_file_4.txt')
-            }
+        synchronizer.tracked_files.update({
+            1: TrackedFile(
+                DirFile(synchronizer.source.path / 'dir/'),
+                DirFile(synchronizer.replica.path / 'dir/'),
+                Snapshot(0, 1, 1, 1)
+            ),
+            2: TrackedFile(
+                TextFile(synchronizer.source.path / 'text_file.txt'),
+                TextFile(synchronizer.replica.path / 'text_file.txt'),
+                Snapshot(3, 1, 1, 2)
+            ),
+            3: TrackedFile(
+                TextFile(synchronizer.source.path / 'dir/text_file_3.txt'),
+                TextFile(synchronizer.replica.path / 'dir/text_file_3.txt'),
+                Snapshot(3, 1, 1, 3)
+            )
+        })
 
-        save_tracked_file_mock.side_effect = add_new_file
+        scanned_files = [
+            synchronizer.source,
+            DirFile(synchronizer.source.path / 'dira/'),
+            TextFile(synchronizer.source.path / 'dira/text_file.txt'),
+            TextFile(synchronizer.source.path / 'text_file_4.txt'),
+        ]
+        for file, snapshot in zip(scanned_files, [
+            Snapshot(0, 1, 1, 100), Snapshot(0, 1, 1, 1), Snapshot(14, 1, 1, 2), Snapshot(14, 1, 1, 4)
+        ]):
+            file.snapshot = snapshot
+        scan_mock.return_value = scanned_files
 
         synchronizer.sync()
 
+        scan_mock.assert_called_once_with(synchronizer.source, None, None)
         for files in synchronizer.tracked_files.values():
             assert (
-                files['source'].path.relative_to(synchronizer.source.path) ==
-                files['replica'].path.relative_to(synchronizer.replica.path)
+                files.source.path.relative_to(synchronizer.source.path) ==
+                files.replica.path.relative_to(synchronizer.replica.path)
             )
 
-            if isinstance(files['source'], TextFile):
-                assert files['source'].content == files['replica'].content
+            if isinstance(files.source, TextFile):
+                assert files.replica.origin == files.source.path
+                assert files.snapshot == files.source.snapshot
 
-        assert dir_create_mock.call_count == 1
-        assert dir_remove_mock.call_count == 1
+        assert dir_create_mock.call_count == 2
+        assert dir_remove_mock.call_count == 0
         assert synchronizer.tracked_files.get(3) is None
+        assert sorted(synchronizer.tracked_files) == [1, 2, 4, 100]
         assert text_create_mock.call_count == 3
-        assert text_remove_mock.call_count == 2
-        update_children_mock.assert_called_once()
+        assert text_remove_mock.call_count == 1
+
+    @unittest.mock.patch('src.file.TextFile.create')
+    @unittest.mock.patch('src.file._File.get_snapshot')
+    @unittest.mock.patch('src.backend.files_equal')
+    def test_update_content(
+            self,
+            files_equal_mock: unittest.mock.MagicMock,
+            get_snapshot_mock: unittest.mock.MagicMock,
+            text_create_mock: unittest.mock.MagicMock,
+    ):
+        synchronizer = self.get_synchronizer()
+        replica_file = TextFile(synchronizer.replica.path / 'text_file.txt')
+        file = TrackedFile(
+            TextFile(synchronizer.source.path / 'text_file.txt'),
+            replica_file,
+            Snapshot(7, 1, 1, 1),
+        )
+        get_snapshot_mock.return_value = Snapshot(7, 1, 1, 1)
+
+        synchronizer.update_content(file)
+
+        files_equal_mock.assert_not_called()
+        text_create_mock.assert_not_called()
+
+        get_snapshot_mock.return_value = Snapshot(11, 2, 2, 1)
+
+        synchronizer.update_content(file)
+
+        files_equal_mock.assert_not_called()
+        text_create_mock.assert_called_once()
+        assert replica_file.origin == file.source.path
+        assert file.snapshot == Snapshot(11, 2, 2, 1)
+
+        text_create_mock.reset_mock()
+        synchronizer.checksum = True
+        files_equal_mock.return_value = True
+
+        synchronizer.update_content(file)
+
+        files_equal_mock.assert_called_once_with(file.source.path, replica_file.path)
+        text_create_mock.assert_not_called()
+
+        files_equal_mock.return_value = False
+
+        synchronizer.update_content(file)
+
+        text_create_mock.assert_called_once()
+
+    def test_initialize_warm_start(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        (source / 'dir').mkdir(parents=True)
+        (source / 'dir' / 'file.txt').write_text('content')
+        (source / 'changed.txt').write_text('content')
+
+        index = SyncIndex.for_replica(replica)
+        Synchronizer(DirFile(source), DirFile(replica), index=index).initialize()
+
+        assert (replica / 'dir' / 'file.txt').read_text() == 'content'
+
+        (source / 'changed.txt').write_text('new content')
+        (replica / 'untracked').mkdir()
+        (replica / 'untracked.txt').write_text('content')
+
+        with unittest.mock.patch('src.file.copy_file', wraps=copy_file) as copy_file_mock:
+            Synchronizer(DirFile(source), DirFile(replica), index=index).initialize()
+
+        copy_file_mock.assert_called_once_with(
+            source / 'changed.txt', replica / 'changed.txt', digest=unittest.mock.ANY, throttle=unittest.mock.ANY,
+            fsync=False
+        )
+        assert (replica / 'changed.txt').read_text() == 'new content'
+        assert sorted(path.name for path in replica.iterdir()) == ['changed.txt', 'dir']
+        index.close()
+
+    @unittest.mock.patch('src.settings.INDEX_COMMIT_ENTRIES', 3)
+    def test_initialize_interrupted(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        source.mkdir()
+        for index in range(10):
+            (source / f'file_{index}.txt').write_text(f'content {index}')
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica), index=SyncIndex.for_replica(replica))
+        side_effect = [None] * 5 + [KeyboardInterrupt]
+
+        with unittest.mock.patch.object(synchronizer, 'write_content', side_effect=side_effect):
+            with pytest.raises(KeyboardInterrupt):
+                synchronizer.initialize()
+
+        assert len(SyncIndex(SyncIndex.path_for(replica), read_only=True).load()) == 6
+        synchronizer.close()
+
+    def test_sync_paths(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        (source / 'dir').mkdir(parents=True)
+        (source / 'dir' / 'file.txt').write_text('content')
+        (source / 'deleted.txt').write_text('content')
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica))
+        synchronizer.initialize()
+
+        (source / 'dir' / 'file.txt').write_text('new content')
+        (source / 'deleted.txt').unlink()
+        (source / 'new').mkdir()
+        (source / 'new' / 'file.txt').write_text('content')
+        (source / 'dir').rename(source / 'moved')
+
+        synchronizer.sync_paths([
+            source / 'dir', source / 'moved', source / 'deleted.txt', source / 'new', source / 'dir' / 'file.txt'
+        ])
+
+        assert sorted(str(path.relative_to(replica)) for path in replica.rglob('*')) == [
+            'moved', 'moved/file.txt', 'new', 'new/file.txt'
+        ]
+        assert (replica / 'moved' / 'file.txt').read_text() == 'new content'
+        assert synchronizer.source_paths[source / 'moved' / 'file.txt'] in synchronizer.tracked_files
+        assert len(synchronizer.tracked_files) == 5
+
+    def test_sync_paths_delete_in_renamed_dir(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        (source / 'n').mkdir(parents=True)
+        (source / 'n' / 'x').write_text('deleted')
+        (source / 'n' / 'y').write_text('kept')
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica))
+        synchronizer.initialize()
+
+        (source / 'n' / 'x').unlink()
+        (source / 'n').rename(source / 'd')
+        synchronizer.sync_paths([source / 'n' / 'x', source / 'n', source / 'd'])
+        synchronizer.pool.wait()
+
+        assert sorted(str(path.relative_to(replica)) for path in replica.rglob('*')) == ['d', 'd/y']
+        synchronizer.close()
+
+    def test_sync_workers(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        (source / 'dir').mkdir(parents=True)
+        for index in range(20):
+            (source / 'dir' / f'file_{index}.txt').write_text(f'content {index}')
+        (source / 'replaced.txt').write_text('content')
+        (source / 'deleted.txt').write_text('content')
+        (source / 'moved.txt').write_text('moved content')
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica), workers=4)
+        synchronizer.initialize()
+
+        assert (replica / 'dir' / 'file_7.txt').read_text() == 'content 7'
+
+        (source / 'replaced.txt').unlink()
+        (source / 'replaced.txt').write_text('new content')
+        (source / 'moved.txt').rename(source / 'deleted.txt')
+        (source / 'dir' / 'file_3.txt').write_text('new content')
+        (source / 'new').mkdir()
+        (source / 'new' / 'file.txt').write_text('content')
+
+        synchronizer.sync()
+
+        assert (replica / 'replaced.txt').read_text() == 'new content'
+        assert (replica / 'deleted.txt').read_text() == 'moved content'
+        assert not (replica / 'moved.txt').exists()
+        assert (replica / 'dir' / 'file_3.txt').read_text() == 'new content'
+        assert (replica / 'new' / 'file.txt').read_text() == 'content'
+        synchronizer.close()
+
+    def test_sync_directory_rename(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        (source / 'dir' / 'sub').mkdir(parents=True)
+        for index in range(10):
+            (source / 'dir' / 'sub' / f'file_{index}.txt').write_text(f'content {index}')
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica), index=SyncIndex(tmp_path / 'index.sqlite'))
+        synchronizer.initialize()
+        inode = (replica / 'dir' / 'sub' / 'file_3.txt').stat().st_ino
+
+        (source / 'dir').rename(source / 'renamed')
+
+        with unittest.mock.patch('src.file.copy_file') as copy_mock:
+            synchronizer.sync()
+            synchronizer.sync()
+
+        copy_mock.assert_not_called()
+        assert not (replica / 'dir').exists()
+        assert (replica / 'renamed' / 'sub' / 'file_3.txt').stat().st_ino == inode
+        assert (replica / 'renamed' / 'sub' / 'file_3.txt').read_text() == 'content 3'
+        assert 'renamed/sub/file_3.txt' in synchronizer.index.load()
+        assert not any(path.startswith('dir') for path in synchronizer.index.load())
+        synchronizer.close()
+
+    def test_sync_swap(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        (source / 'a').mkdir(parents=True)
+        (source / 'b').mkdir()
+        (source / 'a' / 'file.txt').write_text('a')
+        (source / 'b' / 'file.txt').write_text('b')
+        (source / 'one.txt').write_text('one')
+        (source / 'two.txt').write_text('two')
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica), index=SyncIndex(tmp_path / 'index.sqlite'))
+        synchronizer.initialize()
+
+        (source / 'a').rename(source / 'tmp')
+        (source / 'b').rename(source / 'a')
+        (source / 'tmp').rename(source / 'b')
+        (source / 'one.txt').rename(source / 'tmp.txt')
+        (source / 'two.txt').rename(source / 'one.txt')
+        (source / 'tmp.txt').rename(source / 'two.txt')
+
+        synchronizer.sync()
+
+        assert (replica / 'a' / 'file.txt').read_text() == 'b'
+        assert (replica / 'b' / 'file.txt').read_text() == 'a'
+        assert (replica / 'one.txt').read_text() == 'two'
+        assert (replica / 'two.txt').read_text() == 'one'
+        assert sorted(path.name for path in replica.iterdir()) == ['a', 'b', 'one.txt', 'two.txt']
+        assert set(synchronizer.index.load()) == {'.', 'a', 'a/file.txt', 'b', 'b/file.txt', 'one.txt', 'two.txt'}
+        synchronizer.close()
+
+    def test_sync_move_into_replaced_parent(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        source.mkdir()
+        (source / 'name').write_text('content')
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica))
+        synchronizer.initialize()
+
+        (source / 'name').rename(source / 'tmp')
+        (source / 'name').mkdir()
+        (source / 'tmp').rename(source / 'name' / 'file.txt')
+
+        synchronizer.sync()
+
+        assert (replica / 'name' / 'file.txt').read_text() == 'content'
+        assert sorted(path.name for path in replica.iterdir()) == ['name']
+        synchronizer.close()
+
+    def test_sync_dangling_symlink(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        (source / 'dir').mkdir(parents=True)
+        for name in ('a.txt', 'b.txt'):
+            (source / 'dir' / name).write_text(name)
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica))
+        synchronizer.initialize()
+
+        (source / 'dir' / 'dangling').symlink_to(tmp_path / 'missing')
+        synchronizer.sync()
+        synchronizer.close()
+
+        assert sorted(path.name for path in (replica / 'dir').iterdir()) == ['a.txt', 'b.txt']
+
+    def test_sync_after_failed_copy(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        source.mkdir()
+        (source / 'old.txt').write_text('old')
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica))
+        synchronizer.initialize()
+
+        (source / 'a.txt').write_text('a')
+        (source / 'b.txt').write_text('b')
+        (source / 'old.txt').write_text('changed')
+        with unittest.mock.patch('src.file.copy_file', side_effect=OSError(errno.ENOSPC, 'No space left on device')):
+            synchronizer.sync()
+
+        assert synchronizer.metrics.last['counters']['errors'] == 3
+        assert not (replica / 'a.txt').exists()
+
+        (source / 'c.txt').write_text('c')
+        synchronizer.sync()
+
+        assert [(replica / name).read_text() for name in ('a.txt', 'b.txt', 'c.txt')] == ['a', 'b', 'c']
+        assert (replica / 'old.txt').read_text() == 'changed'
+        synchronizer.close()
+
+    def test_sync_source_deleted_before_copy(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        source.mkdir()
+        synchronizer = Synchronizer(DirFile(source), DirFile(replica))
+        synchronizer.initialize()
+        scan_source = synchronizer.scan_source
+
+        def scan_and_delete():
+            files = scan_source()
+            (source / 'deleted.txt').unlink()
+            return files
+
+        (source / 'deleted.txt').write_text('deleted')
+        (source / 'kept.txt').write_text('kept')
+        with unittest.mock.patch.object(synchronizer, 'scan_source', side_effect=scan_and_delete):
+            synchronizer.sync()
+        synchronizer.sync()
+
+        assert sorted(path.name for path in replica.iterdir()) == ['kept.txt']
+        synchronizer.close()
@@ -0,0 +1,73 @@
+import os
+import pathlib
+import signal
+import time
+import unittest.mock
+
+from src.file import DirFile
+from src.synchronizer import Synchronizer
+from src.throttle import Throttle, TokenBucket
+from src.transfer import copy_file
+
+
+class TestThrottle:
+    @unittest.mock.patch('time.sleep')
+    @unittest.mock.patch('time.monotonic')
+    def test_token_bucket(
+            self,
+            monotonic_mock: unittest.mock.MagicMock,
+            sleep_mock: unittest.mock.MagicMock
+    ):
+        monotonic_mock.return_value = 100.0
+        bucket = TokenBucket(1000)
+
+        assert bucket.consume(500) == 0.5
+        assert bucket.consume(1000) == 1.5
+        sleep_mock.assert_has_calls([unittest.mock.call(0.5), unittest.mock.call(1.5)])
+
+        monotonic_mock.return_value = 110.0
+        assert bucket.consume(1000) == 0
+
+        bucket.configure(None)
+        assert bucket.consume(10 ** 9) == 0
+        assert sleep_mock.call_count == 2
+
+    def test_copy_file(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source.bin'
+        source.write_bytes(os.urandom(10 * 1024))
+        throttle = Throttle()
+
+        with unittest.mock.patch.object(throttle, 'transfer') as transfer_mock:
+            copy_file(source, tmp_path / 'destination.bin', chunk_size=1024, throttle=throttle)
+
+        assert sum(call.args[0] for call in transfer_mock.call_args_list) == 10 * 1024
+
+    def test_synchronizer(self, tmp_path: pathlib.Path):
+        source = tmp_path / 'source'
+        replica = tmp_path / 'replica'
+        (source / 'dir').mkdir(parents=True)
+        (source / 'dir' / 'file.txt').write_text('content')
+        (source / 'other.txt').write_text('content')
+        throttle = Throttle(iops=1000)
+
+        with unittest.mock.patch.object(throttle, 'operation', wraps=throttle.operation) as operation_mock:
+            Synchronizer(DirFile(source), DirFile(replica), throttle=throttle).initialize()
+
+        assert operation_mock.call_count == 4
+        assert (replica / 'dir' / 'file.txt').read_text() == 'content'
+
+    def test_reload(self):
+        throttle = Throttle(1024, 10)
+        previous = signal.getsignal(signal.SIGHUP)
+        try:
+            throttle.install_reload_handler(lambda: (None, 100))
+            os.kill(os.getpid(), signal.SIGHUP)
+            for _ in range(100):
+                if throttle.operations.rate == 100:
+                    break
+                time.sleep(0.01)
+        finally:
+            signal.signal(signal.SIGHUP, previous)
+
+        assert throttle.bytes.rate is None
+        assert throttle.operations.rate == 100
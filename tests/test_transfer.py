@@ -0,0 +1,187 @@
+import concurrent.futures
+import errno
+import os
+import unittest.mock
+
+import pytest
+
+from src.transfer import (
+    SharedRead, block_hash, copy_file, delta_copy, files_equal, hash_file, link_file, new_digest
+)
+
+
+class TestTransfer:
+    def test_copy_file(self, tmp_path):
+        source = tmp_path / 'source.bin'
+        destination = tmp_path / 'destination.bin'
+        content = os.urandom(3 * 1024 + 7)
+        source.write_bytes(content)
+
+        assert copy_file(source, destination, chunk_size=1024) == len(content)
+        assert destination.read_bytes() == content
+        assert [path.name for path in tmp_path.iterdir() if path.suffix == '.tmp'] == []
+
+    @unittest.mock.patch('src.transfer._COPY_METHODS', [])
+    def test_copy_file_userspace_fallback(self, tmp_path):
+        source = tmp_path / 'source.bin'
+        destination = tmp_path / 'destination.bin'
+        content = os.urandom(5000)
+        source.write_bytes(content)
+        destination.write_bytes(b'old content')
+
+        copy_file(source, destination, chunk_size=1024)
+
+        assert destination.read_bytes() == content
+
+    def test_copy_file_unsupported_kernel_copy(self, tmp_path):
+        source = tmp_path / 'source.bin'
+        destination = tmp_path / 'destination.bin'
+        source.write_bytes(b'content')
+        unsupported = unittest.mock.MagicMock(side_effect=OSError(errno.EXDEV, 'Cross-device link'))
+        unsupported.__name__ = 'unsupported'
+
+        with unittest.mock.patch('src.transfer._COPY_METHODS', [unsupported]):
+            copy_file(source, destination)
+
+        unsupported.assert_called_once()
+        assert destination.read_bytes() == b'content'
+
+    def test_copy_file_failure_removes_temp_file(self, tmp_path):
+        source = tmp_path / 'source.bin'
+        destination = tmp_path / 'destination.bin'
+        source.write_bytes(b'content')
+
+        with unittest.mock.patch('os.replace', side_effect=OSError(errno.EIO, 'I/O error')):
+            with pytest.raises(OSError):
+                copy_file(source, destination)
+
+        assert [path.name for path in tmp_path.iterdir()] == ['source.bin']
+
+    def test_copy_file_fsync(self, tmp_path):
+        source = tmp_path / 'source.bin'
+        destination = tmp_path / 'destination.bin'
+        source.write_bytes(b'content')
+        calls = unittest.mock.MagicMock()
+
+        with unittest.mock.patch('os.fsync', calls.fsync), unittest.mock.patch('os.replace', wraps=os.replace) as replace_mock:
+            calls.attach_mock(replace_mock, 'replace')
+            copy_file(source, destination, fsync=True)
+
+        assert [name for name, _, _ in calls.mock_calls] == ['fsync', 'replace']
+        assert destination.read_bytes() == b'content'
+
+    def test_files_equal(self, tmp_path):
+        first = tmp_path / 'first'
+        second = tmp_path / 'second'
+        first.write_bytes(b'a' * 2048)
+        second.write_bytes(b'a' * 2048)
+
+        assert files_equal(first, second, chunk_size=1024)
+
+        second.write_bytes(b'a' * 2047 + b'b')
+        assert not files_equal(first, second, chunk_size=1024)
+
+        second.write_bytes(b'a')
+        assert not files_equal(first, second)
+
+        assert not files_equal(first, tmp_path / 'missing')
+
+    def test_delta_copy(self, tmp_path):
+        source = tmp_path / 'source.bin'
+        destination = tmp_path / 'destination.bin'
+        content = bytearray(os.urandom(10 * 1024))
+        source.write_bytes(content)
+        destination.write_bytes(content)
+
+        content[5000] ^= 0xff
+        source.write_bytes(content)
+        result = delta_copy(source, destination, block_size=1024)
+
+        assert result.written == 1024
+        assert result.size == len(content)
+        assert result.blocks == [block_hash(content[offset:offset + 1024]) for offset in range(0, len(content), 1024)]
+        assert destination.read_bytes() == content
+        assert destination.stat().st_mtime_ns == source.stat().st_mtime_ns
+
+        content[100] ^= 0xff
+        content.extend(b'appended')
+        source.write_bytes(content)
+        digest = new_digest()
+        result = delta_copy(source, destination, result.blocks, block_size=1024, digest=digest)
+
+        assert result.written == 1024 + len(b'appended')
+        assert destination.read_bytes() == content
+        assert digest.digest() == hash_file(source)
+
+        source.write_bytes(content[:3000])
+        result = delta_copy(source, destination, result.blocks, block_size=1024)
+
+        assert result.written == 3000 - 2048
+        assert destination.read_bytes() == content[:3000]
+
+    def test_shared_read(self, tmp_path):
+        source = tmp_path / 'source.bin'
+        content = os.urandom(3 * 1024 + 7)
+        source.write_bytes(content)
+        destinations = [tmp_path / 'first.bin', tmp_path / 'missing' / 'second.bin', tmp_path / 'third.bin']
+        shared_read = SharedRead(source, chunk_size=1024, queue_size=16)
+        digest = new_digest()
+
+        with concurrent.futures.ThreadPoolExecutor(4) as executor, \
+                unittest.mock.patch('os.pread', wraps=os.pread) as pread_mock:
+            feeds = [shared_read.join(executor) for _ in destinations]
+            futures = [
+                executor.submit(shared_read.write, feed, destination, digest if index == 0 else None)
+                for index, (feed, destination) in enumerate(zip(feeds, destinations))
+            ]
+            concurrent.futures.wait(futures)
+
+        assert futures[0].result() == len(content)
+        assert isinstance(futures[1].exception(), FileNotFoundError)
+        assert destinations[0].read_bytes() == content
+        assert destinations[2].read_bytes() == content
+        assert digest.digest() == hash_file(source)
+        pread_mock.assert_not_called()
+        assert [path.name for path in tmp_path.iterdir() if path.suffix == '.tmp'] == []
+
+    def test_shared_read_slow_writer(self, tmp_path):
+        source = tmp_path / 'source.bin'
+        content = os.urandom(8 * 1024)
+        source.write_bytes(content)
+        shared_read = SharedRead(source, chunk_size=1024, queue_size=2)
+
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            fast, slow = shared_read.join(executor), shared_read.join(executor)
+            assert shared_read.write(fast, tmp_path / 'fast.bin') == len(content)
+            assert slow.detached
+
+        assert shared_read.write(slow, tmp_path / 'slow.bin') == len(content)
+        assert (tmp_path / 'fast.bin').read_bytes() == content
+        assert (tmp_path / 'slow.bin').read_bytes() == content
+        assert shared_read.join(executor) is None
+
+    def test_shared_read_after_end(self, tmp_path):
+        source = tmp_path / 'source.bin'
+        content = os.urandom(2 * 1024)
+        source.write_bytes(content)
+        shared_read = SharedRead(source, chunk_size=1024, queue_size=8)
+
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            shared_read.write(shared_read.join(executor), tmp_path / 'first.bin')
+            with unittest.mock.patch('os.pread') as pread_mock:
+                shared_read.write(shared_read.join(executor), tmp_path / 'second.bin')
+
+        pread_mock.assert_not_called()
+        assert (tmp_path / 'second.bin').read_bytes() == content
+
+    def test_link_file(self, tmp_path):
+        source = tmp_path / 'source.txt'
+        destination = tmp_path / 'destination.txt'
+        source.write_text('content')
+        destination.write_text('old content')
+
+        link_file(source, destination)
+
+        assert os.path.samefile(source, destination)
+        assert destination.read_text() == 'content'
+        assert sorted(path.name for path in tmp_path.iterdir()) == ['destination.txt', 'source.txt']
@@ -0,0 +1,70 @@
+import pathlib
+import sys
+import unittest.mock
+
+import pytest
+
+from src.watcher import IN_ISDIR, IN_Q_OVERFLOW, Event, InotifyWatcher
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is Linux only')
+
+
+class TestInotifyWatcher:
+    def get_watcher(self, root: pathlib.Path) -> InotifyWatcher:
+        return InotifyWatcher(root, debounce=0.05, max_delay=1)
+
+    def test_collect(self, tmp_path: pathlib.Path):
+        (tmp_path / 'dir').mkdir()
+        (tmp_path / 'dir' / 'file.txt').write_text('content')
+        watcher = self.get_watcher(tmp_path)
+
+        (tmp_path / 'dir' / 'file.txt').write_text('new content')
+        (tmp_path / 'new.txt').write_text('content')
+
+        assert watcher.collect(timeout=1) == ({tmp_path / 'dir' / 'file.txt', tmp_path / 'new.txt'}, False)
+        assert watcher.collect(timeout=0) == (set(), False)
+        watcher.close()
+
+    def test_collect_new_dir(self, tmp_path: pathlib.Path):
+        watcher = self.get_watcher(tmp_path)
+
+        (tmp_path / 'dir').mkdir()
+        dirty, _ = watcher.collect(timeout=1)
+        assert dirty == {tmp_path / 'dir'}
+
+        (tmp_path / 'dir' / 'file.txt').write_text('content')
+        dirty, _ = watcher.collect(timeout=1)
+        assert dirty == {tmp_path / 'dir' / 'file.txt'}
+
+        (tmp_path / 'dir').rename(tmp_path / 'moved')
+        dirty, _ = watcher.collect(timeout=1)
+        assert dirty == {tmp_path / 'dir', tmp_path / 'moved'}
+        assert tmp_path / 'dir' not in watcher.watches.values()
+        watcher.close()
+
+    def test_handle_event_overflow(self, tmp_path: pathlib.Path):
+        watcher = self.get_watcher(tmp_path)
+        dirty = set()
+
+        assert watcher.handle_event(Event(-1, IN_Q_OVERFLOW, 0, ''), dirty)
+        assert dirty == set()
+
+        with unittest.mock.patch.object(watcher, 'read_events', return_value=[Event(-1, IN_Q_OVERFLOW, 0, '')]):
+            with unittest.mock.patch('select.select', side_effect=[([watcher.fd], [], []), ([], [], [])]):
+                with unittest.mock.patch.object(watcher, 'add_watch_recursive') as add_watch_mock:
+                    assert watcher.collect(timeout=0) == (set(), True)
+
+        add_watch_mock.assert_called_once_with(tmp_path)
+        watcher.close()
+
+    def test_handle_event_dir(self, tmp_path: pathlib.Path):
+        watcher = self.get_watcher(tmp_path)
+        wd = next(iter(watcher.watches))
+        dirty = set()
+
+        (tmp_path / 'dir').mkdir()
+        watcher.handle_event(Event(wd, IN_ISDIR | 0x100, 0, 'dir'), dirty)
+
+        assert dirty == {tmp_path / 'dir'}
+        assert tmp_path / 'dir' in watcher.watches.values()
+        watcher.close()